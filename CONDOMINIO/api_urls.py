@@ -17,12 +17,14 @@ urlpatterns = [
     path('viviendas/', views.listar_viviendas, name='listar_viviendas'),
     path('viviendas/crear/', views.crear_vivienda, name='crear_vivienda'),
     path('viviendas/<int:pk>/', views.detalle_vivienda, name='detalle_vivienda'),
+    path('viviendas/<int:pk>/estado-cuenta/', views.estado_cuenta_vivienda, name='estado_cuenta_vivienda'),
     path('viviendas/<int:pk>/modificar/', views.modificar_vivienda, name='modificar_vivienda'),
     path('viviendas/<int:pk>/eliminar/', views.eliminar_vivienda, name='eliminar_vivienda'),
     
     # Parqueos
     path('parqueos/', views.listar_parqueos, name='listar_parqueos'),
     path('parqueos/crear/', views.crear_parqueo, name='crear_parqueo'),
+    path('parqueos/disponibles/', views.parqueos_disponibles, name='parqueos_disponibles'),
     path('parqueos/<int:pk>/', views.detalle_parqueo, name='detalle_parqueo'),
     path('parqueos/<int:pk>/modificar/', views.modificar_parqueo, name='modificar_parqueo'),
     path('parqueos/<int:pk>/eliminar/', views.eliminar_parqueo, name='eliminar_parqueo'),
@@ -37,6 +39,8 @@ urlpatterns = [
     # Control de Visitas
     path('visitas/', views.listar_visitas, name='listar_visitas'),
     path('visitas/registrar-entrada/', views.registrar_entrada, name='registrar_entrada'),
+    path('visitas/ingreso/', views.ingreso_visita, name='ingreso_visita'),
+    path('visitas/presentes/', views.visitas_presentes, name='visitas_presentes'),
     path('visitas/<int:pk>/registrar-salida/', views.registrar_salida, name='registrar_salida'),
     
     # Reservas
@@ -50,12 +54,14 @@ urlpatterns = [
     path('areas/', views.listar_areas, name='listar_areas'),
     path('areas/crear/', views.crear_area, name='crear_area'),
     path('areas/<int:pk>/', views.detalle_area, name='detalle_area'),
+    path('areas/<int:pk>/disponibilidad/', views.disponibilidad_area, name='disponibilidad_area'),
     path('areas/<int:pk>/modificar/', views.modificar_area, name='modificar_area'),
     path('areas/<int:pk>/eliminar/', views.eliminar_area, name='eliminar_area'),
     
     # Expensas
     path('expensas/', views.listar_expensas, name='listar_expensas'),
     path('expensas/crear/', views.crear_expensa, name='crear_expensa'),
+    path('expensas/generar/', views.generar_expensas_periodo, name='generar_expensas_periodo'),
     path('expensas/<int:pk>/', views.detalle_expensa, name='detalle_expensa'),
     path('expensas/<int:pk>/modificar/', views.modificar_expensa, name='modificar_expensa'),
     path('expensas/<int:pk>/eliminar/', views.eliminar_expensa, name='eliminar_expensa'),
@@ -63,7 +69,9 @@ urlpatterns = [
     # Pagos
     path('pagos/', views.listar_pagos, name='listar_pagos'),
     path('pagos/crear/', views.crear_pago, name='crear_pago'),
+    path('pagos/conciliar/', views.conciliar, name='conciliar_pagos'),
     path('pagos/<int:pk>/', views.detalle_pago, name='detalle_pago'),
+    path('pagos/<int:pk>/aplicaciones/', views.aplicaciones_pago, name='aplicaciones_pago'),
     path('pagos/<int:pk>/modificar/', views.modificar_pago, name='modificar_pago'),
     path('pagos/<int:pk>/eliminar/', views.eliminar_pago, name='eliminar_pago'),
     
@@ -85,6 +93,7 @@ urlpatterns = [
     # Vehículos
     path('vehiculos/', views.listar_vehiculos, name='listar_vehiculos'),
     path('vehiculos/crear/', views.crear_vehiculo, name='crear_vehiculo'),
+    path('vehiculos/buscar/', views.buscar_vehiculos, name='buscar_vehiculos'),
     path('vehiculos/<int:pk>/', views.detalle_vehiculo, name='detalle_vehiculo'),
     path('vehiculos/<int:pk>/modificar/', views.modificar_vehiculo, name='modificar_vehiculo'),
     path('vehiculos/<int:pk>/eliminar/', views.eliminar_vehiculo, name='eliminar_vehiculo'),
@@ -103,21 +112,21 @@ urlpatterns = [
     path('mascotas/<int:pk>/modificar/', views.modificar_mascota, name='modificar_mascota'),
     path('mascotas/<int:pk>/eliminar/', views.eliminar_mascota, name='eliminar_mascota'),
     
-    # Asignación de Parqueos (DESHABILITADO - requiere tabla asignaciones_parqueo)
-    # path('asignaciones-parqueo/', views.listar_asignaciones_parqueo, name='listar_asignaciones_parqueo'),
-    # path('asignaciones-parqueo/crear/', views.crear_asignacion_parqueo, name='crear_asignacion_parqueo'),
-    # path('asignaciones-parqueo/<int:pk>/', views.detalle_asignacion_parqueo, name='detalle_asignacion_parqueo'),
-    # path('asignaciones-parqueo/<int:pk>/modificar/', views.modificar_asignacion_parqueo, name='modificar_asignacion_parqueo'),
-    # path('asignaciones-parqueo/<int:pk>/eliminar/', views.eliminar_asignacion_parqueo, name='eliminar_asignacion_parqueo'),
-    # path('parqueos/disponibles/', views.parqueos_disponibles, name='parqueos_disponibles'),
+    # Asignación de Parqueos
+    path('asignaciones-parqueo/', views.listar_asignaciones_parqueo, name='listar_asignaciones_parqueo'),
+    path('asignaciones-parqueo/crear/', views.crear_asignacion_parqueo, name='crear_asignacion_parqueo'),
+    path('asignaciones-parqueo/<int:pk>/', views.detalle_asignacion_parqueo, name='detalle_asignacion_parqueo'),
+    path('asignaciones-parqueo/<int:pk>/modificar/', views.modificar_asignacion_parqueo, name='modificar_asignacion_parqueo'),
+    path('asignaciones-parqueo/<int:pk>/eliminar/', views.eliminar_asignacion_parqueo, name='eliminar_asignacion_parqueo'),
     
     # Reportes y Análisis
     path('reportes/resumen-general/', views.reporte_resumen_general, name='reporte_resumen_general'),
     path('reportes/expensas/', views.reporte_expensas, name='reporte_expensas'),
     path('reportes/visitas/', views.reporte_visitas, name='reporte_visitas'),
     # path('reportes/vehiculos/', views.reporte_vehiculos, name='reporte_vehiculos'),  # DESHABILITADO
-    # path('reportes/ocupacion-parqueos/', views.reporte_ocupacion_parqueos, name='reporte_ocupacion_parqueos'),  # DESHABILITADO
-    # path('reportes/estadisticas-mensuales/', views.estadisticas_mensuales, name='estadisticas_mensuales'),  # DESHABILITADO
+    path('reportes/ocupacion-parqueos/', views.reporte_ocupacion_parqueos, name='reporte_ocupacion_parqueos'),
+    path('reportes/estadisticas-mensuales/', views.estadisticas_mensuales, name='estadisticas_mensuales'),
+    path('reportes/estadisticas-tendencia/', views.tendencia_mensual, name='tendencia_mensual'),
     
     # Notificaciones (DESHABILITADO - requiere tabla notificaciones)
     # path('notificaciones/', views.listar_notificaciones, name='listar_notificaciones'),
@@ -128,6 +137,9 @@ urlpatterns = [
     # Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
     
+    # Métricas (Prometheus, solo administradores)
+    path('metrics/', views.metricas, name='metricas'),
+    
     # Endpoints genéricos (mantener para compatibilidad)
     path('<str:model_name>/', views.listar, name='listar'),
     path('<str:model_name>/crear/', views.crear, name='crear'),
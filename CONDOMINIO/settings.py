@@ -68,6 +68,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la latencia completa de cada petición
+    'core.metricas.MetricasMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -150,11 +152,60 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST', 'condominio-flutter.postgres.database.azure.com'),
         'PORT': os.environ.get('DB_PORT', '5432'),
         'OPTIONS': {
-            'sslmode': 'require',  # Azure PostgreSQL requiere SSL
-        }
+            'sslmode': os.environ.get('DB_SSLMODE', 'require'),  # Azure PostgreSQL requiere SSL
+        },
+        # Verifica la conexión persistente antes de reutilizarla en cada petición
+        # (con el pool Django lo ignora: el chequeo lo hace 'check', abajo)
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Manejo de conexiones (DB_POOL_MODE):
+#   persistent - una conexión persistente por worker, reciclada cada DB_CONN_MAX_AGE segundos
+#   pool       - pool de psycopg 3 (psycopg_pool) con límites de tamaño y reciclado
+#   pgbouncer  - conexiones persistentes contra pgbouncer en modo transacción
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'persistent').lower()
+
+if DB_POOL_MODE == 'pool':
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['CONN_MAX_AGE'] = 0  # el pool ya reutiliza las conexiones
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'name': 'condominio',
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),  # espera máxima por una conexión
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '1800')),  # reciclado
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '300')),
+        'check': ConnectionPool.check_connection,  # descarta la conexión rota al entregarla
+    }
+elif DB_POOL_MODE == 'pgbouncer':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+    # En modo transacción no se pueden mantener cursores del lado del servidor
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '600'))
+
+# DB_ENGINE=sqlite usa una base SQLite local (p. ej. `DB_ENGINE=sqlite python
+# manage.py test`); las pruebas que necesitan PostgreSQL se omiten.
+if os.environ.get('DB_ENGINE', '').lower() == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+
+# Crea las tablas no administradas de core en la base de pruebas (ver core/pruebas.py)
+TEST_RUNNER = 'core.pruebas.EjecutorPruebas'
+
+# Caché en memoria del proceso para instantáneas (dashboard, etc.; ver core/cache.py).
+# Con varios workers de gunicorn cada uno mantiene la suya; para compartirla
+# entre workers basta con apuntar este backend a Redis/Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'condominio-core',
+    }
+}
 
 
 # Password validation
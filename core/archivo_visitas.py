@@ -0,0 +1,78 @@
+"""
+Archivo de visitas antiguas.
+
+visitas queda como tabla "caliente": las visitas cerradas con entrada
+anterior al corte se mueven por lotes a visitas_archivo (archivar()), así
+los listados recientes y las búsquedas de visitas abiertas (salida IS NULL)
+no recorren el historial. Las visitas abiertas nunca se archivan.
+
+La vista visitas_historico (VisitaHistorica) une ambas tablas para los
+reportes históricos y para los listados de visitas (listar_visitas y el
+listado genérico de Visita), así una visita archivada sigue apareciendo.
+visitas_entre() elige dónde consultar: si el rango empieza después de la
+última entrada archivada basta la tabla caliente. Las visitas archivadas son
+de solo lectura: registrar su salida responde que ya salió y modificarlas o
+eliminarlas por el endpoint genérico responde 409.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Visita, VisitaArchivada, VisitaHistorica
+
+TAMANO_LOTE = 5000
+COLUMNAS = 'id, visitante_id, vivienda_destino_id, entrada, salida, medio'
+
+
+def primer_dia_meses_atras(meses, hoy=None):
+    hoy = hoy or timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - meses
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def ultima_archivada():
+    """Entrada más reciente en visitas_archivo (búsqueda por índice), o None."""
+    return VisitaArchivada.objects.aggregate(ultima=Max('entrada'))['ultima']
+
+
+def visitas_entre(desde=None, hasta=None):
+    """Queryset de visitas con entrada en [desde, hasta), sobre la tabla caliente si alcanza."""
+    ultima = ultima_archivada()
+    modelo = Visita if ultima is None or (desde is not None and desde > ultima) else VisitaHistorica
+    qs = modelo.objects.all()
+    if desde is not None:
+        qs = qs.filter(entrada__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(entrada__lt=hasta)
+    return qs
+
+
+def archivar(corte, lote=TAMANO_LOTE, progreso=None):
+    """
+    Mueve a visitas_archivo las visitas cerradas con entrada < corte, en
+    transacciones de a `lote` filas. Devuelve el total movido.
+    """
+    visitas = Visita._meta.db_table
+    archivo = VisitaArchivada._meta.db_table
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Visita.objects.filter(entrada__lt=corte, salida__isnull=False)
+                .order_by('entrada', 'id')
+                .values_list('id', flat=True)[:lote]
+            )
+            if not ids:
+                return total
+            marcas = ', '.join(['%s'] * len(ids))
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {archivo} ({COLUMNAS}) SELECT {COLUMNAS} FROM {visitas} WHERE id IN ({marcas})',
+                    ids,
+                )
+                cursor.execute(f'DELETE FROM {visitas} WHERE id IN ({marcas})', ids)
+        total += len(ids)
+        if progreso is not None:
+            progreso(total)
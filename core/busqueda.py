@@ -0,0 +1,122 @@
+"""
+Búsqueda por prefijo de visitantes y personas.
+
+Cada nombre, apellido y documento se parte en términos normalizados (sin
+tildes, en minúsculas, solo letras y dígitos; el documento también entero,
+sin separadores) que se guardan en terminos_busqueda con un índice
+(modelo, termino, objeto_id). Una búsqueda recorre ese índice por rango
+[prefijo, prefijo siguiente) del término más largo de la consulta, exige los
+demás términos con EXISTS y corta con LIMIT, así que el costo depende del
+límite y no del tamaño de la tabla. El orden es el del índice, alfabético
+por término encontrado: la coincidencia exacta es la menor cadena del rango
+y sale primero; el resto sigue en orden alfabético, no por largo (ordenar
+por largo obligaría a leer y ordenar todo el rango antes del LIMIT).
+
+En PostgreSQL la columna termino usa la intercalación "C" (migración 0017)
+para que el orden del índice sea el de los bytes, igual que en SQLite.
+
+Las señales de core.signals mantienen los términos al crear, modificar o
+eliminar filas; reindexar() los reconstruye para cargas por fuera del ORM.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Persona, TerminoBusqueda, Visitante
+
+MODELOS = {Visitante: 'VISITANTE', Persona: 'PERSONA'}
+MAX_TERMINOS_CONSULTA = 5
+TAMANO_LOTE = 5000
+
+
+def normalizar(texto):
+    """Términos de un texto: sin tildes, en minúsculas, solo letras y dígitos."""
+    if not texto:
+        return []
+    ascii_ = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.findall(r'[a-z0-9]+', ascii_.lower())
+
+
+def terminos_de(instancia):
+    terminos = set(normalizar(instancia.nombres)) | set(normalizar(instancia.apellidos))
+    documento = normalizar(instancia.num_doc)
+    terminos.update(documento)
+    if len(documento) > 1:
+        terminos.add(''.join(documento))
+    return terminos
+
+
+def _filas(modelo, instancias):
+    etiqueta = MODELOS[modelo]
+    for instancia in instancias:
+        for termino in terminos_de(instancia):
+            yield TerminoBusqueda(modelo=etiqueta, objeto_id=instancia.pk, termino=termino)
+
+
+def indexar(instancia):
+    """Reemplaza los términos de la fila."""
+    modelo = type(instancia)
+    with transaction.atomic():
+        TerminoBusqueda.objects.filter(modelo=MODELOS[modelo], objeto_id=instancia.pk).delete()
+        TerminoBusqueda.objects.bulk_create(_filas(modelo, [instancia]))
+
+
+def desindexar(instancia):
+    TerminoBusqueda.objects.filter(modelo=MODELOS[type(instancia)], objeto_id=instancia.pk).delete()
+
+
+def indexar_lote(modelo, instancias):
+    """Términos de filas recién creadas en lote."""
+    TerminoBusqueda.objects.bulk_create(_filas(modelo, instancias), batch_size=TAMANO_LOTE)
+
+
+def reindexar(modelo=None):
+    """Reconstruye los términos de un modelo (o de todos); devuelve {etiqueta: filas indexadas}."""
+    resultado = {}
+    for actual, etiqueta in MODELOS.items():
+        if modelo is not None and actual is not modelo:
+            continue
+        with transaction.atomic():
+            TerminoBusqueda.objects.filter(modelo=etiqueta).delete()
+            filas = actual.objects.only('id', 'nombres', 'apellidos', 'num_doc').order_by('id')
+            lote = []
+            total = 0
+            for instancia in filas.iterator(chunk_size=TAMANO_LOTE):
+                lote.append(instancia)
+                if len(lote) == TAMANO_LOTE:
+                    indexar_lote(actual, lote)
+                    total += len(lote)
+                    lote = []
+            indexar_lote(actual, lote)
+            resultado[etiqueta] = total + len(lote)
+    return resultado
+
+
+def _rango(prefijo):
+    """Cota superior exclusiva de las cadenas que empiezan con prefijo (términos ASCII)."""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def buscar(modelo, consulta, limite):
+    """Ids del modelo cuyos términos empiezan con todos los de la consulta, ordenados por relevancia."""
+    terminos = sorted(set(normalizar(consulta)), key=len, reverse=True)[:MAX_TERMINOS_CONSULTA]
+    if not terminos:
+        return []
+    etiqueta = MODELOS[modelo]
+    guia, resto = terminos[0], terminos[1:]
+    qs = TerminoBusqueda.objects.filter(modelo=etiqueta, termino__gte=guia, termino__lt=_rango(guia))
+    for termino in resto:
+        qs = qs.filter(Exists(TerminoBusqueda.objects.filter(
+            modelo=etiqueta, objeto_id=OuterRef('objeto_id'),
+            termino__gte=termino, termino__lt=_rango(termino),
+        )))
+    # Una fila puede tener más de un término con el mismo prefijo: se piden de más y se deduplican
+    ids = []
+    for objeto_id in qs.order_by('termino', 'objeto_id').values_list('objeto_id', flat=True)[:limite * 3]:
+        if objeto_id not in ids:
+            ids.append(objeto_id)
+            if len(ids) == limite:
+                break
+    return ids
@@ -0,0 +1,66 @@
+"""
+Instantáneas en caché de consultas costosas de core.
+
+Se usa el caché por defecto de Django (LocMemCache si no se configura otro,
+es decir, memoria del proceso). Las señales de core.signals invalidan las
+claves cuando cambian los modelos de origen; el TTL acota lo desactualizado
+que puede quedar un worker que no recibió la escritura.
+"""
+import time
+
+from django.core.cache import cache
+
+DASHBOARD_KEY = 'core:dashboard'
+DASHBOARD_TTL = 60  # segundos
+
+
+def obtener_dashboard(calcular):
+    """Devuelve la instantánea del dashboard, recalculándola si no está en caché."""
+    datos = cache.get(DASHBOARD_KEY)
+    if datos is None:
+        datos = calcular()
+        cache.set(DASHBOARD_KEY, datos, DASHBOARD_TTL)
+    return datos
+
+
+def invalidar_dashboard():
+    cache.delete(DASHBOARD_KEY)
+
+
+# Disponibilidad de áreas comunes: intervalos libres por (área, día). Cada
+# área tiene un número de versión en la clave; cambiar una reserva lo
+# incrementa y deja obsoletos todos los días cacheados de esa área. Si la
+# versión se pierde se arranca desde el reloj, nunca desde un valor ya usado.
+DISPONIBILIDAD_TTL = 300  # segundos
+
+
+def _clave_version_area(area_id):
+    return f'core:disponibilidad:{area_id}:version'
+
+
+def claves_disponibilidad(area_id, dias):
+    version = cache.get_or_set(_clave_version_area(area_id), time.time_ns, None)
+    return {dia: f'core:disponibilidad:{area_id}:v{version}:{dia.isoformat()}' for dia in dias}
+
+
+def obtener_disponibilidad(area_id, dias):
+    """
+    ({día: intervalos libres} de los días que estén en caché, {día: clave}).
+    Lo que se calcule con lo leído se guarda con esas mismas claves: si una
+    reserva cambia la versión mientras tanto, el resultado queda bajo la
+    versión vieja y nadie lo vuelve a leer.
+    """
+    claves = claves_disponibilidad(area_id, dias)
+    encontrados = cache.get_many(claves.values())
+    return {dia: encontrados[clave] for dia, clave in claves.items() if clave in encontrados}, claves
+
+
+def guardar_disponibilidad(claves, libres_por_dia):
+    cache.set_many({claves[dia]: libres for dia, libres in libres_por_dia.items()}, DISPONIBILIDAD_TTL)
+
+
+def invalidar_disponibilidad(area_id):
+    try:
+        cache.incr(_clave_version_area(area_id))
+    except ValueError:
+        cache.set(_clave_version_area(area_id), time.time_ns(), None)
@@ -0,0 +1,207 @@
+"""
+Conciliación de pagos confirmados contra expensas y multas pendientes.
+
+Cada pago de concepto EXPENSA o MULTA se aplica primero a la deuda indicada
+en referencia_cod (el id de la expensa o multa, si es de la misma vivienda)
+y el resto, en orden FIFO, a las deudas abiertas más antiguas de la vivienda
+que ya son exigibles a la fecha del pago: expensas de ese mes o anteriores y
+multas con fecha hasta la del pago. Lo que sobra es saldo a favor: después
+de aplicar todos los pagos se usa, en orden de pago, para las deudas que ya
+son exigibles a la fecha de la conciliación, y el resto queda como aplicación
+sin deuda. Cada conciliación incremental vuelve a tomar esos saldos, así que
+un adelanto cubre la deuda cuando esta vence. Los pagos de monto cero no se
+concilian. Las aplicaciones se guardan en aplicaciones_pago y las deudas
+cubiertas por completo pasan a PAGADA.
+
+Las deudas se cargan una vez en diccionarios por id y por vivienda (hash
+join), así que el costo es lineal en pagos + deudas y no depende de cuántos
+pagos tenga cada vivienda. Los cambios de estado se hacen con update(), así
+que al final se rehacen los meses afectados de estadisticas_mensuales.
+"""
+from collections import defaultdict, deque
+from decimal import Decimal
+from itertools import chain
+
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.utils import timezone
+
+from . import estadisticas
+from .cache import invalidar_dashboard
+from .models import AplicacionPago, Expensa, Multa, Pago
+
+CONCEPTOS = {'EXPENSA': Expensa, 'MULTA': Multa}
+CLAVE_BLOQUEO = 7310  # pg_advisory_xact_lock: una conciliación a la vez
+TAMANO_LOTE = 1000
+CERO = Decimal('0')
+
+
+def _deudas_abiertas(modelo, viviendas, orden, campo_corte):
+    """
+    Saldo pendiente de las deudas PENDIENTE de las viviendas dadas, indexado
+    por id y en colas FIFO por vivienda. `campo_corte` (periodo o fecha) se
+    guarda en 'corte' para saber desde cuándo es exigible; `orden` empieza por él.
+    """
+    qs = modelo.objects.filter(estado='PENDIENTE')
+    if viviendas is not None:
+        qs = qs.filter(vivienda_id__in=viviendas)
+    campo = modelo._meta.model_name
+    aplicado = dict(
+        AplicacionPago.objects.filter(**{f'{campo}__in': qs.values('id')})
+        .values_list(f'{campo}_id').annotate(total=Sum('monto'))
+    )
+
+    por_id = {}
+    por_vivienda = defaultdict(deque)
+    filas = qs.order_by(*orden).values('id', 'vivienda_id', 'monto', corte=F(campo_corte))
+    for deuda in filas.iterator(chunk_size=5000):
+        saldo = (deuda['monto'] or CERO) - aplicado.get(deuda['id'], CERO)
+        if saldo <= 0:
+            continue
+        deuda['saldo'] = saldo
+        por_id[deuda['id']] = deuda
+        por_vivienda[deuda['vivienda_id']].append(deuda)
+    return por_id, por_vivienda
+
+
+def _exigible(concepto, deuda, fecha_pago):
+    """Si la deuda ya vencía a la fecha del pago (expensa del mes o anterior, multa hasta esa fecha)."""
+    if deuda['corte'] is None:
+        return True
+    if concepto == 'EXPENSA':
+        return deuda['corte'] <= timezone.localtime(fecha_pago).strftime('%Y-%m')
+    return deuda['corte'] <= fecha_pago
+
+
+def _aplicar(pago, restante, cola, referida, fecha_corte, aplicaciones, saldadas):
+    """
+    Aplica `restante` a la deuda referida y luego, en orden FIFO, a las de la
+    cola exigibles a `fecha_corte`. Devuelve lo que sobra.
+    """
+    campo = CONCEPTOS[pago['concepto']]._meta.model_name
+    candidatas = chain((referida,), cola) if referida else cola
+    for deuda in candidatas:
+        if restante <= 0:
+            break
+        if deuda['saldo'] <= 0:
+            continue
+        # La cola está ordenada por vencimiento: desde aquí son deudas futuras
+        # (la referida se paga aunque todavía no venza, el pago la nombra)
+        if deuda is not referida and not _exigible(pago['concepto'], deuda, fecha_corte):
+            break
+        monto = min(restante, deuda['saldo'])
+        deuda['saldo'] -= monto
+        restante -= monto
+        aplicaciones.append(AplicacionPago(
+            pago_id=pago['id'], monto=monto, por_referencia=deuda is referida,
+            **{f'{campo}_id': deuda['id']},
+        ))
+        if deuda['saldo'] <= 0:
+            saldadas[pago['concepto']].append(deuda['id'])
+    # Las deudas saldadas se descartan del frente de la cola
+    while cola and cola[0]['saldo'] <= 0:
+        cola.popleft()
+    return restante
+
+
+def _saldos_a_favor():
+    """Aplicaciones sin deuda de pagos conciliables, agrupadas por pago: [(pago, saldo, ids)]."""
+    filas = (AplicacionPago.objects
+             .filter(expensa__isnull=True, multa__isnull=True,
+                     pago__estado='CONFIRMADO', pago__concepto__in=CONCEPTOS)
+             .values('id', 'pago_id', 'pago__vivienda_id', 'pago__concepto', 'monto'))
+    por_pago = {}
+    for fila in filas:
+        pago = {'id': fila['pago_id'], 'vivienda_id': fila['pago__vivienda_id'], 'concepto': fila['pago__concepto']}
+        actual = por_pago.setdefault(fila['pago_id'], [pago, CERO, []])
+        actual[1] += fila['monto']
+        actual[2].append(fila['id'])
+    return [tuple(actual) for actual in por_pago.values()]
+
+
+def conciliar_pagos(incremental=True):
+    """
+    Concilia los pagos CONFIRMADO. En modo incremental toma los pagos sin
+    aplicaciones y los saldos a favor que quedaron de conciliaciones
+    anteriores; en modo completo descarta las aplicaciones anteriores,
+    devuelve a PENDIENTE las deudas que había saldado y rehace todo.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CLAVE_BLOQUEO])
+
+        if not incremental:
+            for modelo in CONCEPTOS.values():
+                campo = modelo._meta.model_name
+                modelo.objects.filter(
+                    estado='PAGADA',
+                    id__in=AplicacionPago.objects.filter(**{f'{campo}__isnull': False}).values(f'{campo}_id'),
+                ).update(estado='PENDIENTE')
+            AplicacionPago.objects.all().delete()
+
+        pagos = Pago.objects.filter(estado='CONFIRMADO', concepto__in=CONCEPTOS, monto__gt=0)
+        if incremental:
+            pagos = pagos.filter(~Exists(AplicacionPago.objects.filter(pago_id=OuterRef('id'))))
+        pagos = list(pagos.order_by('id').values('id', 'vivienda_id', 'concepto', 'referencia_cod', 'monto', 'fecha'))
+        anteriores = _saldos_a_favor() if incremental else []
+        ahora = timezone.now()
+        if not pagos and not anteriores and incremental:
+            return {'modo': 'incremental' if incremental else 'completo', 'pagos': 0,
+                    'aplicaciones': 0, 'expensas_pagadas': 0, 'multas_pagadas': 0}
+
+        # En incremental basta con las deudas de las viviendas que pagaron o tienen saldo a favor
+        viviendas = {p['vivienda_id'] for p in chain(pagos, (a[0] for a in anteriores))} if incremental else None
+        deudas = {
+            'EXPENSA': _deudas_abiertas(Expensa, viviendas, ('periodo', 'id'), 'periodo'),
+            'MULTA': _deudas_abiertas(Multa, viviendas, (F('fecha').asc(nulls_first=True), 'id'), 'fecha'),
+        }
+
+        aplicaciones = []
+        saldadas = {'EXPENSA': [], 'MULTA': []}
+        a_favor = []
+        for pago in pagos:
+            por_id, por_vivienda = deudas[pago['concepto']]
+            referida = por_id.get(pago['referencia_cod'])
+            if referida is not None and referida['vivienda_id'] != pago['vivienda_id']:
+                referida = None
+            restante = _aplicar(pago, pago['monto'], por_vivienda[pago['vivienda_id']], referida,
+                                pago['fecha'] or ahora, aplicaciones, saldadas)
+            if restante > 0:
+                a_favor.append((pago, restante, []))
+
+        # Saldos a favor, nuevos y anteriores: cubren lo que ya vence a la fecha de la conciliación
+        reemplazadas = []
+        for pago, saldo, ids in sorted(chain(a_favor, anteriores), key=lambda a: a[0]['id']):
+            por_vivienda = deudas[pago['concepto']][1]
+            restante = _aplicar(pago, saldo, por_vivienda[pago['vivienda_id']], None, ahora, aplicaciones, saldadas)
+            if ids and restante == saldo:
+                continue  # saldo anterior sin deuda nueva: la fila queda como está
+            reemplazadas.extend(ids)
+            if restante > 0:
+                aplicaciones.append(AplicacionPago(pago_id=pago['id'], monto=restante))
+
+        for i in range(0, len(reemplazadas), TAMANO_LOTE):
+            AplicacionPago.objects.filter(id__in=reemplazadas[i:i + TAMANO_LOTE]).delete()
+        AplicacionPago.objects.bulk_create(aplicaciones, batch_size=TAMANO_LOTE)
+        for concepto, ids in saldadas.items():
+            for i in range(0, len(ids), TAMANO_LOTE):
+                CONCEPTOS[concepto].objects.filter(id__in=ids[i:i + TAMANO_LOTE]).update(estado='PAGADA')
+
+        # update() no emite señales: se rehacen los meses tocados de estadisticas_mensuales
+        if incremental:
+            for concepto, ids in saldadas.items():
+                estadisticas.refrescar(CONCEPTOS[concepto], ids)
+        else:
+            estadisticas.recalcular(('EXPENSAS', 'MULTAS'))
+
+    if saldadas['EXPENSA'] or saldadas['MULTA'] or not incremental:
+        invalidar_dashboard()
+
+    return {
+        'modo': 'incremental' if incremental else 'completo',
+        'pagos': len(pagos),
+        'aplicaciones': len(aplicaciones),
+        'expensas_pagadas': len(saldadas['EXPENSA']),
+        'multas_pagadas': len(saldadas['MULTA']),
+    }
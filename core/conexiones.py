@@ -0,0 +1,39 @@
+"""
+Utilidades sobre las conexiones a la base de datos (ver DB_POOL_MODE en settings).
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def obtener_pool(alias='default'):
+    """Devuelve el psycopg_pool.ConnectionPool del alias, o None si no hay pool."""
+    return getattr(connections[alias], 'pool', None)
+
+
+def estadisticas_pool(alias='default'):
+    """
+    Estadísticas del pool de conexiones, incluido el tiempo de espera promedio
+    por conexión. Sin pool devuelve solo el modo configurado.
+    """
+    datos = {'modo': settings.DB_POOL_MODE}
+    pool = obtener_pool(alias)
+    if pool is None:
+        return datos
+    stats = pool.get_stats()
+    solicitudes = stats.get('requests_num', 0)
+    espera_ms = stats.get('requests_wait_ms', 0)
+    datos.update({
+        'tamano': stats.get('pool_size', 0),
+        'disponibles': stats.get('pool_available', 0),
+        'min_size': pool.min_size,
+        'max_size': pool.max_size,
+        'esperando': stats.get('requests_waiting', 0),
+        'solicitudes': solicitudes,
+        'solicitudes_en_cola': stats.get('requests_queued', 0),
+        'solicitudes_con_error': stats.get('requests_errors', 0),
+        'espera_total_ms': espera_ms,
+        'espera_promedio_ms': round(espera_ms / solicitudes, 3) if solicitudes else 0,
+        'conexiones_creadas': stats.get('connections_num', 0),
+        'conexiones_perdidas': stats.get('connections_lost', 0),
+    })
+    return datos
@@ -0,0 +1,253 @@
+"""
+Estadísticas mensuales materializadas.
+
+estadisticas_mensuales guarda, por mes (YYYY-MM), concepto y estado, la
+cantidad y el monto de visitas (por mes de entrada), expensas (por periodo)
+y multas (por mes de la fecha). Leer un mes, compararlo con el anterior o
+armar una tendencia de varios años es una consulta sobre pocas filas.
+
+Las señales de core.signals suman o restan cada cambio dentro de la misma
+transacción que escribe la fila (el aporte anterior se lee en pre_save;
+save() y delete() de esos modelos siempre corren en una transacción). Las
+actualizaciones por queryset, que no emiten señales, llaman a refrescar()
+con los ids tocados; recalcular() reconstruye todo desde las tablas de
+origen, incluidas las visitas archivadas.
+
+Cada ajuste toma CLAVE_BLOQUEO compartida y recalcular() la toma exclusiva
+antes de leer el origen: espera a que confirmen las transacciones que ya
+ajustaron (y así las cuenta una vez), y las que ajusten después suman sobre
+el total recalculado sin que sus filas hayan entrado en él.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import EstadisticaMensual, Expensa, Multa, Visita, VisitaArchivada, VisitaHistorica
+
+CONCEPTOS = {Visita: 'VISITAS', Expensa: 'EXPENSAS', Multa: 'MULTAS'}
+# Las visitas archivadas siguen sumando a VISITAS; solo cambian al borrarse (en cascada)
+ARCHIVADOS = {VisitaArchivada: 'VISITAS'}
+# Campos que cambian el aporte de una fila; si un save(update_fields=...) no toca ninguno se ignora
+CAMPOS = {Visita: {'entrada'}, Expensa: {'periodo', 'estado', 'monto'}, Multa: {'fecha', 'estado', 'monto'}}
+CERO = Decimal('0')
+TAMANO_LOTE = 1000
+CLAVE_BLOQUEO = 7311  # pg_advisory_xact_lock: compartida al ajustar, exclusiva al recalcular
+
+
+def _bloquear(compartido):
+    if connection.vendor == 'postgresql':
+        funcion = 'pg_advisory_xact_lock_shared' if compartido else 'pg_advisory_xact_lock'
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {funcion}(%s)', [CLAVE_BLOQUEO])
+
+
+def _valor(instancia, campo):
+    return instancia._meta.get_field(campo).to_python(getattr(instancia, campo))
+
+
+def _mes(valor):
+    if valor is None:
+        return None
+    if timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.strftime('%Y-%m')
+
+
+def aporte(instancia):
+    """(periodo, estado, monto) con que la fila suma a las estadísticas, o None."""
+    if isinstance(instancia, (Visita, VisitaArchivada)):
+        periodo = _mes(_valor(instancia, 'entrada'))
+        return (periodo, '', CERO) if periodo else None
+    if isinstance(instancia, Expensa):
+        return instancia.periodo, instancia.estado or '', _valor(instancia, 'monto') or CERO
+    periodo = _mes(_valor(instancia, 'fecha'))
+    if periodo is None:
+        return None
+    return periodo, instancia.estado or '', _valor(instancia, 'monto') or CERO
+
+
+def _sumar(concepto, periodo, estado, cantidad, monto):
+    filtro = {'periodo': periodo, 'concepto': concepto, 'estado': estado}
+    cambios = {'cantidad': F('cantidad') + cantidad, 'monto': F('monto') + monto}
+    if EstadisticaMensual.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            EstadisticaMensual.objects.create(cantidad=cantidad, monto=monto, **filtro)
+    except IntegrityError:
+        # Otra transacción creó la fila entre el UPDATE y el INSERT
+        EstadisticaMensual.objects.filter(**filtro).update(**cambios)
+
+
+def _aplicar(concepto, deltas):
+    """deltas: {(periodo, estado): [cantidad, monto]}; se aplican en la transacción en curso."""
+    deltas = {clave: valor for clave, valor in deltas.items() if valor[0] or valor[1]}
+    if not deltas:
+        return
+    with transaction.atomic():
+        _bloquear(compartido=True)
+        for (periodo, estado), (cantidad, monto) in sorted(deltas.items()):
+            _sumar(concepto, periodo, estado, cantidad, monto)
+            if cantidad < 0:
+                # Sin filas de origen no queda fila, igual que tras recalcular()
+                EstadisticaMensual.objects.filter(periodo=periodo, concepto=concepto, estado=estado,
+                                                  cantidad=0).delete()
+
+
+def _acumular(deltas, contribucion, signo):
+    if contribucion is None:
+        return
+    periodo, estado, monto = contribucion
+    actual = deltas.setdefault((periodo, estado), [0, CERO])
+    actual[0] += signo
+    actual[1] += monto * signo
+
+
+def antes_de_guardar(instancia, update_fields=None):
+    """Guarda en la instancia el aporte que tenía en la base antes del cambio."""
+    modelo = type(instancia)
+    if update_fields is not None and not CAMPOS[modelo] & set(update_fields):
+        instancia._estadistica_sin_cambios = True
+        return
+    instancia._estadistica_sin_cambios = False
+    anterior = None
+    if not instancia._state.adding and instancia.pk is not None:
+        anterior = modelo.objects.filter(pk=instancia.pk).first()
+    instancia._estadistica_anterior = aporte(anterior) if anterior is not None else None
+
+
+def registrar(instancia):
+    if getattr(instancia, '_estadistica_sin_cambios', False):
+        return
+    deltas = {}
+    _acumular(deltas, getattr(instancia, '_estadistica_anterior', None), -1)
+    _acumular(deltas, aporte(instancia), 1)
+    _aplicar(CONCEPTOS[type(instancia)], deltas)
+
+
+def eliminar(instancia):
+    modelo = type(instancia)
+    deltas = {}
+    _acumular(deltas, aporte(instancia), -1)
+    _aplicar(CONCEPTOS.get(modelo) or ARCHIVADOS[modelo], deltas)
+
+
+def registrar_lote(modelo, instancias):
+    """Suma filas recién creadas en lote (o creadas por SQL directo)."""
+    deltas = {}
+    for instancia in instancias:
+        _acumular(deltas, aporte(instancia), 1)
+    _aplicar(CONCEPTOS[modelo], deltas)
+
+
+def _limites_mes(periodo):
+    anio, mes = map(int, periodo.split('-'))
+    siguiente = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    inicio = timezone.make_aware(datetime.combine(date(anio, mes, 1), time.min))
+    fin = timezone.make_aware(datetime.combine(date(*siguiente, 1), time.min))
+    return inicio, fin
+
+
+def _en_meses(campo, periodos):
+    filtro = Q()
+    for periodo in periodos:
+        inicio, fin = _limites_mes(periodo)
+        filtro |= Q(**{f'{campo}__gte': inicio, f'{campo}__lt': fin})
+    return filtro
+
+
+def _totales(concepto, periodos=None):
+    """Filas (periodo, estado, cantidad, monto) calculadas desde las tablas de origen."""
+    if concepto == 'EXPENSAS':
+        qs = Expensa.objects.all()
+        if periodos is not None:
+            qs = qs.filter(periodo__in=periodos)
+        for fila in qs.values('periodo', 'estado').annotate(cantidad=Count('id'), total=Sum('monto')):
+            yield fila['periodo'], fila['estado'] or '', fila['cantidad'], fila['total'] or CERO
+        return
+    if concepto == 'VISITAS':
+        qs = VisitaHistorica.objects.all()
+        if periodos is not None:
+            qs = qs.filter(_en_meses('entrada', periodos))
+        for fila in qs.annotate(mes=TruncMonth('entrada')).values('mes').annotate(cantidad=Count('id')):
+            yield _mes(fila['mes']), '', fila['cantidad'], CERO
+        return
+    qs = Multa.objects.exclude(fecha=None)
+    if periodos is not None:
+        qs = qs.filter(_en_meses('fecha', periodos))
+    filas = (qs.annotate(mes=TruncMonth('fecha')).values('mes', 'estado')
+             .annotate(cantidad=Count('id'), total=Sum('monto')))
+    for fila in filas:
+        yield _mes(fila['mes']), fila['estado'] or '', fila['cantidad'], fila['total'] or CERO
+
+
+def recalcular(conceptos=None, periodos=None):
+    """Reconstruye las filas de los conceptos (y meses) dados desde el origen; devuelve cuántas quedaron."""
+    conceptos = conceptos or tuple(CONCEPTOS.values())
+    with transaction.atomic():
+        _bloquear(compartido=False)
+        for concepto in conceptos:
+            existentes = EstadisticaMensual.objects.filter(concepto=concepto)
+            if periodos is not None:
+                existentes = existentes.filter(periodo__in=periodos)
+            existentes.delete()
+            EstadisticaMensual.objects.bulk_create(
+                EstadisticaMensual(periodo=periodo, concepto=concepto, estado=estado, cantidad=cantidad, monto=monto)
+                for periodo, estado, cantidad, monto in _totales(concepto, periodos)
+            )
+    return EstadisticaMensual.objects.count()
+
+
+def refrescar(modelo, ids):
+    """Recalcula los meses de las filas dadas (tras un queryset.update(), que no emite señales)."""
+    ids = list(ids)
+    periodos = set()
+    for i in range(0, len(ids), TAMANO_LOTE):
+        qs = modelo.objects.filter(id__in=ids[i:i + TAMANO_LOTE])
+        if modelo is Expensa:
+            periodos.update(qs.values_list('periodo', flat=True).distinct())
+        else:
+            campo = 'entrada' if modelo is Visita else 'fecha'
+            periodos.update(_mes(valor) for valor in qs.values_list(campo, flat=True))
+    periodos.discard(None)
+    if periodos:
+        recalcular((CONCEPTOS[modelo],), sorted(periodos))
+
+
+def periodo_de(anio, mes):
+    """'YYYY-MM' de un año y mes; ValueError si el mes no existe."""
+    return date(anio, mes, 1).strftime('%Y-%m')
+
+
+def mes_anterior(periodo):
+    anio, mes = map(int, periodo.split('-'))
+    return periodo_de(anio - 1, 12) if mes == 1 else periodo_de(anio, mes - 1)
+
+
+def periodos_entre(desde, hasta):
+    """Meses 'YYYY-MM' de desde a hasta, ambos incluidos."""
+    anio, mes = map(int, desde.split('-'))
+    fin = tuple(map(int, hasta.split('-')))
+    periodos = []
+    while (anio, mes) <= fin:
+        periodos.append(periodo_de(anio, mes))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return periodos
+
+
+def resumen_meses(periodos):
+    """{periodo: {concepto: {'cantidad', 'monto', 'por_estado'}}} de los meses dados, en una consulta."""
+    datos = {periodo: {} for periodo in periodos}
+    filas = EstadisticaMensual.objects.filter(periodo__in=periodos).values_list(
+        'periodo', 'concepto', 'estado', 'cantidad', 'monto'
+    )
+    for periodo, concepto, estado, cantidad, monto in filas:
+        actual = datos[periodo].setdefault(concepto, {'cantidad': 0, 'monto': CERO, 'por_estado': {}})
+        actual['cantidad'] += cantidad
+        actual['monto'] += monto
+        actual['por_estado'][estado] = {'cantidad': cantidad, 'monto': monto}
+    return datos
@@ -0,0 +1,238 @@
+"""
+Cuenta corriente por vivienda.
+
+Cada expensa y multa genera un cargo y cada pago CONFIRMADO un abono en
+movimientos_cuenta; saldos_vivienda guarda los totales para leer el saldo
+con una búsqueda por clave primaria. Las señales de core.signals mantienen
+ambas tablas al crear, modificar o eliminar filas (también en lote, vía
+post_bulk_create). recalcular_saldos() reconstruye todo con SQL set-based
+para cargas hechas por fuera del ORM; la migración 0011 hace la carga inicial.
+
+recalcular_saldos() deja una fila por vivienda, también con saldo cero. Una
+vivienda sin fila en saldos_vivienda es una vivienda cuyo saldo todavía no
+se calculó (creada después, o cargada por fuera del ORM): asegurar_saldo()
+la arma desde sus movimientos antes de ajustarla o mostrarla, nunca se
+parte de un cero supuesto.
+"""
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Expensa, Multa, MovimientoCuenta, Pago, SaldoVivienda, Vivienda
+
+ORIGENES = {Expensa: 'EXPENSA', Multa: 'MULTA', Pago: 'PAGO'}
+TAMANO_LOTE = 1000
+
+
+def _valor(instancia, campo):
+    """Valor del campo ya convertido a su tipo (las vistas asignan cadenas del JSON)."""
+    return instancia._meta.get_field(campo).to_python(getattr(instancia, campo))
+
+
+def movimiento_de(instancia):
+    """(fecha, importe) del movimiento que corresponde a la fila, o None si no genera ninguno."""
+    if isinstance(instancia, Pago):
+        if instancia.estado != 'CONFIRMADO':
+            return None
+        importe = -_valor(instancia, 'monto')
+        fecha = _valor(instancia, 'fecha')
+    elif isinstance(instancia, Multa):
+        monto = _valor(instancia, 'monto')
+        if monto is None:
+            return None
+        importe = monto
+        fecha = _valor(instancia, 'fecha')
+    else:
+        importe = _valor(instancia, 'monto')
+        fecha = _valor(instancia, 'vencimiento') or f'{instancia.periodo}-01'
+    if fecha is None:
+        fecha = timezone.now().date()
+    elif isinstance(fecha, str):
+        fecha = MovimientoCuenta._meta.get_field('fecha').to_python(fecha)
+    elif hasattr(fecha, 'date'):
+        fecha = fecha.date()
+    return fecha, importe
+
+
+def asegurar_saldo(vivienda_id):
+    """Crea la fila de saldos_vivienda desde los movimientos de la vivienda si todavía no existe."""
+    if not SaldoVivienda.objects.filter(vivienda_id=vivienda_id).exists():
+        _crear_saldos([vivienda_id])
+
+
+def _ajustar(vivienda_id, importe, signo=1):
+    """Suma (signo=1) o resta (signo=-1) un importe al saldo de la vivienda (ver asegurar_saldo)."""
+    delta = importe * signo
+    cambios = {'saldo': F('saldo') + delta}
+    if importe > 0:
+        cambios['cargos'] = F('cargos') + delta
+    else:
+        cambios['abonos'] = F('abonos') - delta
+    SaldoVivienda.objects.filter(vivienda_id=vivienda_id).update(**cambios)
+
+
+def registrar(instancia):
+    """Crea, actualiza o elimina el movimiento de la fila y ajusta los saldos por la diferencia."""
+    origen = ORIGENES[type(instancia)]
+    nuevo = movimiento_de(instancia)
+    with transaction.atomic():
+        anterior = (MovimientoCuenta.objects.select_for_update()
+                    .filter(origen=origen, origen_id=instancia.pk).first())
+        # Antes de tocar el movimiento, para que el saldo armado no lo incluya dos veces
+        if anterior is not None:
+            asegurar_saldo(anterior.vivienda_id)
+        if nuevo is not None:
+            asegurar_saldo(instancia.vivienda_id)
+        if anterior is not None:
+            _ajustar(anterior.vivienda_id, anterior.importe, signo=-1)
+        if nuevo is None:
+            if anterior is not None:
+                anterior.delete()
+            return
+        fecha, importe = nuevo
+        if anterior is None:
+            MovimientoCuenta.objects.create(
+                vivienda_id=instancia.vivienda_id, origen=origen, origen_id=instancia.pk,
+                fecha=fecha, importe=importe,
+            )
+        else:
+            anterior.vivienda_id = instancia.vivienda_id
+            anterior.fecha = fecha
+            anterior.importe = importe
+            anterior.save(update_fields=['vivienda', 'fecha', 'importe'])
+        _ajustar(instancia.vivienda_id, importe)
+
+
+def eliminar(instancia):
+    """Quita el movimiento de una fila eliminada y lo descuenta del saldo."""
+    with transaction.atomic():
+        anterior = (MovimientoCuenta.objects.select_for_update()
+                    .filter(origen=ORIGENES[type(instancia)], origen_id=instancia.pk).first())
+        if anterior is not None:
+            asegurar_saldo(anterior.vivienda_id)
+            _ajustar(anterior.vivienda_id, anterior.importe, signo=-1)
+            anterior.delete()
+
+
+def registrar_lote(modelo, instancias):
+    """Movimientos de filas recién creadas en lote; los saldos se recalculan por vivienda en SQL."""
+    origen = ORIGENES[modelo]
+    movimientos = []
+    for instancia in instancias:
+        movimiento = movimiento_de(instancia)
+        if movimiento is not None:
+            movimientos.append(MovimientoCuenta(
+                vivienda_id=instancia.vivienda_id, origen=origen, origen_id=instancia.pk,
+                fecha=movimiento[0], importe=movimiento[1],
+            ))
+    if not movimientos:
+        return
+    with transaction.atomic():
+        MovimientoCuenta.objects.bulk_create(movimientos, batch_size=TAMANO_LOTE, ignore_conflicts=True)
+        _recalcular_saldos(sorted({m.vivienda_id for m in movimientos}))
+
+
+def _a_fecha(expresion):
+    if connection.vendor == 'postgresql':
+        return f'CAST({expresion} AS date)'
+    return f'date({expresion})'
+
+
+def _sql_saldos(conflicto):
+    """INSERT ... SELECT de los totales por vivienda desde movimientos_cuenta, con {filtro}."""
+    return f"""
+        INSERT INTO {SaldoVivienda._meta.db_table} (vivienda_id, cargos, abonos, saldo, actualizado_en)
+        SELECT v.id,
+               COALESCE(SUM(CASE WHEN m.importe > 0 THEN m.importe END), 0),
+               COALESCE(-SUM(CASE WHEN m.importe < 0 THEN m.importe END), 0),
+               COALESCE(SUM(m.importe), 0), %s
+        FROM {Vivienda._meta.db_table} v
+        LEFT JOIN {MovimientoCuenta._meta.db_table} m ON m.vivienda_id = v.id
+        WHERE {{filtro}}
+        GROUP BY v.id
+        ON CONFLICT (vivienda_id) {conflicto}
+    """
+
+
+SQL_CREAR = _sql_saldos('DO NOTHING')
+SQL_ACTUALIZAR = _sql_saldos("""DO UPDATE SET
+            cargos = EXCLUDED.cargos,
+            abonos = EXCLUDED.abonos,
+            saldo = EXCLUDED.saldo,
+            actualizado_en = EXCLUDED.actualizado_en""")
+
+
+def _por_lotes(sql, viviendas):
+    ahora = timezone.now()
+    with connection.cursor() as cursor:
+        if viviendas is None:
+            cursor.execute(sql.format(filtro='1 = 1'), [ahora])
+            return
+        for i in range(0, len(viviendas), TAMANO_LOTE):
+            lote = viviendas[i:i + TAMANO_LOTE]
+            marcas = ', '.join(['%s'] * len(lote))
+            cursor.execute(sql.format(filtro=f'v.id IN ({marcas})'), [ahora, *lote])
+
+
+def _crear_saldos(viviendas):
+    """
+    Filas que faltan, armadas desde sus movimientos. Con DO NOTHING, si otra
+    transacción crea la misma fila a la vez se espera a que confirme y se
+    deja la suya (que ya ajustó o ajustará sus propios movimientos).
+    """
+    _por_lotes(SQL_CREAR, viviendas)
+
+
+def _recalcular_saldos(viviendas=None):
+    """
+    Rehace saldos_vivienda a partir de movimientos_cuenta (todas o las
+    viviendas dadas), con una fila por vivienda aunque no tenga movimientos.
+
+    Las filas se actualizan en su lugar (UPSERT), nunca se borran: un
+    _ajustar concurrente que espera sobre una fila borrada no actualizaría
+    nada y el importe se perdería. Antes se bloquean las filas existentes,
+    así la suma (una sentencia posterior, con una instantánea nueva en READ
+    COMMITTED) ya ve los movimientos de quien tenía el bloqueo, y quien
+    ajuste después suma sobre el total recalculado.
+    """
+    with transaction.atomic():
+        _crear_saldos(viviendas)
+        filas = SaldoVivienda.objects.select_for_update().order_by('vivienda_id')
+        if viviendas is None:
+            list(filas.values_list('vivienda_id', flat=True))
+        else:
+            for i in range(0, len(viviendas), TAMANO_LOTE):
+                list(filas.filter(vivienda_id__in=viviendas[i:i + TAMANO_LOTE]).values_list('vivienda_id', flat=True))
+        _por_lotes(SQL_ACTUALIZAR, viviendas)
+
+
+def recalcular_saldos():
+    """Reconstruye movimientos_cuenta y saldos_vivienda desde expensas, multas y pagos."""
+    movimientos = MovimientoCuenta._meta.db_table
+    primer_dia = _a_fecha("e.periodo || '-01'")
+    fecha_expensa = f'COALESCE(e.vencimiento, {primer_dia})'
+    hoy = timezone.now().date()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {movimientos}')
+        cursor.execute(f"""
+            INSERT INTO {movimientos} (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT e.vivienda_id, 'EXPENSA', e.id, {fecha_expensa}, e.monto
+            FROM {Expensa._meta.db_table} e
+        """)
+        cursor.execute(f"""
+            INSERT INTO {movimientos} (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT m.vivienda_id, 'MULTA', m.id, COALESCE({_a_fecha('m.fecha')}, %s), m.monto
+            FROM {Multa._meta.db_table} m
+            WHERE m.monto IS NOT NULL
+        """, [hoy])
+        cursor.execute(f"""
+            INSERT INTO {movimientos} (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT p.vivienda_id, 'PAGO', p.id, COALESCE({_a_fecha('p.fecha')}, %s), -p.monto
+            FROM {Pago._meta.db_table} p
+            WHERE p.estado = 'CONFIRMADO'
+        """, [hoy])
+        _recalcular_saldos()
+    return {
+        'movimientos': MovimientoCuenta.objects.count(),
+        'viviendas': SaldoVivienda.objects.count(),
+    }
@@ -0,0 +1,172 @@
+"""
+Motor de facturación de expensas a partir de ExpensaParametro.
+
+La generación de un periodo es un único INSERT ... SELECT sobre las viviendas
+activas con ON CONFLICT DO NOTHING sobre el índice único (vivienda_id,
+periodo) de la migración 0021: las que ya tienen expensa en ese periodo se
+omiten, también si otra petición la crea a la vez, por lo que volver a
+ejecutarla no duplica filas. Los recargos por mora se calculan con
+un UPSERT por lotes sobre recargos_expensa.
+"""
+import calendar
+import re
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Expensa, ExpensaParametro, RecargoExpensa, Vivienda
+from .signals import post_bulk_create
+
+PATRON_PERIODO = re.compile(r'^(\d{4})-(\d{2})$')
+COLUMNAS = ('id', 'codigo', 'vivienda_id', 'periodo', 'monto', 'vencimiento', 'estado')
+
+
+def validar_periodo(periodo):
+    """Devuelve (año, mes) de un periodo 'YYYY-MM'; lanza ValueError si no es válido."""
+    coincidencia = PATRON_PERIODO.match(periodo or '')
+    if not coincidencia or not 1 <= int(coincidencia.group(2)) <= 12:
+        raise ValueError("Periodo inválido, use el formato YYYY-MM")
+    return int(coincidencia.group(1)), int(coincidencia.group(2))
+
+
+def fecha_vencimiento(año, mes, dia):
+    """Día de vencimiento dentro del mes, ajustado al último día si no existe."""
+    if not dia:
+        return None
+    return date(año, mes, min(int(dia), calendar.monthrange(año, mes)[1]))
+
+
+def generar_expensas(periodo):
+    """
+    Genera las expensas del periodo para todas las viviendas activas.
+
+    El monto sale del ExpensaParametro vigente (el de mayor id): tarifa fija
+    por casa (POR_CASA) o metros2 * tarifa_por_m2 (POR_M2). Devuelve un
+    diccionario con el método aplicado y la cantidad de expensas creadas.
+    """
+    año, mes = validar_periodo(periodo)
+
+    with transaction.atomic():
+        # Bloquea el parámetro vigente: dos generaciones simultáneas se serializan
+        parametro = ExpensaParametro.objects.select_for_update().order_by('-id').first()
+        if parametro is None:
+            raise ValueError("No hay parámetros de expensas configurados")
+
+        metodo = (parametro.metodo or '').upper()
+        if metodo == 'POR_CASA':
+            if parametro.tarifa_por_casa is None:
+                raise ValueError("El parámetro POR_CASA no tiene tarifa_por_casa")
+            monto_sql = 'ROUND(%s, 2)'
+            tarifa = parametro.tarifa_por_casa
+        elif metodo == 'POR_M2':
+            if parametro.tarifa_por_m2 is None:
+                raise ValueError("El parámetro POR_M2 no tiene tarifa_por_m2")
+            monto_sql = 'ROUND(COALESCE(v.metros2, 0) * %s, 2)'
+            tarifa = parametro.tarifa_por_m2
+        else:
+            raise ValueError(f"Método de expensa desconocido: {parametro.metodo}")
+
+        sql = f"""
+            INSERT INTO {Expensa._meta.db_table} ({', '.join(COLUMNAS[1:])})
+            SELECT %s || v.codigo, v.id, %s, {monto_sql}, %s, 'PENDIENTE'
+            FROM {Vivienda._meta.db_table} v
+            WHERE v.activo = %s
+            ON CONFLICT (vivienda_id, periodo) DO NOTHING
+            RETURNING {', '.join(COLUMNAS)}
+        """
+        params = [
+            f'EXP-{periodo}-', periodo, tarifa,
+            fecha_vencimiento(año, mes, parametro.dia_vencimiento), True,
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            # Las filas devueltas, convertidas a sus tipos, evitan releer las expensas por id
+            campos = [Expensa._meta.get_field(columna) for columna in COLUMNAS]
+            creadas = [
+                Expensa(**{campo.attname: campo.to_python(valor) for campo, valor in zip(campos, fila)})
+                for fila in cursor.fetchall()
+            ]
+
+        if creadas:
+            # Dentro del bloque: las tablas derivadas se escriben con las expensas
+            post_bulk_create.send(sender=Expensa, instances=creadas)
+
+    return {
+        'periodo': periodo,
+        'metodo': metodo,
+        'creadas': len(creadas),
+    }
+
+
+def acumular_recargos(fecha=None, lote=10000):
+    """
+    Calcula los días de mora y el recargo acumulado (días * multa_diaria) de
+    todas las expensas PENDIENTE con vencimiento anterior a `fecha`.
+
+    Se procesa por rangos de id, un UPSERT por lote y una transacción por
+    lote. El recargo se recalcula desde el vencimiento en cada ejecución,
+    por lo que volver a correrlo el mismo día no cambia nada. En cada lote se
+    borran los recargos de expensas que ya no están PENDIENTE y vencidas
+    (pagadas, anuladas o con el vencimiento movido).
+    """
+    fecha = fecha or timezone.localdate()
+    parametro = ExpensaParametro.objects.order_by('-id').first()
+    multa_diaria = parametro.multa_diaria if parametro else None
+    if not multa_diaria:
+        return {'fecha': fecha.isoformat(), 'multa_diaria': None, 'lotes': 0, 'actualizadas': 0, 'eliminadas': 0}
+
+    vencidas = Expensa.objects.filter(estado='PENDIENTE', vencimiento__lt=fecha)
+    # El rango cubre también los recargos existentes, para limpiar los que quedaron sin deuda
+    rangos = [
+        vencidas.aggregate(desde=Min('id'), hasta=Max('id')),
+        RecargoExpensa.objects.aggregate(desde=Min('expensa_id'), hasta=Max('expensa_id')),
+    ]
+    rangos = [r for r in rangos if r['desde'] is not None]
+    if not rangos:
+        return {'fecha': fecha.isoformat(), 'multa_diaria': multa_diaria, 'lotes': 0,
+                'actualizadas': 0, 'eliminadas': 0}
+    rango = {'desde': min(r['desde'] for r in rangos), 'hasta': max(r['hasta'] for r in rangos)}
+
+    if connection.vendor == 'postgresql':
+        dias_sql = '(CAST(%s AS date) - e.vencimiento)'
+    else:
+        dias_sql = 'CAST(julianday(%s) - julianday(e.vencimiento) AS INTEGER)'
+    sql = f"""
+        INSERT INTO {RecargoExpensa._meta.db_table} (expensa_id, dias_mora, monto, actualizado_en)
+        SELECT e.id, {dias_sql}, ROUND({dias_sql} * %s, 2), %s
+        FROM {Expensa._meta.db_table} e
+        WHERE e.estado = 'PENDIENTE' AND e.vencimiento < %s
+          AND e.id BETWEEN %s AND %s
+        ON CONFLICT (expensa_id) DO UPDATE SET
+            dias_mora = EXCLUDED.dias_mora,
+            monto = EXCLUDED.monto,
+            actualizado_en = EXCLUDED.actualizado_en
+    """
+    ahora = timezone.now()
+    lotes = 0
+    actualizadas = 0
+    eliminadas = 0
+    desde = rango['desde']
+    while desde <= rango['hasta']:
+        hasta = desde + lote - 1
+        with transaction.atomic():
+            eliminadas += (
+                RecargoExpensa.objects.filter(pk__gte=desde, pk__lte=hasta)
+                .exclude(expensa__estado='PENDIENTE', expensa__vencimiento__lt=fecha)
+                .delete()[0]
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [fecha, fecha, multa_diaria, ahora, fecha, desde, hasta])
+                actualizadas += max(cursor.rowcount, 0)
+        lotes += 1
+        desde = hasta + 1
+
+    return {
+        'fecha': fecha.isoformat(),
+        'multa_diaria': multa_diaria,
+        'lotes': lotes,
+        'actualizadas': actualizadas,
+        'eliminadas': eliminadas,
+    }
@@ -0,0 +1,28 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.facturacion import acumular_recargos
+
+
+class Command(BaseCommand):
+    help = 'Acumula los recargos por mora de las expensas vencidas (seguro de re-ejecutar)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de corte YYYY-MM-DD (por defecto, hoy)')
+        parser.add_argument('--lote', type=int, default=10000, help='Expensas (rango de ids) por lote')
+
+    def handle(self, *args, **options):
+        try:
+            fecha = date.fromisoformat(options['fecha']) if options['fecha'] else None
+        except ValueError:
+            raise CommandError('Fecha inválida, use YYYY-MM-DD')
+        resultado = acumular_recargos(fecha, lote=options['lote'])
+        if resultado['multa_diaria'] is None:
+            self.stdout.write(self.style.WARNING('No hay multa_diaria configurada; no se aplicaron recargos'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['actualizadas']} expensas con recargo al {resultado['fecha']}, "
+            f"{resultado['eliminadas']} recargos eliminados "
+            f"({resultado['lotes']} lotes, multa diaria {resultado['multa_diaria']})"
+        ))
@@ -0,0 +1,28 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.archivo_visitas import TAMANO_LOTE, archivar, primer_dia_meses_atras
+
+
+class Command(BaseCommand):
+    help = ('Mueve a visitas_archivo las visitas cerradas anteriores a los últimos N meses, '
+            'por lotes (seguro de re-ejecutar)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=6,
+                            help='Meses completos que quedan en la tabla caliente además del actual')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Visitas por transacción')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0 or options['lote'] < 1:
+            raise CommandError('--meses debe ser >= 0 y --lote >= 1')
+        dia = primer_dia_meses_atras(options['meses'], timezone.localdate())
+        corte = timezone.make_aware(datetime.combine(dia, time.min))
+
+        def progreso(total):
+            self.stdout.write(f'  {total} visitas archivadas...')
+
+        total = archivar(corte, lote=options['lote'], progreso=progreso if options['verbosity'] > 1 else None)
+        self.stdout.write(self.style.SUCCESS(f'{total} visitas anteriores a {dia} archivadas'))
@@ -0,0 +1,173 @@
+import json
+import platform
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from CONDOMINIO import api_urls
+from core.models import (
+    ResidenteVivienda, Vivienda, Parqueo, Visitante, Reserva, AreaComun,
+    Expensa, Pago, Multa, Comunicado, Vehiculo, TipoVehiculo, Mascota, AsignacionParqueo,
+)
+
+# Caso por nombre de URL: (modelo para <pk> o None, query string, máx. consultas, máx. ms en p95)
+CASOS = {
+    'listar_residentes': (None, 'limit=50', 1, 200),
+    'detalle_residente': (ResidenteVivienda, '', 3, 100),
+    'listar_viviendas': (None, '', 1, 2000),
+    'detalle_vivienda': (Vivienda, '', 1, 100),
+    'estado_cuenta_vivienda': (Vivienda, 'limit=50', 2, 100),
+    'listar_parqueos': (None, '', 1, 2000),
+    'detalle_parqueo': (Parqueo, '', 1, 100),
+    'parqueos_disponibles': (None, '', 1, 500),
+    'detalle_visitante': (Visitante, '', 1, 100),
+    'listar_visitantes': (None, 'limit=50', 1, 200),
+    'listar_visitas': (None, 'limit=50', 1, 200),
+    'visitas_presentes': (None, '', 1, 100),
+    'listar_reservas': (None, '', 1, 5000),
+    'detalle_reserva': (Reserva, '', 1, 100),
+    'listar_areas': (None, '', 1, 100),
+    'detalle_area': (AreaComun, '', 1, 100),
+    'disponibilidad_area': (AreaComun, '', 2, 100),
+    'listar_expensas': (None, 'limit=50', 1, 200),
+    'detalle_expensa': (Expensa, '', 1, 100),
+    'listar_pagos': (None, 'limit=50', 1, 200),
+    'detalle_pago': (Pago, '', 1, 100),
+    'aplicaciones_pago': (Pago, '', 2, 100),
+    'listar_multas': (None, '', 1, 5000),
+    'detalle_multa': (Multa, '', 1, 100),
+    'listar_comunicados': (None, 'limit=50', 1, 200),
+    'detalle_comunicado': (Comunicado, 'limit=50', 2, 100),
+    'listar_vehiculos': (None, 'limit=50', 1, 200),
+    'detalle_vehiculo': (Vehiculo, '', 1, 100),
+    'buscar_vehiculos': (None, 'placa=bm-000042', 1, 100),
+    'listar_tipos_vehiculo': (None, '', 1, 100),
+    'detalle_tipo_vehiculo': (TipoVehiculo, '', 1, 100),
+    'listar_mascotas': (None, '', 1, 2000),
+    'detalle_mascota': (Mascota, '', 1, 100),
+    'listar_asignaciones_parqueo': (None, 'limit=50', 1, 200),
+    'detalle_asignacion_parqueo': (AsignacionParqueo, '', 1, 100),
+    'reporte_resumen_general': (None, '', 15, 2000),
+    'reporte_expensas': (None, '', 1, 2000),
+    'reporte_visitas': (None, '', 5, 3000),
+    'reporte_ocupacion_parqueos': (None, '', 1, 100),
+    'estadisticas_mensuales': (None, '', 1, 100),
+    'tendencia_mensual': (None, '', 1, 100),
+    'dashboard': (None, '', 1, 500),
+    'listar': (None, 'limit=50', 1, 200),
+}
+
+# Rutas que no se miden y por qué
+OMITIDOS = {
+    'metricas': 'requiere autenticación de administrador',
+}
+
+
+def rutas_con_nombre():
+    """Nombres de las rutas de api_urls que tienen nombre, en orden."""
+    return [patron.name for patron in api_urls.urlpatterns if isinstance(patron, URLPattern) and patron.name]
+
+
+def url_caso(nombre):
+    """URL del caso con su query string; None si el modelo de <pk> no tiene filas."""
+    modelo, query, _, _ = CASOS[nombre]
+    kwargs = {}
+    if modelo is not None:
+        pk = modelo.objects.order_by('pk').values_list('pk', flat=True).first()
+        if pk is None:
+            return None
+        kwargs['pk'] = pk
+    if nombre == 'listar':
+        kwargs['model_name'] = 'Pago'
+    url = reverse(nombre, kwargs=kwargs) if kwargs else reverse(nombre)
+    return f'{url}?{query}' if query else url
+
+
+class Command(BaseCommand):
+    help = 'Mide los endpoints GET de api_urls y verifica sus presupuestos de consultas y latencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--salida', default='benchmark.json', help='Archivo JSON de resultados')
+        parser.add_argument('--solo', nargs='*', help='Nombres de URL a medir')
+
+    def handle(self, *args, **options):
+        cliente = Client(HTTP_HOST='localhost')
+        resultados = []
+        fallos = 0
+
+        for nombre in rutas_con_nombre():
+            if options['solo'] and nombre not in options['solo']:
+                continue
+            if nombre not in CASOS:
+                motivo = OMITIDOS.get(nombre, 'endpoint de escritura o sin caso definido')
+                resultados.append({'endpoint': nombre, 'estado': 'omitido', 'motivo': motivo})
+                continue
+
+            _, _, max_consultas, max_ms = CASOS[nombre]
+            url = url_caso(nombre)
+            if url is None:
+                resultados.append({'endpoint': nombre, 'estado': 'omitido', 'motivo': 'sin datos'})
+                continue
+
+            tiempos = []
+            consultas = 0
+            estado_http = None
+            tamano = 0
+            for _ in range(options['repeticiones']):
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    response = cliente.get(url)
+                    cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                consultas = max(consultas, len(capturadas))
+                estado_http = response.status_code
+                tamano = len(cuerpo)
+
+            tiempos.sort()
+            p95 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))]
+            ok = estado_http == 200 and consultas <= max_consultas and p95 <= max_ms
+            fallos += not ok
+            resultados.append({
+                'endpoint': nombre,
+                'url': url,
+                'estado': 'ok' if ok else 'fallo',
+                'http': estado_http,
+                'consultas': consultas,
+                'max_consultas': max_consultas,
+                'p50_ms': round(statistics.median(tiempos), 2),
+                'p95_ms': round(p95, 2),
+                'max_ms': round(tiempos[-1], 2),
+                'presupuesto_ms': max_ms,
+                'bytes': tamano,
+            })
+            estilo = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(estilo(
+                f"{nombre:28s} {estado_http} {consultas:3d}/{max_consultas:<3d} consultas "
+                f"p95 {p95:8.2f}/{max_ms} ms"
+            ))
+
+        informe = {
+            'fecha': timezone.now().isoformat(),
+            'motor': connection.vendor,
+            'python': platform.python_version(),
+            'repeticiones': options['repeticiones'],
+            'volumen': {
+                'viviendas': Vivienda.objects.count(),
+                'expensas': Expensa.objects.count(),
+                'pagos': Pago.objects.count(),
+            },
+            'resultados': resultados,
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(informe, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"Resultados escritos en {options['salida']}")
+
+        if fallos:
+            raise CommandError(f'{fallos} endpoints fuera de presupuesto')
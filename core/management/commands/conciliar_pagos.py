@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.conciliacion import conciliar_pagos
+
+
+class Command(BaseCommand):
+    help = 'Concilia los pagos confirmados contra expensas y multas pendientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Rehace todas las aplicaciones (por defecto solo los pagos nuevos)')
+
+    def handle(self, *args, **options):
+        resultado = conciliar_pagos(incremental=not options['completo'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Conciliación {resultado['modo']}: {resultado['pagos']} pagos, "
+            f"{resultado['aplicaciones']} aplicaciones, {resultado['expensas_pagadas']} expensas "
+            f"y {resultado['multas_pagadas']} multas saldadas"
+        ))
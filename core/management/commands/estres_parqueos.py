@@ -0,0 +1,131 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from core.models import (
+    AsignacionParqueo, CategoriaVivienda, Parqueo, Persona, TipoVehiculo, Vehiculo, Vivienda,
+)
+from core.parqueos import ParqueoNoDisponible, asignar_parqueo, reconciliar_ocupacion
+
+HOSTS_LOCALES = ('', 'localhost', '127.0.0.1', '::1')
+PREFIJO = 'ESTRES-'
+
+
+class Command(BaseCommand):
+    help = ('Prueba de concurrencia de asignar_parqueo: muchos hilos reclaman parqueos a la vez y '
+            'se verifica que ninguno quede asignado dos veces. Crea y borra sus propios datos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--vehiculos', type=int, default=200)
+        parser.add_argument('--parqueos', type=int, default=50)
+        parser.add_argument('--mismo-parqueo', action='store_true',
+                            help='Todos los hilos piden el mismo parqueo en lugar de "cualquiera libre"')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Permite correr contra una base de datos que no es local')
+
+    def handle(self, *args, **options):
+        host = connection.settings_dict.get('HOST') or ''
+        if connection.vendor != 'sqlite' and host not in HOSTS_LOCALES and not options['forzar']:
+            raise CommandError(f"La base de datos apunta a '{host}'. Use una base local o --forzar.")
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor}: sin FOR UPDATE SKIP LOCKED; la prueba solo es representativa en PostgreSQL'
+            ))
+
+        vehiculos, parqueos = self.preparar(options['vehiculos'], options['parqueos'])
+        try:
+            objetivo = parqueos[0] if options['mismo_parqueo'] else None
+            # En modo "cualquiera" también pueden tomarse parqueos libres que no son de la prueba
+            libres = 1 if objetivo else Parqueo.objects.filter(ocupado=False).count()
+            resultados = Counter()
+            errores = []
+
+            def reclamar(vehiculo_id):
+                try:
+                    asignar_parqueo(vehiculo_id, objetivo)
+                    return 'asignado'
+                except ParqueoNoDisponible:
+                    return 'sin_parqueo'
+                except OperationalError as e:
+                    # SQLite no bloquea filas: las escrituras simultáneas fallan con "database is locked"
+                    if connection.vendor == 'sqlite':
+                        return 'bloqueado'
+                    errores.append(repr(e))
+                    return 'error'
+                except Exception as e:
+                    errores.append(repr(e))
+                    return 'error'
+                finally:
+                    connections.close_all()
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as ejecutor:
+                resultados.update(ejecutor.map(reclamar, vehiculos))
+            duracion = time.perf_counter() - inicio
+
+            esperados = None if resultados['bloqueado'] else min(len(vehiculos), libres)
+            fallos = self.verificar(vehiculos, resultados, esperados)
+            self.stdout.write(
+                f"{len(vehiculos)} pedidos con {options['hilos']} hilos en {duracion:.2f} s: "
+                f"{resultados['asignado']} asignados, {resultados['sin_parqueo']} sin parqueo, "
+                f"{resultados['bloqueado']} rechazados por bloqueo de SQLite, {resultados['error']} errores"
+            )
+            for error in errores[:5]:
+                self.stdout.write(self.style.ERROR(f'  {error}'))
+            if errores:
+                fallos.append(f'{len(errores)} pedidos terminaron con error')
+        finally:
+            self.limpiar()
+
+        if fallos:
+            raise CommandError('; '.join(fallos))
+        self.stdout.write(self.style.SUCCESS('Sin asignaciones dobles'))
+
+    def preparar(self, n_vehiculos, n_parqueos):
+        self.limpiar()
+        categoria = CategoriaVivienda.objects.create(nombre=f'{PREFIJO}categoria', habitaciones=1, banos=1)
+        vivienda = Vivienda.objects.create(categoria=categoria, codigo=f'{PREFIJO}vivienda')
+        persona = Persona.objects.create(nombres='Prueba', apellidos='Estrés', num_doc=f'{PREFIJO}persona')
+        tipo = TipoVehiculo.objects.create(nombre=f'{PREFIJO}tipo')
+        vehiculos = Vehiculo.objects.bulk_create(
+            Vehiculo(persona=persona, vivienda=vivienda, tipo=tipo, placa=f'{PREFIJO}{i:06d}')
+            for i in range(n_vehiculos)
+        )
+        parqueos = Parqueo.objects.bulk_create(
+            Parqueo(codigo=f'{PREFIJO}{i:06d}', ocupado=False) for i in range(n_parqueos)
+        )
+        reconciliar_ocupacion()
+        return [v.pk for v in vehiculos], [p.pk for p in parqueos]
+
+    def verificar(self, vehiculos, resultados, esperados):
+        fallos = []
+        activas = AsignacionParqueo.objects.filter(vehiculo_id__in=vehiculos, activa=True)
+        por_parqueo = Counter(activas.values_list('parqueo_id', flat=True))
+        dobles = [pk for pk, n in por_parqueo.items() if n > 1]
+        if dobles:
+            fallos.append(f'{len(dobles)} parqueos con más de una asignación activa')
+        if sum(por_parqueo.values()) != resultados['asignado']:
+            fallos.append(f"{resultados['asignado']} asignaciones informadas y {sum(por_parqueo.values())} en la base")
+        if esperados is not None and resultados['asignado'] != esperados:
+            fallos.append(f"se esperaban {esperados} asignaciones y hubo {resultados['asignado']}")
+        if Parqueo.objects.filter(pk__in=list(por_parqueo), ocupado=False).exists():
+            fallos.append('hay parqueos asignados que no figuran como ocupados')
+        return fallos
+
+    def limpiar(self):
+        de_prueba = AsignacionParqueo.objects.filter(vehiculo__placa__startswith=PREFIJO)
+        Parqueo.objects.filter(
+            pk__in=de_prueba.filter(activa=True).values('parqueo_id')
+        ).update(ocupado=False)
+        de_prueba.delete()
+        Vehiculo.objects.filter(placa__startswith=PREFIJO).delete()
+        Parqueo.objects.filter(codigo__startswith=PREFIJO).delete()
+        TipoVehiculo.objects.filter(nombre__startswith=PREFIJO).delete()
+        Persona.objects.filter(num_doc__startswith=PREFIJO).delete()
+        Vivienda.objects.filter(codigo__startswith=PREFIJO).delete()
+        CategoriaVivienda.objects.filter(nombre__startswith=PREFIJO).delete()
+        reconciliar_ocupacion()
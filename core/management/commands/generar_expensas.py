@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.facturacion import generar_expensas
+
+
+class Command(BaseCommand):
+    help = 'Genera las expensas de un periodo para todas las viviendas activas (idempotente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', help='Periodo YYYY-MM (por defecto, el mes actual)')
+
+    def handle(self, *args, **options):
+        periodo = options['periodo'] or timezone.now().strftime('%Y-%m')
+        try:
+            resultado = generar_expensas(periodo)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Periodo {resultado['periodo']} ({resultado['metodo']}): {resultado['creadas']} expensas creadas"
+        ))
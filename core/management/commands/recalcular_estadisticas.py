@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.estadisticas import CONCEPTOS, recalcular
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye estadisticas_mensuales desde visitas (incluido el archivo), expensas y multas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concepto', nargs='*', choices=sorted(CONCEPTOS.values()),
+                            help='Conceptos a recalcular (por defecto todos)')
+
+    def handle(self, *args, **options):
+        filas = recalcular(options['concepto'] or None)
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas mensuales recalculadas: {filas} filas'))
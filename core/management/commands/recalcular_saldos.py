@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.estado_cuenta import recalcular_saldos
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los movimientos y saldos por vivienda desde expensas, multas y pagos'
+
+    def handle(self, *args, **options):
+        resultado = recalcular_saldos()
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['movimientos']} movimientos, saldos de {resultado['viviendas']} viviendas"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.parqueos import reconciliar_ocupacion
+
+
+class Command(BaseCommand):
+    help = 'Recuenta la ocupación de parqueos por zona y corrige los contadores (para correr periódicamente)'
+
+    def handle(self, *args, **options):
+        correcciones = reconciliar_ocupacion()
+        for c in correcciones:
+            self.stdout.write(self.style.WARNING(
+                f"Zona '{c['zona']}': {c['antes']} -> {c['despues']} (total, ocupados)"
+            ))
+        self.stdout.write(self.style.SUCCESS(f'{len(correcciones)} zonas corregidas'))
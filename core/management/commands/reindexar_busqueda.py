@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.busqueda import reindexar
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los términos de búsqueda de visitantes y personas'
+
+    def handle(self, *args, **options):
+        for etiqueta, filas in reindexar().items():
+            self.stdout.write(f'{etiqueta}: {filas} filas indexadas')
+        self.stdout.write(self.style.SUCCESS('Búsqueda reindexada'))
@@ -0,0 +1,200 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import (
+    CategoriaVivienda, Vivienda, Persona, ResidenteVivienda, TipoVehiculo, Vehiculo,
+    Parqueo, Visitante, Visita, AreaComun, Reserva, Expensa, TipoInfraccion, Multa,
+    Pago, Comunicado, LecturaComunicado, Mascota, AsignacionParqueo,
+)
+from core.busqueda import reindexar
+from core.estadisticas import recalcular
+from core.estado_cuenta import recalcular_saldos
+from core.parqueos import reconciliar_ocupacion
+from core.vehiculos import reindexar_placas
+
+HOSTS_LOCALES = ('', 'localhost', '127.0.0.1', '::1')
+TAMANO_LOTE = 5000
+SECTORES = ('Sector Norte', 'Sector Sur', 'Sector Este', 'Sector Oeste')
+NOMBRES = ('Juan', 'Ana', 'Luis', 'Carlos', 'María', 'Sofía', 'Pedro', 'Lucía', 'José', 'Elena')
+APELLIDOS = ('Pérez', 'Gutiérrez', 'Quispe', 'Mamani', 'Rojas', 'Fernández', 'Vargas', 'López')
+
+
+def insertar(modelo, filas, devolver_ids=False):
+    """Inserta las filas (iterable) en lotes con bulk_create; opcionalmente devuelve los ids."""
+    ids = []
+    filas = iter(filas)
+    while True:
+        lote = list(islice(filas, TAMANO_LOTE))
+        if not lote:
+            break
+        creados = modelo.objects.bulk_create(lote)
+        if devolver_ids:
+            ids.extend(obj.pk for obj in creados)
+    return ids
+
+
+class Command(BaseCommand):
+    help = 'Siembra un condominio sintético de gran tamaño en una base de datos local para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--viviendas', type=int, default=5000)
+        parser.add_argument('--visitantes', type=int, default=50000)
+        parser.add_argument('--visitas', type=int, default=500000)
+        parser.add_argument('--pagos', type=int, default=200000)
+        parser.add_argument('--meses', type=int, default=12, help='Meses de expensas por vivienda')
+        parser.add_argument('--multas', type=int, default=10000)
+        parser.add_argument('--reservas', type=int, default=20000)
+        parser.add_argument('--comunicados', type=int, default=200)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--forzar', action='store_true',
+                            help='Permite sembrar en una base de datos que no es local')
+
+    def handle(self, *args, **options):
+        host = connection.settings_dict.get('HOST') or ''
+        if connection.vendor != 'sqlite' and host not in HOSTS_LOCALES and not options['forzar']:
+            raise CommandError(f"La base de datos apunta a '{host}'. Use una base local o --forzar.")
+
+        rnd = random.Random(options['semilla'])
+        ahora = timezone.now()
+        hoy = date.today()
+        n_viv = options['viviendas']
+
+        with transaction.atomic():
+            self.stdout.write('Categorías, viviendas y personas...')
+            categorias = insertar(CategoriaVivienda, (
+                CategoriaVivienda(nombre=f'BM Categoría {i}', habitaciones=i + 1, banos=i + 1)
+                for i in range(5)
+            ), devolver_ids=True)
+            viviendas = insertar(Vivienda, (
+                Vivienda(categoria_id=rnd.choice(categorias), codigo=f'BM-{i:06d}',
+                         metros2=Decimal(rnd.randint(60, 400)), ubicacion=rnd.choice(SECTORES),
+                         activo=rnd.random() < 0.9)
+                for i in range(n_viv)
+            ), devolver_ids=True)
+            personas = insertar(Persona, (
+                Persona(nombres=rnd.choice(NOMBRES), apellidos=rnd.choice(APELLIDOS),
+                        num_doc=f'BM{i:08d}', telefono=f'7{i:07d}', email=f'bm{i}@condominio.test')
+                for i in range(n_viv * 2)
+            ), devolver_ids=True)
+            insertar(ResidenteVivienda, (
+                ResidenteVivienda(persona_id=persona_id, vivienda_id=viviendas[i // 2],
+                                  es_propietario=i % 2 == 0, inicio=hoy - timedelta(days=rnd.randint(0, 2000)))
+                for i, persona_id in enumerate(personas)
+            ))
+
+            self.stdout.write('Vehículos, parqueos y mascotas...')
+            tipos = insertar(TipoVehiculo, (
+                TipoVehiculo(nombre=f'BM {nombre}') for nombre in ('Auto', 'Moto', 'Camioneta')
+            ), devolver_ids=True)
+            vehiculos = insertar(Vehiculo, (
+                Vehiculo(persona_id=personas[i * 2], vivienda_id=vivienda_id, tipo_id=rnd.choice(tipos),
+                         placa=f'BM{i:06d}', modelo='Modelo', color='Gris')
+                for i, vivienda_id in enumerate(viviendas)
+            ), devolver_ids=True)
+            ocupados = [rnd.random() < 0.6 for _ in range(n_viv)]
+            parqueos = insertar(Parqueo, (
+                Parqueo(codigo=f'BM-P{i:06d}', ocupado=ocupado, zona=f'Piso {i % 4 - 1}')
+                for i, ocupado in enumerate(ocupados)
+            ), devolver_ids=True)
+            # Cada parqueo ocupado tiene la asignación activa del vehículo de la misma posición
+            insertar(AsignacionParqueo, (
+                AsignacionParqueo(vehiculo_id=vehiculo_id, parqueo_id=parqueo_id, activa=True)
+                for vehiculo_id, parqueo_id, ocupado in zip(vehiculos, parqueos, ocupados) if ocupado
+            ))
+            insertar(Mascota, (
+                Mascota(nombre=f'Mascota {i}', tipo=rnd.choice(('Perro', 'Gato')),
+                        propietario_id=personas[i * 2], vivienda_id=viviendas[i])
+                for i in range(0, n_viv, 2)
+            ))
+
+            self.stdout.write('Visitantes y visitas...')
+            visitantes = insertar(Visitante, (
+                Visitante(nombres=rnd.choice(NOMBRES), apellidos=rnd.choice(APELLIDOS), num_doc=f'BMV{i:08d}')
+                for i in range(options['visitantes'])
+            ), devolver_ids=True)
+
+            def visitas():
+                for _ in range(options['visitas']):
+                    entrada = ahora - timedelta(minutes=rnd.randint(0, 365 * 24 * 60))
+                    abierta = entrada > ahora - timedelta(hours=6) and rnd.random() < 0.5
+                    yield Visita(visitante_id=rnd.choice(visitantes), vivienda_destino_id=rnd.choice(viviendas),
+                                 entrada=entrada,
+                                 salida=None if abierta else entrada + timedelta(minutes=rnd.randint(5, 240)),
+                                 medio=rnd.choice(('PIE', 'AUTO')))
+            insertar(Visita, visitas())
+
+            self.stdout.write('Expensas, multas y pagos...')
+            periodos = []
+            mes = date(hoy.year, hoy.month, 1)
+            for _ in range(options['meses']):
+                periodos.append(mes)
+                mes = (mes - timedelta(days=1)).replace(day=1)
+            insertar(Expensa, (
+                Expensa(codigo=f'BM-E-{vivienda_id}-{periodo:%Y%m}', vivienda_id=vivienda_id,
+                        periodo=f'{periodo:%Y-%m}', monto=Decimal(rnd.randint(300, 1500)),
+                        vencimiento=periodo.replace(day=10),
+                        estado='PAGADA' if rnd.random() < 0.8 else 'PENDIENTE')
+                for periodo in periodos for vivienda_id in viviendas
+            ))
+            infracciones = insertar(TipoInfraccion, (
+                TipoInfraccion(codigo=f'BM-INF-{i}', descripcion=f'Infracción {i}', monto_base=Decimal(100 * (i + 1)))
+                for i in range(3)
+            ), devolver_ids=True)
+            insertar(Multa, (
+                Multa(codigo=f'BM-M-{i}', vivienda_id=rnd.choice(viviendas), persona_id=rnd.choice(personas),
+                      tipo_infraccion_id=rnd.choice(infracciones),
+                      fecha=ahora - timedelta(days=rnd.randint(0, 365)),
+                      monto=Decimal(rnd.randint(50, 500)), estado=rnd.choice(('PENDIENTE', 'PAGADA')))
+                for i in range(options['multas'])
+            ))
+            insertar(Pago, (
+                Pago(vivienda_id=rnd.choice(viviendas), persona_id=rnd.choice(personas),
+                     concepto=rnd.choice(('EXPENSA', 'MULTA', 'RESERVA')), monto=Decimal(rnd.randint(50, 1500)),
+                     fecha=ahora - timedelta(days=rnd.randint(0, 365)),
+                     metodo=rnd.choice(('QR', 'EFECTIVO', 'TRANSFERENCIA')), estado='CONFIRMADO')
+                for _ in range(options['pagos'])
+            ))
+
+            self.stdout.write('Áreas, reservas y comunicados...')
+            areas = insertar(AreaComun, (
+                AreaComun(nombre=f'BM Área {i}', requiere_pago=i % 2 == 0, tarifa=Decimal(50)) for i in range(5)
+            ), devolver_ids=True)
+
+            def reservas():
+                # Consecutivas por área y sin solapamientos (restricción reservas_sin_solapamiento)
+                desde = (ahora - timedelta(days=700)).replace(minute=0, second=0, microsecond=0)
+                siguiente = {area_id: desde for area_id in areas}
+                for i in range(options['reservas']):
+                    area_id = rnd.choice(areas)
+                    inicio = siguiente[area_id] + timedelta(hours=rnd.randint(0, 12))
+                    fin = inicio + timedelta(hours=rnd.randint(1, 4))
+                    siguiente[area_id] = fin
+                    yield Reserva(codigo=f'BM-R-{i}', area_id=area_id, vivienda_id=rnd.choice(viviendas),
+                                  persona_id=rnd.choice(personas), fecha=inicio.date(), hora_inicio=inicio,
+                                  hora_fin=fin, estado='CONFIRMADA')
+            insertar(Reserva, reservas())
+            comunicados = insertar(Comunicado, (
+                Comunicado(titulo=f'Comunicado {i}', cuerpo='...', publico='TODOS',
+                           fecha_publicacion=ahora - timedelta(days=i))
+                for i in range(options['comunicados'])
+            ), devolver_ids=True)
+            insertar(LecturaComunicado, (
+                LecturaComunicado(comunicado_id=comunicado_id, persona_id=persona_id, leido_en=ahora)
+                for comunicado_id in comunicados
+                for persona_id in rnd.sample(personas, min(len(personas), 50))
+            ))
+
+            # bulk_create no emite señales: se recalculan los contadores derivados
+            reconciliar_ocupacion()
+            reindexar()
+            reindexar_placas()
+            recalcular()
+            recalcular_saldos()
+
+        self.stdout.write(self.style.SUCCESS('Datos de benchmark sembrados correctamente'))
@@ -0,0 +1,65 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.conexiones import estadisticas_pool
+
+
+class Command(BaseCommand):
+    help = 'Ejercita las conexiones a la base de datos con varios hilos y muestra las estadísticas del pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=20, help='Hilos concurrentes')
+        parser.add_argument('--consultas', type=int, default=50, help='Consultas por hilo')
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        consultas = options['consultas']
+        tiempos = []
+        errores = []
+        candado = threading.Lock()
+
+        def trabajar():
+            locales = []
+            try:
+                for _ in range(consultas):
+                    inicio = time.perf_counter()
+                    with connection.cursor() as cursor:
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                    locales.append((time.perf_counter() - inicio) * 1000)
+                    # Devuelve la conexión (al pool, o la cierra si no hay pool)
+                    connection.close()
+            except Exception as e:
+                with candado:
+                    errores.append(str(e))
+            finally:
+                connection.close()
+                with candado:
+                    tiempos.extend(locales)
+
+        self.stdout.write(f"Modo: {estadisticas_pool()['modo']} - {hilos} hilos x {consultas} consultas")
+        inicio = time.perf_counter()
+        trabajadores = [threading.Thread(target=trabajar) for _ in range(hilos)]
+        for t in trabajadores:
+            t.start()
+        for t in trabajadores:
+            t.join()
+        total = time.perf_counter() - inicio
+
+        if tiempos:
+            tiempos.sort()
+            p50 = tiempos[len(tiempos) // 2]
+            p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+            self.stdout.write(
+                f"{len(tiempos)} consultas en {total:.2f}s - "
+                f"p50 {p50:.2f} ms, p99 {p99:.2f} ms (incluye obtener la conexión)"
+            )
+        for clave, valor in estadisticas_pool().items():
+            self.stdout.write(f"  {clave}: {valor}")
+        if errores:
+            self.stdout.write(self.style.ERROR(f"{len(errores)} hilos con error, p. ej.: {errores[0]}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Sin errores"))
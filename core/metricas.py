@@ -0,0 +1,155 @@
+"""
+Métricas por endpoint: latencia, cantidad y tiempo de consultas SQL y tamaño
+de respuesta, agrupadas por nombre de URL y exportadas en formato de texto de
+Prometheus (ver la vista `metricas` en core.views).
+
+Los valores se guardan en memoria del proceso: con varios workers de gunicorn
+cada uno expone los suyos.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.db import connection
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_TAMANO = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histograma:
+    """Histograma acumulativo al estilo Prometheus (buckets fijos + suma + conteo)."""
+
+    __slots__ = ('buckets', 'conteos', 'suma', 'total')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + ('+Inf',), self.conteos):
+            acumulado += conteo
+            yield f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+        yield f'{nombre}_sum{{{etiquetas}}} {self.suma}'
+        yield f'{nombre}_count{{{etiquetas}}} {self.total}'
+
+
+class RegistroMetricas:
+    """Acumula las observaciones por (vista, método)."""
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._series = {}
+        self._respuestas = {}
+
+    def observar(self, vista, metodo, estado, duracion, consultas, tiempo_db, tamano):
+        clave = (vista, metodo)
+        with self._candado:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = {
+                    'latencia': Histograma(BUCKETS_LATENCIA),
+                    'consultas': Histograma(BUCKETS_CONSULTAS),
+                    'tamano': Histograma(BUCKETS_TAMANO),
+                    'tiempo_db': 0.0,
+                }
+            serie['latencia'].observar(duracion)
+            serie['consultas'].observar(consultas)
+            if tamano is not None:
+                serie['tamano'].observar(tamano)
+            serie['tiempo_db'] += tiempo_db
+            clave_estado = (vista, metodo, estado)
+            self._respuestas[clave_estado] = self._respuestas.get(clave_estado, 0) + 1
+
+    def exportar(self, extra=None):
+        """Devuelve el texto de exposición de Prometheus."""
+        with self._candado:
+            lineas = [
+                '# HELP condominio_http_requests_total Respuestas por vista, método y estado HTTP.',
+                '# TYPE condominio_http_requests_total counter',
+            ]
+            for (vista, metodo, estado), n in sorted(self._respuestas.items()):
+                lineas.append(
+                    f'condominio_http_requests_total{{view="{vista}",method="{metodo}",status="{estado}"}} {n}'
+                )
+            for nombre, clave, ayuda in (
+                ('condominio_http_request_duration_seconds', 'latencia', 'Latencia de la vista en segundos.'),
+                ('condominio_db_queries_per_request', 'consultas', 'Consultas SQL por petición.'),
+                ('condominio_http_response_size_bytes', 'tamano', 'Tamaño del cuerpo de la respuesta.'),
+            ):
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} histogram')
+                for (vista, metodo), serie in sorted(self._series.items()):
+                    lineas.extend(serie[clave].lineas(nombre, f'view="{vista}",method="{metodo}"'))
+            lineas.append('# HELP condominio_db_time_seconds_total Tiempo acumulado en consultas SQL.')
+            lineas.append('# TYPE condominio_db_time_seconds_total counter')
+            for (vista, metodo), serie in sorted(self._series.items()):
+                lineas.append(
+                    f'condominio_db_time_seconds_total{{view="{vista}",method="{metodo}"}} {serie["tiempo_db"]}'
+                )
+        for nombre, valor, ayuda in (extra or ()):
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} gauge')
+            lineas.append(f'{nombre} {valor}')
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        with self._candado:
+            self._series.clear()
+            self._respuestas.clear()
+
+
+registro = RegistroMetricas()
+
+
+class ContadorConsultas:
+    """execute_wrapper que cuenta las consultas y acumula su duración."""
+
+    __slots__ = ('consultas', 'tiempo')
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class MetricasMiddleware:
+    """
+    Registra por nombre de URL la latencia, las consultas SQL, el tiempo en
+    base de datos y el tamaño de la respuesta. En respuestas streaming solo se
+    mide hasta que la vista devuelve la respuesta; el tamaño no se conoce.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = ContadorConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        match = getattr(request, 'resolver_match', None)
+        vista = (match.url_name or match.view_name) if match else 'sin_ruta'
+        tamano = None if response.streaming else len(response.content)
+        registro.observar(
+            vista, request.method, response.status_code,
+            duracion, contador.consultas, contador.tiempo, tamano,
+        )
+        return response
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# Las tablas de core no son gestionadas por Django (managed = False), por lo
+# que los índices se crean con SQL explícito.
+INDICES = [
+    ('visitas_entrada_id_idx', 'visitas', 'entrada, id'),
+    ('residente_vivienda_inicio_id_idx', 'residente_vivienda', 'inicio, id'),
+    ('expensas_periodo_id_idx', 'expensas', 'periodo, id'),
+]
+
+# notificaciones todavía no existe en todas las bases (ver api_urls); el
+# índice de asignaciones_parqueo se crea en 0013, junto con la tabla.
+INDICE_NOTIFICACIONES = 'notificaciones_fecha_id_idx'
+
+
+def indexar_notificaciones(apps, schema_editor):
+    if 'notificaciones' in schema_editor.connection.introspection.table_names():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INDICE_NOTIFICACIONES} ON notificaciones (fecha_creacion, id)'
+        )
+
+
+def desindexar_notificaciones(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_NOTIFICACIONES}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_asignacionparqueo_notificacion'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas});',
+            reverse_sql=f'DROP INDEX IF EXISTS {nombre};',
+        )
+        for nombre, tabla, columnas in INDICES
+    ] + [
+        migrations.RunPython(indexar_notificaciones, desindexar_notificaciones),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+# PostgreSQL no indexa automáticamente las FKs; el reporte de visitas agrupa por ellas.
+INDICES = [
+    ('visitas_visitante_id_idx', 'visitas', 'visitante_id'),
+    ('visitas_vivienda_destino_id_idx', 'visitas', 'vivienda_destino_id'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_indices_paginacion_keyset'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas});',
+            reverse_sql=f'DROP INDEX IF EXISTS {nombre};',
+        )
+        for nombre, tabla, columnas in INDICES
+    ]
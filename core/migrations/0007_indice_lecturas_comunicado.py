@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indices_reporte_visitas'),
+    ]
+
+    operations = [
+        # Página de lecturas de un comunicado ordenada por id
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS lecturas_comunicado_comunicado_id_id_idx '
+                'ON lecturas_comunicado (comunicado_id, id);',
+            reverse_sql='DROP INDEX IF EXISTS lecturas_comunicado_comunicado_id_id_idx;',
+        ),
+    ]
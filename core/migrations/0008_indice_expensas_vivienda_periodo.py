@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_indice_lecturas_comunicado'),
+    ]
+
+    operations = [
+        # Búsqueda de la expensa de una vivienda en un periodo (generación idempotente)
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS expensas_vivienda_periodo_idx '
+                'ON expensas (vivienda_id, periodo);',
+            reverse_sql='DROP INDEX IF EXISTS expensas_vivienda_periodo_idx;',
+        ),
+    ]
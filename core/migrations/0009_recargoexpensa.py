@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_indice_expensas_vivienda_periodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecargoExpensa',
+            fields=[
+                ('expensa', models.OneToOneField(db_column='expensa_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recargo', serialize=False, to='core.expensa')),
+                ('dias_mora', models.IntegerField()),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('actualizado_en', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'recargos_expensa',
+            },
+        ),
+        # Expensas vencidas pendientes (acumulación diaria de recargos)
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS expensas_pendientes_vencimiento_idx "
+                "ON expensas (vencimiento, id) WHERE estado = 'PENDIENTE';",
+            reverse_sql='DROP INDEX IF EXISTS expensas_pendientes_vencimiento_idx;',
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recargoexpensa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AplicacionPago',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('monto', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('por_referencia', models.BooleanField(default=False)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('expensa', models.ForeignKey(blank=True, db_column='expensa_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='aplicaciones', to='core.expensa')),
+                ('multa', models.ForeignKey(blank=True, db_column='multa_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='aplicaciones', to='core.multa')),
+                ('pago', models.ForeignKey(db_column='pago_id', on_delete=django.db.models.deletion.CASCADE, related_name='aplicaciones', to='core.pago')),
+            ],
+            options={
+                'db_table': 'aplicaciones_pago',
+            },
+        ),
+        # Búsqueda de pagos por referencia y de deudas abiertas por vivienda
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS pagos_referencia_idx "
+                "ON pagos (referencia_cod) WHERE referencia_cod IS NOT NULL;",
+            reverse_sql='DROP INDEX IF EXISTS pagos_referencia_idx;',
+        ),
+        migrations.RunSQL(
+            sql="CREATE INDEX IF NOT EXISTS multas_pendientes_vivienda_idx "
+                "ON multas (vivienda_id, fecha, id) WHERE estado = 'PENDIENTE';",
+            reverse_sql='DROP INDEX IF EXISTS multas_pendientes_vivienda_idx;',
+        ),
+    ]
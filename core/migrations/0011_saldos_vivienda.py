@@ -0,0 +1,88 @@
+# Generated by Django 5.2 on 2026-10-18 13:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _a_fecha(vendor, expresion):
+    if vendor == 'postgresql':
+        return f'CAST({expresion} AS date)'
+    return f'date({expresion})'
+
+
+def cargar_existentes(apps, schema_editor):
+    """Movimientos de las expensas, multas y pagos CONFIRMADO existentes y un saldo por vivienda."""
+    from django.utils import timezone
+
+    vendor = schema_editor.connection.vendor
+    hoy = timezone.now().date()
+    ahora = timezone.now()
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO movimientos_cuenta (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT e.vivienda_id, 'EXPENSA', e.id,
+                   COALESCE(e.vencimiento, {_a_fecha(vendor, "e.periodo || '-01'")}), e.monto
+            FROM expensas e
+        """)
+        cursor.execute(f"""
+            INSERT INTO movimientos_cuenta (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT m.vivienda_id, 'MULTA', m.id, COALESCE({_a_fecha(vendor, 'm.fecha')}, %s), m.monto
+            FROM multas m
+            WHERE m.monto IS NOT NULL
+        """, [hoy])
+        cursor.execute(f"""
+            INSERT INTO movimientos_cuenta (vivienda_id, origen, origen_id, fecha, importe)
+            SELECT p.vivienda_id, 'PAGO', p.id, COALESCE({_a_fecha(vendor, 'p.fecha')}, %s), -p.monto
+            FROM pagos p
+            WHERE p.estado = 'CONFIRMADO'
+        """, [hoy])
+        cursor.execute("""
+            INSERT INTO saldos_vivienda (vivienda_id, cargos, abonos, saldo, actualizado_en)
+            SELECT v.id,
+                   COALESCE(SUM(CASE WHEN m.importe > 0 THEN m.importe END), 0),
+                   COALESCE(-SUM(CASE WHEN m.importe < 0 THEN m.importe END), 0),
+                   COALESCE(SUM(m.importe), 0), %s
+            FROM viviendas v
+            LEFT JOIN movimientos_cuenta m ON m.vivienda_id = v.id
+            GROUP BY v.id
+        """, [ahora])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_aplicacionpago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoVivienda',
+            fields=[
+                ('vivienda', models.OneToOneField(db_column='vivienda_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='core.vivienda')),
+                ('cargos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('abonos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'saldos_vivienda',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoCuenta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('origen', models.TextField()),
+                ('origen_id', models.BigIntegerField()),
+                ('fecha', models.DateField()),
+                ('importe', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('vivienda', models.ForeignKey(db_column='vivienda_id', on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='core.vivienda')),
+            ],
+            options={
+                'db_table': 'movimientos_cuenta',
+                'indexes': [models.Index(fields=['vivienda', 'fecha', 'id'], name='movimientos_viv_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origen', 'origen_id'), name='movimientos_cuenta_origen_uniq')],
+            },
+        ),
+        migrations.RunPython(cargar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+
+# Búsqueda de la reserva vecina por área y hora de inicio (core.reservas)
+INDICE = 'reservas_area_inicio_idx'
+
+RESTRICCION = 'reservas_sin_solapamiento'
+
+SOLAPAMIENTOS = """
+    SELECT COUNT(*) FROM reservas a
+    JOIN reservas b ON a.area_id = b.area_id AND a.id < b.id
+     AND a.hora_inicio < b.hora_fin AND b.hora_inicio < a.hora_fin
+    WHERE COALESCE(a.estado, '') NOT IN ('CANCELADA', 'RECHAZADA')
+      AND COALESCE(b.estado, '') NOT IN ('CANCELADA', 'RECHAZADA')
+"""
+
+
+def crear_restriccion(apps, schema_editor):
+    """Restricción de exclusión por área e intervalo; solo en PostgreSQL."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(SOLAPAMIENTOS)
+        solapadas = cursor.fetchone()[0]
+        if solapadas:
+            raise RuntimeError(
+                f'Hay {solapadas} pares de reservas activas solapadas; '
+                'cancélelas o corríjalas antes de aplicar esta migración.'
+            )
+        cursor.execute(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_name = 'reservas' AND column_name = 'hora_inicio'"
+        )
+        rango = 'tstzrange' if cursor.fetchone()[0] == 'timestamp with time zone' else 'tsrange'
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        cursor.execute(f'ALTER TABLE reservas DROP CONSTRAINT IF EXISTS {RESTRICCION}')
+        cursor.execute(f"""
+            ALTER TABLE reservas ADD CONSTRAINT {RESTRICCION}
+            EXCLUDE USING gist (area_id WITH =, {rango}(hora_inicio, hora_fin) WITH &&)
+            WHERE (COALESCE(estado, '') NOT IN ('CANCELADA', 'RECHAZADA'))
+        """)
+
+
+def quitar_restriccion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'ALTER TABLE reservas DROP CONSTRAINT IF EXISTS {RESTRICCION}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_saldos_vivienda'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {INDICE} ON reservas (area_id, hora_inicio);',
+            reverse_sql=f'DROP INDEX IF EXISTS {INDICE};',
+        ),
+        migrations.RunPython(crear_restriccion, quitar_restriccion),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+
+# La tabla asignaciones_parqueo no existía en la base (ver api_urls); se crea
+# si falta. Las asignaciones activas son únicas por parqueo y por vehículo.
+TABLA = {
+    'postgresql': """
+        CREATE TABLE IF NOT EXISTS asignaciones_parqueo (
+            id BIGSERIAL PRIMARY KEY,
+            vehiculo_id BIGINT NOT NULL REFERENCES vehiculos (id) ON DELETE CASCADE,
+            parqueo_id BIGINT NOT NULL REFERENCES parqueos (id) ON DELETE CASCADE,
+            fecha_asignacion TIMESTAMPTZ NOT NULL DEFAULT now(),
+            activa BOOLEAN NOT NULL DEFAULT TRUE
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS asignaciones_parqueo (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehiculo_id BIGINT NOT NULL REFERENCES vehiculos (id),
+            parqueo_id BIGINT NOT NULL REFERENCES parqueos (id),
+            fecha_asignacion DATETIME NOT NULL,
+            activa BOOL NOT NULL DEFAULT 1
+        )
+    """,
+}
+
+INDICES = [
+    ('asignaciones_parqueo_activa_uniq', 'CREATE UNIQUE INDEX IF NOT EXISTS {} ON asignaciones_parqueo (parqueo_id) WHERE activa'),
+    ('asignaciones_vehiculo_activa_uniq', 'CREATE UNIQUE INDEX IF NOT EXISTS {} ON asignaciones_parqueo (vehiculo_id) WHERE activa'),
+    # Paginación keyset de listar_asignaciones_parqueo
+    ('asignaciones_parqueo_fecha_id_idx', 'CREATE INDEX IF NOT EXISTS {} ON asignaciones_parqueo (fecha_asignacion, id)'),
+    # Búsqueda de "cualquier parqueo libre"
+    ('parqueos_libres_idx', 'CREATE INDEX IF NOT EXISTS {} ON parqueos (id) WHERE NOT ocupado'),
+]
+
+
+def crear_tabla(apps, schema_editor):
+    schema_editor.execute(TABLA[schema_editor.connection.vendor])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_reservas_sin_solapamiento'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla, migrations.RunPython.noop),
+    ] + [
+        migrations.RunSQL(
+            sql=sql.format(nombre) + ';',
+            reverse_sql=f'DROP INDEX IF EXISTS {nombre};',
+        )
+        for nombre, sql in INDICES
+    ]
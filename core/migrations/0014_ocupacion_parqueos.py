@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+def agregar_zona(apps, schema_editor):
+    """parqueos no la administra Django: agrega la columna zona si falta."""
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        columnas = [c.name for c in conexion.introspection.get_table_description(cursor, 'parqueos')]
+    if 'zona' not in columnas:
+        schema_editor.execute('ALTER TABLE parqueos ADD COLUMN zona TEXT NULL')
+
+
+CONTAR = """
+    INSERT INTO ocupacion_parqueos (zona, total, ocupados)
+    SELECT COALESCE(zona, ''), COUNT(*), SUM(CASE WHEN ocupado THEN 1 ELSE 0 END)
+    FROM parqueos
+    GROUP BY COALESCE(zona, '')
+"""
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_asignaciones_parqueo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcupacionZona',
+            fields=[
+                ('zona', models.TextField(primary_key=True, serialize=False)),
+                ('total', models.IntegerField(default=0)),
+                ('ocupados', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'ocupacion_parqueos',
+            },
+        ),
+        migrations.RunPython(agregar_zona, migrations.RunPython.noop),
+        migrations.RunSQL(sql=CONTAR, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+# Búsquedas de la portería por documento y por placa (core.visitas)
+INDICES = [
+    ('visitantes_num_doc_idx', 'num_doc'),
+    ('visitantes_placa_idx', 'placa'),
+]
+
+
+def agregar_placa(apps, schema_editor):
+    """visitantes no la administra Django: agrega la columna placa si falta."""
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        columnas = [c.name for c in conexion.introspection.get_table_description(cursor, 'visitantes')]
+    if 'placa' not in columnas:
+        schema_editor.execute('ALTER TABLE visitantes ADD COLUMN placa TEXT NULL')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_ocupacion_parqueos'),
+    ]
+
+    operations = [
+        migrations.RunPython(agregar_placa, migrations.RunPython.noop),
+    ] + [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {nombre} ON visitantes ({columna}) WHERE {columna} IS NOT NULL;',
+            reverse_sql=f'DROP INDEX IF EXISTS {nombre};',
+        )
+        for nombre, columna in INDICES
+    ]
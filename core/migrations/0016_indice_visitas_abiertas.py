@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+# Solo las visitas sin salida: la carga del índice de presencia (core.presencia)
+# no recorre el historial.
+INDICE = 'visitas_abiertas_idx'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_visitantes_placa'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {INDICE} ON visitas (entrada, id) WHERE salida IS NULL;',
+            reverse_sql=f'DROP INDEX IF EXISTS {INDICE};',
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-18 13:36
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Última visita por visitante en listar_visitantes
+INDICE_VISITAS = 'visitas_visitante_entrada_idx'
+
+
+def intercalacion_c(apps, schema_editor):
+    """Orden por bytes en termino para que el rango de prefijos use el índice (PostgreSQL)."""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE terminos_busqueda ALTER COLUMN termino TYPE text COLLATE "C"')
+
+
+# Copia de core.busqueda al momento de esta migración: cambios posteriores del
+# módulo no deben alterar lo que hace la carga inicial.
+TAMANO_LOTE = 5000
+
+
+def _normalizar(texto):
+    if not texto:
+        return []
+    ascii_ = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return re.findall(r'[a-z0-9]+', ascii_.lower())
+
+
+def _terminos(instancia):
+    terminos = set(_normalizar(instancia.nombres)) | set(_normalizar(instancia.apellidos))
+    documento = _normalizar(instancia.num_doc)
+    terminos.update(documento)
+    if len(documento) > 1:
+        terminos.add(''.join(documento))
+    return terminos
+
+
+def indexar_existentes(apps, schema_editor):
+    TerminoBusqueda = apps.get_model('core', 'TerminoBusqueda')
+    for nombre, etiqueta in (('Visitante', 'VISITANTE'), ('Persona', 'PERSONA')):
+        filas = apps.get_model('core', nombre).objects.only('id', 'nombres', 'apellidos', 'num_doc')
+        lote = []
+        for instancia in filas.order_by('id').iterator(chunk_size=TAMANO_LOTE):
+            lote.extend(
+                TerminoBusqueda(modelo=etiqueta, objeto_id=instancia.pk, termino=termino)
+                for termino in _terminos(instancia)
+            )
+            if len(lote) >= TAMANO_LOTE:
+                TerminoBusqueda.objects.bulk_create(lote)
+                lote = []
+        TerminoBusqueda.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_indice_visitas_abiertas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('modelo', models.TextField()),
+                ('objeto_id', models.BigIntegerField()),
+                ('termino', models.TextField()),
+            ],
+            options={
+                'db_table': 'terminos_busqueda',
+                'indexes': [models.Index(fields=['modelo', 'termino', 'objeto_id'], name='terminos_busqueda_prefijo_idx'), models.Index(fields=['modelo', 'objeto_id'], name='terminos_busqueda_objeto_idx')],
+            },
+        ),
+        migrations.RunPython(intercalacion_c, migrations.RunPython.noop),
+        migrations.RunPython(indexar_existentes, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {INDICE_VISITAS} ON visitas (visitante_id, entrada);',
+            reverse_sql=f'DROP INDEX IF EXISTS {INDICE_VISITAS};',
+        ),
+    ]
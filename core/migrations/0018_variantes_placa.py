@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-18 13:38
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDICE = 'vehiculos_placa_normalizada_idx'
+
+# Copia de core.vehiculos al momento de esta migración: cambios posteriores del
+# módulo no deben alterar lo que hace la carga inicial.
+TAMANO_LOTE = 5000
+
+
+def _normalizar_placa(placa):
+    if placa is None:
+        return None
+    return re.sub(r'[\W_]+', '', str(placa)).upper() or None
+
+
+def _variantes(clave):
+    if not clave:
+        return set()
+    return {clave} | {clave[:i] + clave[i + 1:] for i in range(len(clave))}
+
+
+def agregar_placa_normalizada(apps, schema_editor):
+    """vehiculos no la administra Django: agrega la columna placa_normalizada si falta."""
+    conexion = schema_editor.connection
+    with conexion.cursor() as cursor:
+        columnas = [c.name for c in conexion.introspection.get_table_description(cursor, 'vehiculos')]
+    if 'placa_normalizada' not in columnas:
+        schema_editor.execute('ALTER TABLE vehiculos ADD COLUMN placa_normalizada TEXT NULL')
+
+
+def normalizar_existentes(apps, schema_editor):
+    VariantePlaca = apps.get_model('core', 'VariantePlaca')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT id, placa FROM vehiculos ORDER BY id')
+        filas = cursor.fetchall()
+        for i in range(0, len(filas), TAMANO_LOTE):
+            lote = [(vehiculo_id, _normalizar_placa(placa)) for vehiculo_id, placa in filas[i:i + TAMANO_LOTE]]
+            cursor.executemany(
+                'UPDATE vehiculos SET placa_normalizada = %s WHERE id = %s',
+                [(clave, vehiculo_id) for vehiculo_id, clave in lote],
+            )
+            VariantePlaca.objects.bulk_create(
+                VariantePlaca(vehiculo_id=vehiculo_id, variante=variante)
+                for vehiculo_id, clave in lote
+                for variante in _variantes(clave)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_terminos_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VariantePlaca',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('variante', models.TextField()),
+                ('vehiculo', models.ForeignKey(db_column='vehiculo_id', on_delete=django.db.models.deletion.CASCADE, related_name='variantes_placa', to='core.vehiculo')),
+            ],
+            options={
+                'db_table': 'variantes_placa',
+                'indexes': [models.Index(fields=['variante'], name='variantes_placa_variante_idx')],
+            },
+        ),
+        migrations.RunPython(agregar_placa_normalizada, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS {INDICE} ON vehiculos (placa_normalizada);',
+            reverse_sql=f'DROP INDEX IF EXISTS {INDICE};',
+        ),
+        migrations.RunPython(normalizar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2 on 2026-10-18 13:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+COLUMNAS = 'id, visitante_id, vivienda_destino_id, entrada, salida, medio'
+
+# Las condiciones sobre la vista se aplican a cada rama del UNION ALL y usan sus índices
+VISTA = f"""
+    SELECT {COLUMNAS} FROM visitas
+    UNION ALL
+    SELECT {COLUMNAS} FROM visitas_archivo
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_variantes_placa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitaHistorica',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('entrada', models.DateTimeField()),
+                ('salida', models.DateTimeField(blank=True, null=True)),
+                ('medio', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'visitas_historico',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='VisitaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('entrada', models.DateTimeField()),
+                ('salida', models.DateTimeField()),
+                ('medio', models.TextField(blank=True, null=True)),
+                ('visitante', models.ForeignKey(db_column='visitante_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.visitante')),
+                ('vivienda_destino', models.ForeignKey(db_column='vivienda_destino_id', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.vivienda')),
+            ],
+            options={
+                'db_table': 'visitas_archivo',
+                'indexes': [models.Index(fields=['entrada', 'id'], name='visitas_archivo_entrada_idx'), models.Index(fields=['visitante', 'entrada'], name='visitas_archivo_visitante_idx'), models.Index(fields=['vivienda_destino'], name='visitas_archivo_vivienda_idx')],
+            },
+        ),
+        migrations.RunSQL(
+            sql=f'CREATE VIEW visitas_historico AS {VISTA};',
+            reverse_sql='DROP VIEW IF EXISTS visitas_historico;',
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2 on 2026-10-18 13:41
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# Expensas por periodo y multas por mes, al recalcular o refrescar meses
+INDICES = (
+    ('expensas_periodo_idx', 'expensas (periodo, estado)'),
+    ('multas_fecha_idx', 'multas (fecha)'),
+)
+
+# Copia de core.estadisticas al momento de esta migración: cambios posteriores
+# del módulo no deben alterar lo que hace la carga inicial.
+CERO = Decimal('0')
+
+
+def _mes(valor):
+    if valor is None:
+        return None
+    if timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.strftime('%Y-%m')
+
+
+def cargar_existentes(apps, schema_editor):
+    from django.db.models import Count, Sum
+    from django.db.models.functions import TruncMonth
+
+    EstadisticaMensual = apps.get_model('core', 'EstadisticaMensual')
+    filas = []
+    visitas = (apps.get_model('core', 'VisitaHistorica').objects
+               .annotate(mes=TruncMonth('entrada')).values('mes').annotate(cantidad=Count('id')))
+    for fila in visitas:
+        filas.append(EstadisticaMensual(periodo=_mes(fila['mes']), concepto='VISITAS', estado='',
+                                        cantidad=fila['cantidad'], monto=CERO))
+    expensas = (apps.get_model('core', 'Expensa').objects
+                .values('periodo', 'estado').annotate(cantidad=Count('id'), total=Sum('monto')))
+    for fila in expensas:
+        filas.append(EstadisticaMensual(periodo=fila['periodo'], concepto='EXPENSAS', estado=fila['estado'] or '',
+                                        cantidad=fila['cantidad'], monto=fila['total'] or CERO))
+    multas = (apps.get_model('core', 'Multa').objects.exclude(fecha=None)
+              .annotate(mes=TruncMonth('fecha')).values('mes', 'estado')
+              .annotate(cantidad=Count('id'), total=Sum('monto')))
+    for fila in multas:
+        filas.append(EstadisticaMensual(periodo=_mes(fila['mes']), concepto='MULTAS', estado=fila['estado'] or '',
+                                        cantidad=fila['cantidad'], monto=fila['total'] or CERO))
+    EstadisticaMensual.objects.bulk_create(filas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_archivo_visitas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaMensual',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('periodo', models.CharField(max_length=7)),
+                ('concepto', models.TextField()),
+                ('estado', models.TextField(default='')),
+                ('cantidad', models.BigIntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'db_table': 'estadisticas_mensuales',
+                'constraints': [models.UniqueConstraint(fields=('periodo', 'concepto', 'estado'), name='estadisticas_mensuales_uniq')],
+            },
+        ),
+        *(
+            migrations.RunSQL(
+                sql=f'CREATE INDEX IF NOT EXISTS {nombre} ON {columnas};',
+                reverse_sql=f'DROP INDEX IF EXISTS {nombre};',
+            )
+            for nombre, columnas in INDICES
+        ),
+        migrations.RunPython(cargar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# Una expensa por vivienda y periodo (generar_expensas usa ON CONFLICT sobre ella);
+# reemplaza al índice simple de la migración 0008
+INDICE = 'expensas_vivienda_periodo_uniq'
+INDICE_ANTERIOR = 'expensas_vivienda_periodo_idx'
+
+DUPLICADAS = """
+    SELECT COUNT(*) FROM (
+        SELECT vivienda_id, periodo FROM expensas
+        GROUP BY vivienda_id, periodo
+        HAVING COUNT(*) > 1
+    ) d
+"""
+
+
+def crear_indice_unico(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DUPLICADAS)
+        duplicadas = cursor.fetchone()[0]
+    if duplicadas:
+        raise RuntimeError(
+            f'Hay {duplicadas} pares (vivienda, periodo) con más de una expensa; '
+            'elimine o corrija las repetidas antes de aplicar esta migración.'
+        )
+    schema_editor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {INDICE} ON expensas (vivienda_id, periodo)')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE_ANTERIOR}')
+
+
+def quitar_indice_unico(apps, schema_editor):
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDICE_ANTERIOR} ON expensas (vivienda_id, periodo)')
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_estadisticas_mensuales'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_unico, quitar_indice_unico),
+    ]
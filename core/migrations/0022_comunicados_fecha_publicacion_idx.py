@@ -0,0 +1,28 @@
+from django.db import migrations
+
+# Orden del tablón (fecha_publicacion DESC NULLS LAST, id DESC) y su cursor;
+# comunicados no es administrada por Django, así que el índice va en SQL
+INDICE = 'comunicados_fecha_publicacion_idx'
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        columnas = 'fecha_publicacion DESC NULLS LAST, id DESC'
+    else:
+        columnas = 'fecha_publicacion, id'
+    schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {INDICE} ON comunicados ({columnas})')
+
+
+def quitar_indice(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDICE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_expensas_vivienda_periodo_unica'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, quitar_indice),
+    ]
@@ -1,4 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+
+class GuardadoAtomico(models.Model):
+    # save() en una transacción: las señales que mantienen tablas derivadas
+    # (core.estadisticas) escriben junto con la fila, nunca en otra transacción
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
 
 class Condominio(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -103,6 +113,7 @@ class Vehiculo(models.Model):
     vivienda = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_id")
     tipo = models.ForeignKey(TipoVehiculo, on_delete=models.CASCADE, db_column="tipo_id")
     placa = models.TextField(unique=True)
+    placa_normalizada = models.TextField(blank=True, null=True)  # completada por core.vehiculos
     modelo = models.TextField(blank=True, null=True)
     color = models.TextField(blank=True, null=True)
 
@@ -114,6 +125,7 @@ class Parqueo(models.Model):
     id = models.BigAutoField(primary_key=True)
     codigo = models.TextField(unique=True)
     ocupado = models.BooleanField(default=True)
+    zona = models.TextField(blank=True, null=True)  # piso o sector; ver OcupacionZona
 
     class Meta:
         db_table = "parqueos"
@@ -136,12 +148,13 @@ class Visitante(models.Model):
     apellidos = models.TextField(blank=True, null=True)
     num_doc = models.TextField(blank=True, null=True)
     foto_url = models.TextField(blank=True, null=True)
+    placa = models.TextField(blank=True, null=True)
 
     class Meta:
         db_table = "visitantes"
         managed = False
 
-class Visita(models.Model):
+class Visita(GuardadoAtomico):
     id = models.BigAutoField(primary_key=True)
     visitante = models.ForeignKey(Visitante, on_delete=models.CASCADE, db_column="visitante_id")
     vivienda_destino = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_destino_id")
@@ -191,7 +204,7 @@ class ExpensaParametro(models.Model):
         db_table = "expensas_parametros"
         managed = False
 
-class Expensa(models.Model):
+class Expensa(GuardadoAtomico):
     id = models.BigAutoField(primary_key=True)
     codigo = models.TextField()
     vivienda = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_id")
@@ -214,7 +227,7 @@ class TipoInfraccion(models.Model):
         db_table = "tipos_infraccion"
         managed = False
 
-class Multa(models.Model):
+class Multa(GuardadoAtomico):
     id = models.BigAutoField(primary_key=True)
     codigo = models.TextField()
     vivienda = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_id")
@@ -303,4 +316,137 @@ class Notificacion(models.Model):
 
     class Meta:
         db_table = "notificaciones"
-        managed = False
\ No newline at end of file
+        managed = False
+
+class RecargoExpensa(models.Model):
+    # Recargo por mora acumulado de una expensa (ver core.facturacion.acumular_recargos)
+    expensa = models.OneToOneField(Expensa, on_delete=models.CASCADE, primary_key=True, db_column="expensa_id", related_name="recargo")
+    dias_mora = models.IntegerField()
+    monto = models.DecimalField(max_digits=12, decimal_places=2)
+    actualizado_en = models.DateTimeField()
+
+    class Meta:
+        db_table = "recargos_expensa"
+
+class AplicacionPago(models.Model):
+    # Parte de un pago aplicada a una expensa o multa (ver core.conciliacion).
+    # Sin expensa ni multa es saldo a favor que no encontró deuda abierta.
+    id = models.BigAutoField(primary_key=True)
+    pago = models.ForeignKey(Pago, on_delete=models.CASCADE, db_column="pago_id", related_name="aplicaciones")
+    expensa = models.ForeignKey(Expensa, on_delete=models.CASCADE, db_column="expensa_id", blank=True, null=True, related_name="aplicaciones")
+    multa = models.ForeignKey(Multa, on_delete=models.CASCADE, db_column="multa_id", blank=True, null=True, related_name="aplicaciones")
+    monto = models.DecimalField(max_digits=12, decimal_places=2)
+    por_referencia = models.BooleanField(default=False)
+    creado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "aplicaciones_pago"
+
+class SaldoVivienda(models.Model):
+    # Saldo corriente por vivienda, mantenido por core.estado_cuenta
+    vivienda = models.OneToOneField(Vivienda, on_delete=models.CASCADE, primary_key=True, db_column="vivienda_id", related_name="saldo")
+    cargos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    abonos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # cargos - abonos
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "saldos_vivienda"
+
+class MovimientoCuenta(models.Model):
+    # Un movimiento por expensa, multa o pago confirmado; importe > 0 es cargo, < 0 abono
+    id = models.BigAutoField(primary_key=True)
+    vivienda = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_id", related_name="movimientos")
+    origen = models.TextField()  # EXPENSA, MULTA, PAGO
+    origen_id = models.BigIntegerField()
+    fecha = models.DateField()
+    importe = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        db_table = "movimientos_cuenta"
+        constraints = [
+            models.UniqueConstraint(fields=["origen", "origen_id"], name="movimientos_cuenta_origen_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["vivienda", "fecha", "id"], name="movimientos_viv_fecha_idx"),
+        ]
+
+class OcupacionZona(models.Model):
+    # Contadores de parqueos por zona ('' = sin zona), mantenidos por core.parqueos
+    zona = models.TextField(primary_key=True)
+    total = models.IntegerField(default=0)
+    ocupados = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "ocupacion_parqueos"
+
+class TerminoBusqueda(models.Model):
+    # Términos normalizados de visitantes y personas, mantenidos por core.busqueda
+    id = models.BigAutoField(primary_key=True)
+    modelo = models.TextField()  # VISITANTE, PERSONA
+    objeto_id = models.BigIntegerField()
+    termino = models.TextField()
+
+    class Meta:
+        db_table = "terminos_busqueda"
+        indexes = [
+            models.Index(fields=["modelo", "termino", "objeto_id"], name="terminos_busqueda_prefijo_idx"),
+            models.Index(fields=["modelo", "objeto_id"], name="terminos_busqueda_objeto_idx"),
+        ]
+
+class VariantePlaca(models.Model):
+    # Placa normalizada y sus variantes con un carácter menos, mantenidas por core.vehiculos
+    id = models.BigAutoField(primary_key=True)
+    vehiculo = models.ForeignKey(Vehiculo, on_delete=models.CASCADE, db_column="vehiculo_id", related_name="variantes_placa")
+    variante = models.TextField()
+
+    class Meta:
+        db_table = "variantes_placa"
+        indexes = [
+            models.Index(fields=["variante"], name="variantes_placa_variante_idx"),
+        ]
+
+class VisitaArchivada(models.Model):
+    # Visitas cerradas movidas desde visitas por core.archivo_visitas (conservan su id)
+    id = models.BigIntegerField(primary_key=True)
+    visitante = models.ForeignKey(Visitante, on_delete=models.CASCADE, db_column="visitante_id", related_name="+")
+    vivienda_destino = models.ForeignKey(Vivienda, on_delete=models.CASCADE, db_column="vivienda_destino_id", related_name="+")
+    entrada = models.DateTimeField()
+    salida = models.DateTimeField()
+    medio = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = "visitas_archivo"
+        indexes = [
+            models.Index(fields=["entrada", "id"], name="visitas_archivo_entrada_idx"),
+            models.Index(fields=["visitante", "entrada"], name="visitas_archivo_visitante_idx"),
+            models.Index(fields=["vivienda_destino"], name="visitas_archivo_vivienda_idx"),
+        ]
+
+class VisitaHistorica(models.Model):
+    # Vista visitas_historico: visitas UNION ALL visitas_archivo, solo lectura
+    id = models.BigIntegerField(primary_key=True)
+    visitante = models.ForeignKey(Visitante, on_delete=models.DO_NOTHING, db_column="visitante_id", db_constraint=False, related_name="+")
+    vivienda_destino = models.ForeignKey(Vivienda, on_delete=models.DO_NOTHING, db_column="vivienda_destino_id", db_constraint=False, related_name="+")
+    entrada = models.DateTimeField()
+    salida = models.DateTimeField(blank=True, null=True)
+    medio = models.TextField(blank=True, null=True)
+
+    class Meta:
+        db_table = "visitas_historico"
+        managed = False
+
+class EstadisticaMensual(models.Model):
+    # Cantidad y monto por mes, concepto y estado, mantenidos por core.estadisticas
+    id = models.BigAutoField(primary_key=True)
+    periodo = models.CharField(max_length=7)  # YYYY-MM
+    concepto = models.TextField()  # VISITAS, EXPENSAS, MULTAS
+    estado = models.TextField(default='')  # '' en visitas
+    cantidad = models.BigIntegerField(default=0)
+    monto = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = "estadisticas_mensuales"
+        constraints = [
+            models.UniqueConstraint(fields=["periodo", "concepto", "estado"], name="estadisticas_mensuales_uniq"),
+        ]
@@ -0,0 +1,212 @@
+"""
+Asignación de parqueos sin carreras.
+
+El parqueo se reclama con SELECT ... FOR UPDATE SKIP LOCKED dentro de una
+transacción: si otra petición está tomando la misma fila se pasa a la
+siguiente libre (o se informa que no está disponible) en lugar de esperar.
+Los índices únicos parciales de asignaciones_parqueo (una asignación activa
+por parqueo y por vehículo) son la última barrera ante una doble asignación.
+
+En SQLite FOR UPDATE no existe; las escrituras ya se serializan por el
+bloqueo de la base.
+
+La ocupación por zona y total se lee de ocupacion_parqueos. Cada cambio de
+ocupado suma o resta 1 a su zona con F() dentro de la misma transacción que
+reclama o libera el parqueo (las zonas en orden, para no cruzar bloqueos);
+reconciliar_ocupacion() bloquea los contadores antes de recontar, así que
+un ajuste y un recuento corren uno detrás del otro.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidar_dashboard
+from .models import AsignacionParqueo, OcupacionZona, Parqueo, Vehiculo
+
+
+class ParqueoNoDisponible(Exception):
+    """No hay parqueo libre (o el pedido está ocupado) o el vehículo ya tiene uno."""
+
+
+def _contar(deltas):
+    """deltas: {zona: +1/-1}; se aplican en la transacción en curso, zona por zona en orden."""
+    for zona, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        if not OcupacionZona.objects.filter(zona=zona).update(ocupados=F('ocupados') + delta):
+            # Zona sin contador: el recuento ve el cambio de esta misma transacción
+            reconciliar_ocupacion()
+    transaction.on_commit(invalidar_dashboard)
+
+
+def _reclamar(parqueo_id=None):
+    """Bloquea y marca como ocupado un parqueo libre; None si no hay (el contador lo ajusta quien llama)."""
+    libres = Parqueo.objects.select_for_update(skip_locked=True).filter(ocupado=False)
+    if parqueo_id is not None:
+        libres = libres.filter(pk=parqueo_id)
+    parqueo = libres.order_by('id').first()
+    if parqueo is not None:
+        Parqueo.objects.filter(pk=parqueo.pk).update(ocupado=True)
+        parqueo.ocupado = True
+    return parqueo
+
+
+def _liberar(parqueo_id):
+    """Marca el parqueo como libre si estaba ocupado; devuelve su zona o None si no cambió."""
+    zona = Parqueo.objects.filter(pk=parqueo_id).values_list('zona', flat=True).first()
+    if Parqueo.objects.filter(pk=parqueo_id, ocupado=True).update(ocupado=False):
+        return zona or ''
+    return None
+
+
+def _no_disponible(parqueo_id):
+    if parqueo_id is not None and not Parqueo.objects.filter(pk=parqueo_id).exists():
+        raise Parqueo.DoesNotExist(f"No existe el parqueo {parqueo_id}")
+    if parqueo_id is not None:
+        return ParqueoNoDisponible("El parqueo ya está ocupado")
+    return ParqueoNoDisponible("No hay parqueos libres")
+
+
+def asignar_parqueo(vehiculo_id, parqueo_id=None):
+    """
+    Asigna al vehículo el parqueo pedido o, sin parqueo_id, el primer libre.
+    Lanza Vehiculo.DoesNotExist / Parqueo.DoesNotExist o ParqueoNoDisponible.
+    """
+    try:
+        with transaction.atomic():
+            # Serializa las asignaciones del mismo vehículo
+            vehiculo = Vehiculo.objects.select_for_update().get(pk=vehiculo_id)
+            if AsignacionParqueo.objects.filter(vehiculo_id=vehiculo.pk, activa=True).exists():
+                raise ParqueoNoDisponible("El vehículo ya tiene un parqueo asignado")
+            parqueo = _reclamar(parqueo_id)
+            if parqueo is None:
+                raise _no_disponible(parqueo_id)
+            _contar({parqueo.zona or '': 1})
+            asignacion = AsignacionParqueo.objects.create(
+                vehiculo=vehiculo,
+                parqueo=parqueo,
+                fecha_asignacion=timezone.now(),
+                activa=True
+            )
+    except IntegrityError:
+        raise ParqueoNoDisponible("El parqueo o el vehículo ya tienen una asignación activa")
+    return asignacion
+
+
+def reasignar_parqueo(asignacion_id, parqueo_id):
+    """Mueve una asignación activa a otro parqueo libre, liberando el anterior."""
+    try:
+        with transaction.atomic():
+            asignacion = AsignacionParqueo.objects.select_for_update().get(pk=asignacion_id)
+            if not asignacion.activa:
+                raise ValueError("La asignación no está activa")
+            if str(asignacion.parqueo_id) == str(parqueo_id):
+                return asignacion
+            parqueo = _reclamar(parqueo_id)
+            if parqueo is None:
+                raise _no_disponible(parqueo_id)
+            deltas = {parqueo.zona or '': 1}
+            liberada = _liberar(asignacion.parqueo_id)
+            if liberada is not None:
+                deltas[liberada] = deltas.get(liberada, 0) - 1
+            _contar(deltas)
+            asignacion.parqueo = parqueo
+            asignacion.save(update_fields=['parqueo'])
+    except IntegrityError:
+        raise ParqueoNoDisponible("El parqueo ya tiene una asignación activa")
+    return asignacion
+
+
+def reactivar_parqueo(asignacion_id):
+    """Vuelve a activar una asignación si su parqueo sigue libre."""
+    try:
+        with transaction.atomic():
+            asignacion = AsignacionParqueo.objects.select_for_update().get(pk=asignacion_id)
+            if asignacion.activa:
+                return asignacion
+            parqueo = _reclamar(asignacion.parqueo_id)
+            if parqueo is None:
+                raise _no_disponible(asignacion.parqueo_id)
+            _contar({parqueo.zona or '': 1})
+            asignacion.activa = True
+            asignacion.save(update_fields=['activa'])
+    except IntegrityError:
+        raise ParqueoNoDisponible("El parqueo o el vehículo ya tienen una asignación activa")
+    return asignacion
+
+
+def liberar_parqueo(asignacion_id, eliminar=False):
+    """Desactiva (o elimina) la asignación y deja libre su parqueo."""
+    with transaction.atomic():
+        asignacion = AsignacionParqueo.objects.select_for_update().get(pk=asignacion_id)
+        if asignacion.activa:
+            liberada = _liberar(asignacion.parqueo_id)
+            if liberada is not None:
+                _contar({liberada: -1})
+        if eliminar:
+            asignacion.delete()
+        elif asignacion.activa:
+            asignacion.activa = False
+            asignacion.save(update_fields=['activa'])
+    return asignacion
+
+
+def ocupacion_parqueos():
+    """Totales y ocupación por zona leídos de los contadores (una consulta sobre pocas filas)."""
+    zonas = {}
+    total = ocupados = 0
+    for fila in OcupacionZona.objects.order_by('zona').values('zona', 'total', 'ocupados'):
+        zonas[fila['zona'] or 'sin_zona'] = {
+            'total': fila['total'],
+            'ocupados': fila['ocupados'],
+            'disponibles': fila['total'] - fila['ocupados'],
+        }
+        total += fila['total']
+        ocupados += fila['ocupados']
+    return {'total': total, 'ocupados': ocupados, 'disponibles': total - ocupados, 'zonas': zonas}
+
+
+def reconciliar_ocupacion():
+    """
+    Recuenta parqueos por zona y corrige los contadores; devuelve las zonas corregidas.
+
+    Los contadores se bloquean antes de recontar: una asignación que ya
+    ajustó su zona confirmó antes (y entra en el recuento); una que todavía no
+    la ajustó espera al recuento y suma encima, sin contarse dos veces.
+    """
+    correcciones = []
+    with transaction.atomic():
+        # En el mismo orden por zona que _contar, para no cruzar bloqueos
+        actuales = {
+            fila['zona']: fila
+            for fila in OcupacionZona.objects.select_for_update().order_by('zona').values('zona', 'total', 'ocupados')
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT COALESCE(zona, ''), COUNT(*), SUM(CASE WHEN ocupado THEN 1 ELSE 0 END)
+                FROM {Parqueo._meta.db_table}
+                GROUP BY COALESCE(zona, '')
+            """)
+            reales = {zona: (int(total), int(ocupados or 0)) for zona, total, ocupados in cursor.fetchall()}
+
+        for zona, (total, ocupados) in reales.items():
+            actual = actuales.get(zona)
+            if actual is None:
+                OcupacionZona.objects.create(zona=zona, total=total, ocupados=ocupados)
+            elif (actual['total'], actual['ocupados']) != (total, ocupados):
+                OcupacionZona.objects.filter(zona=zona).update(total=total, ocupados=ocupados)
+            else:
+                continue
+            correcciones.append({
+                'zona': zona,
+                'antes': (actual['total'], actual['ocupados']) if actual else None,
+                'despues': (total, ocupados),
+            })
+        sobrantes = [zona for zona in actuales if zona not in reales]
+        if sobrantes:
+            OcupacionZona.objects.filter(zona__in=sobrantes).delete()
+            correcciones.extend({'zona': zona, 'antes': (actuales[zona]['total'], actuales[zona]['ocupados']),
+                                 'despues': None} for zona in sobrantes)
+    if correcciones:
+        transaction.on_commit(invalidar_dashboard)
+    return correcciones
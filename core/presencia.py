@@ -0,0 +1,127 @@
+"""
+Índice en memoria de las visitas abiertas (quién está dentro ahora).
+
+Guarda solo las visitas sin salida, por id y por vivienda, con los datos que
+muestra la portería; responder "quién está dentro" (total o de una vivienda)
+cuesta O(visitas abiertas) y no toca el historial de visitas.
+
+Se carga desde la base en el primer uso de cada proceso, con una consulta
+sobre el índice parcial visitas_abiertas_idx (migración 0016). Las señales
+de core.signals lo actualizan al confirmarse cada entrada, salida o borrado
+hecho en este proceso; como otros workers tienen su propio índice, se
+vuelve a cargar cada PRESENCIA_TTL segundos y tras inserciones en lote.
+Por eso solo lo usa la vista de portería (visitas_presentes); los reportes y
+alertas cuentan las visitas abiertas en la base.
+"""
+import threading
+import time
+
+from .models import Visita
+
+PRESENCIA_TTL = 60  # segundos
+
+CAMPOS = (
+    'id', 'visitante_id', 'visitante__nombres', 'visitante__apellidos',
+    'vivienda_destino_id', 'vivienda_destino__codigo', 'entrada', 'medio',
+)
+
+
+def _fila(visita):
+    return {
+        'id': visita['id'],
+        'visitante_id': visita['visitante_id'],
+        'visitante_nombre': f"{visita['visitante__nombres']} {visita['visitante__apellidos']}",
+        'vivienda_destino_id': visita['vivienda_destino_id'],
+        'codigo_vivienda': visita['vivienda_destino__codigo'],
+        'entrada': visita['entrada'],
+        'medio': visita['medio'],
+    }
+
+
+class IndicePresencia:
+    """Visitas abiertas por id y por vivienda."""
+
+    def __init__(self, ttl=PRESENCIA_TTL):
+        self.ttl = ttl
+        self._candado = threading.RLock()
+        self._visitas = {}
+        self._por_vivienda = {}
+        self._cargado_en = None
+
+    def _vigente(self):
+        return self._cargado_en is not None and time.monotonic() - self._cargado_en < self.ttl
+
+    def reconstruir(self):
+        """Recarga las visitas abiertas desde la base."""
+        with self._candado:
+            visitas = {}
+            por_vivienda = {}
+            for visita in Visita.objects.filter(salida__isnull=True).values(*CAMPOS):
+                fila = _fila(visita)
+                visitas[fila['id']] = fila
+                por_vivienda.setdefault(fila['vivienda_destino_id'], set()).add(fila['id'])
+            self._visitas = visitas
+            self._por_vivienda = por_vivienda
+            self._cargado_en = time.monotonic()
+
+    def invalidar(self):
+        """La próxima lectura recarga desde la base."""
+        with self._candado:
+            self._cargado_en = None
+
+    def _asegurar(self):
+        if not self._vigente():
+            self.reconstruir()
+
+    def _quitar(self, visita_id):
+        fila = self._visitas.pop(visita_id, None)
+        if fila is not None:
+            ids = self._por_vivienda.get(fila['vivienda_destino_id'])
+            if ids is not None:
+                ids.discard(visita_id)
+                if not ids:
+                    del self._por_vivienda[fila['vivienda_destino_id']]
+
+    def registrar(self, fila):
+        """Agrega (o reemplaza) una visita abierta con las claves de _fila()."""
+        with self._candado:
+            if self._cargado_en is None:
+                return  # se verá en la próxima carga
+            self._quitar(fila['id'])
+            self._visitas[fila['id']] = fila
+            self._por_vivienda.setdefault(fila['vivienda_destino_id'], set()).add(fila['id'])
+
+    def registrar_visita(self, visita_id):
+        """Agrega la visita leyendo sus datos por clave primaria, o la quita si ya salió o no existe."""
+        with self._candado:
+            if self._cargado_en is None:
+                return
+            visita = Visita.objects.filter(pk=visita_id, salida__isnull=True).values(*CAMPOS).first()
+            if visita is None:
+                self._quitar(visita_id)
+            else:
+                self.registrar(_fila(visita))
+
+    def quitar(self, visita_id):
+        with self._candado:
+            self._quitar(visita_id)
+
+    def renombrar_visitante(self, visitante_id, nombre):
+        with self._candado:
+            for fila in self._visitas.values():
+                if fila['visitante_id'] == visitante_id:
+                    fila['visitante_nombre'] = nombre
+
+    def presentes(self, vivienda_id=None):
+        """Visitas abiertas (de una vivienda si se indica), de la más reciente a la más antigua."""
+        with self._candado:
+            self._asegurar()
+            if vivienda_id is None:
+                filas = [dict(fila) for fila in self._visitas.values()]
+            else:
+                filas = [dict(self._visitas[i]) for i in self._por_vivienda.get(vivienda_id, ())]
+        filas.sort(key=lambda fila: (fila['entrada'], fila['id']), reverse=True)
+        return filas
+
+
+presencia = IndicePresencia()
@@ -0,0 +1,44 @@
+"""
+Ejecutor de pruebas para las tablas no administradas de core.
+
+Los modelos de core con managed = False corresponden a tablas creadas por
+fuera de Django, y varias migraciones (índices, columnas, vistas) asumen que
+existen. En la base de pruebas no existen, así que antes de migrar se crean
+desde los modelos actuales; las migraciones que agregan columnas o índices
+con comprobación (IF NOT EXISTS / introspección) las encuentran ya hechas.
+"""
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+# Tablas no administradas que las migraciones crean como vistas
+VISTAS = {'visitas_historico'}
+
+
+def crear_tablas_no_administradas(using='default', **kwargs):
+    conexion = connections[using]
+    existentes = set(conexion.introspection.table_names())
+    modelos = [
+        modelo for modelo in apps.get_app_config('core').get_models()
+        if not modelo._meta.managed
+        and modelo._meta.db_table not in VISTAS
+        and modelo._meta.db_table not in existentes
+    ]
+    if not modelos:
+        return
+    with conexion.schema_editor() as editor:
+        for modelo in modelos:
+            editor.create_model(modelo)
+
+
+class EjecutorPruebas(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        pre_migrate.connect(crear_tablas_no_administradas, sender=apps.get_app_config('core'),
+                            dispatch_uid='pruebas_tablas_no_administradas')
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(dispatch_uid='pruebas_tablas_no_administradas',
+                                   sender=apps.get_app_config('core'))
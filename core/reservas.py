@@ -0,0 +1,164 @@
+"""
+Reservas de áreas comunes sin solapamientos.
+
+Antes de guardar se bloquea la fila del área (SELECT ... FOR UPDATE), de modo
+que dos reservas simultáneas de la misma área se validan una después de la
+otra. Como las reservas activas de un área nunca se solapan, ordenadas por
+hora_inicio también quedan ordenadas por hora_fin: basta mirar la última que
+empieza antes del fin pedido (y la primera que empieza dentro del intervalo)
+usando el índice (area_id, hora_inicio), sin recorrer el historial del área.
+
+En PostgreSQL la restricción de exclusión reservas_sin_solapamiento (ver la
+migración 0012) garantiza lo mismo a nivel de base de datos.
+
+La disponibilidad de un área (intervalos libres por día) sale de una sola
+consulta por rango más un barrido lineal, y se cachea por área y día.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Subquery
+from django.utils import timezone
+
+from .cache import guardar_disponibilidad, obtener_disponibilidad
+from .models import AreaComun, Reserva
+
+# Estados que no ocupan el área
+ESTADOS_LIBRES = ('CANCELADA', 'RECHAZADA')
+
+
+class ReservaSolapada(Exception):
+    """El intervalo pedido choca con otra reserva activa del área."""
+
+    def __init__(self, conflicto):
+        self.conflicto = conflicto
+        super().__init__(
+            f"El área ya está reservada de {conflicto.hora_inicio.isoformat()} "
+            f"a {conflicto.hora_fin.isoformat()} (reserva {conflicto.id})"
+        )
+
+
+def _instante(reserva, campo):
+    valor = Reserva._meta.get_field(campo).to_python(getattr(reserva, campo))
+    if valor is None:
+        raise ValueError(f"{campo} es obligatorio")
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    setattr(reserva, campo, valor)
+    return valor
+
+
+def activas(area_id):
+    return Reserva.objects.filter(area_id=area_id).exclude(estado__in=ESTADOS_LIBRES)
+
+
+def buscar_solapamiento(area_id, inicio, fin, excluir=None):
+    """Reserva activa del área que se solapa con [inicio, fin), o None. Dos búsquedas por índice."""
+    qs = activas(area_id)
+    if excluir is not None:
+        qs = qs.exclude(pk=excluir)
+    # La última que empieza antes de `inicio` solo choca si termina después
+    anterior = qs.filter(hora_inicio__lt=inicio).order_by('-hora_inicio').first()
+    if anterior is not None and anterior.hora_fin > inicio:
+        return anterior
+    # Cualquiera que empiece dentro de [inicio, fin) choca
+    return qs.filter(hora_inicio__gte=inicio, hora_inicio__lt=fin).order_by('hora_inicio').first()
+
+
+def guardar_reserva(reserva):
+    """
+    Valida el intervalo y guarda la reserva (nueva o modificada). Lanza
+    ValueError si los datos son inválidos y ReservaSolapada si el área está
+    ocupada en ese intervalo.
+    """
+    inicio = _instante(reserva, 'hora_inicio')
+    fin = _instante(reserva, 'hora_fin')
+    if fin <= inicio:
+        raise ValueError("hora_fin debe ser posterior a hora_inicio")
+    if not reserva.fecha:
+        reserva.fecha = timezone.localtime(inicio).date()
+
+    with transaction.atomic():
+        if not AreaComun.objects.select_for_update().filter(pk=reserva.area_id).exists():
+            raise ValueError("El área común no existe")
+        if reserva.estado not in ESTADOS_LIBRES:
+            conflicto = buscar_solapamiento(reserva.area_id, inicio, fin, excluir=reserva.pk)
+            if conflicto is not None:
+                raise ReservaSolapada(conflicto)
+        try:
+            with transaction.atomic():
+                reserva.save()
+        except IntegrityError:
+            # Restricción de exclusión en PostgreSQL (no debería ocurrir con el área bloqueada)
+            conflicto = buscar_solapamiento(reserva.area_id, inicio, fin, excluir=reserva.pk)
+            if conflicto is None:
+                raise
+            raise ReservaSolapada(conflicto)
+    return reserva
+
+
+def _inicio_dia(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _calcular_libres(area_id, desde, hasta):
+    """Barrido de las reservas activas entre desde y hasta: {día: [(inicio, fin), ...]}."""
+    inicio_rango = _inicio_dia(desde)
+    fin_rango = _inicio_dia(hasta + timedelta(days=1))
+    qs = activas(area_id)
+    # La última que empieza antes del rango puede seguir ocupándolo
+    anterior = qs.filter(hora_inicio__lt=inicio_rango).order_by('-hora_inicio').values('id')[:1]
+    ocupados = (
+        qs.filter(Q(hora_inicio__gte=inicio_rango, hora_inicio__lt=fin_rango) | Q(id=Subquery(anterior)))
+        .order_by('hora_inicio')
+        .values_list('hora_inicio', 'hora_fin')
+    )
+
+    libres = {}
+    ocupados = iter(ocupados)
+    pendiente = next(ocupados, None)
+    cursor = inicio_rango
+    dia = desde
+    while dia <= hasta:
+        fin_dia = _inicio_dia(dia + timedelta(days=1))
+        libres_dia = []
+        while cursor < fin_dia:
+            if pendiente is None or pendiente[0] >= fin_dia:
+                libres_dia.append((cursor, fin_dia))
+                cursor = fin_dia
+            elif pendiente[1] <= cursor:
+                pendiente = next(ocupados, None)
+            else:
+                if pendiente[0] > cursor:
+                    libres_dia.append((cursor, pendiente[0]))
+                cursor = min(pendiente[1], fin_dia)
+        libres[dia] = libres_dia
+        dia += timedelta(days=1)
+    return libres
+
+
+def disponibilidad(area_id, desde, hasta):
+    """Intervalos libres de cada día entre desde y hasta (inclusive), usando el caché por día."""
+    dias = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+    libres, claves = obtener_disponibilidad(area_id, dias)
+    faltantes = [dia for dia in dias if dia not in libres]
+    if faltantes:
+        calculados = _calcular_libres(area_id, faltantes[0], faltantes[-1])
+        nuevos = {dia: calculados[dia] for dia in faltantes}
+        guardar_disponibilidad(claves, nuevos)
+        libres.update(nuevos)
+    return [(dia, libres[dia]) for dia in dias]
+
+
+def dividir_en_slots(dia, libres, minutos):
+    """Turnos de `minutos` alineados desde el inicio del día que caben completos en los intervalos libres."""
+    paso = timedelta(minutes=minutos)
+    base = _inicio_dia(dia)
+    slots = []
+    for inicio, fin in libres:
+        # Primer múltiplo de `paso` desde el inicio del día que no sea anterior a `inicio`
+        t = base + -((base - inicio) // paso) * paso
+        while t + paso <= fin:
+            slots.append((t, t + paso))
+            t += paso
+    return slots
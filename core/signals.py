@@ -0,0 +1,195 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import Signal
+
+from . import busqueda, estadisticas, estado_cuenta, vehiculos
+from .cache import invalidar_dashboard, invalidar_disponibilidad
+from .models import (
+    ResidenteVivienda, Vivienda, Parqueo, Expensa, Multa, Pago, Reserva,
+    Vehiculo, TipoVehiculo, Mascota, Visita, Visitante,
+)
+from .parqueos import reconciliar_ocupacion
+from .presencia import presencia
+
+# bulk_create no emite post_save; las vistas que insertan en lote envían esta
+# señal con sender=<modelo> e instances=<objetos creados>.
+post_bulk_create = Signal()
+
+# Modelos que alimentan el dashboard
+MODELOS_DASHBOARD = (
+    ResidenteVivienda, Vivienda, Parqueo, Expensa, Multa,
+    Vehiculo, TipoVehiculo, Mascota,
+)
+
+
+def invalidar_dashboard_al_escribir(sender, **kwargs):
+    """
+    Descarta la instantánea del dashboard cuando cambia uno de sus modelos, al
+    confirmar la transacción: antes, otra petición podría volver a cachear
+    los conteos viejos hasta DASHBOARD_TTL.
+    """
+    transaction.on_commit(invalidar_dashboard)
+
+
+for modelo in MODELOS_DASHBOARD:
+    post_save.connect(invalidar_dashboard_al_escribir, sender=modelo,
+                      dispatch_uid=f'dashboard_save_{modelo.__name__}')
+    post_delete.connect(invalidar_dashboard_al_escribir, sender=modelo,
+                        dispatch_uid=f'dashboard_delete_{modelo.__name__}')
+    post_bulk_create.connect(invalidar_dashboard_al_escribir, sender=modelo,
+                             dispatch_uid=f'dashboard_bulk_{modelo.__name__}')
+
+
+# Cuenta corriente por vivienda (ver core.estado_cuenta)
+def registrar_movimiento(sender, instance, raw=False, **kwargs):
+    if not raw:
+        estado_cuenta.registrar(instance)
+
+
+def eliminar_movimiento(sender, instance, **kwargs):
+    estado_cuenta.eliminar(instance)
+
+
+def registrar_movimientos_lote(sender, instances, **kwargs):
+    estado_cuenta.registrar_lote(sender, instances)
+
+
+for modelo in estado_cuenta.ORIGENES:
+    post_save.connect(registrar_movimiento, sender=modelo,
+                      dispatch_uid=f'cuenta_save_{modelo.__name__}')
+    post_delete.connect(eliminar_movimiento, sender=modelo,
+                        dispatch_uid=f'cuenta_delete_{modelo.__name__}')
+    post_bulk_create.connect(registrar_movimientos_lote, sender=modelo,
+                             dispatch_uid=f'cuenta_bulk_{modelo.__name__}')
+
+
+# Disponibilidad de áreas comunes: se invalida al confirmar la transacción
+# para que nadie vuelva a cachear el estado anterior mientras tanto.
+def invalidar_disponibilidad_area(sender, instance, **kwargs):
+    area_id = instance.area_id
+    transaction.on_commit(lambda: invalidar_disponibilidad(area_id))
+
+
+post_save.connect(invalidar_disponibilidad_area, sender=Reserva, dispatch_uid='disponibilidad_save')
+post_delete.connect(invalidar_disponibilidad_area, sender=Reserva, dispatch_uid='disponibilidad_delete')
+
+
+# Contadores de ocupación: altas, bajas y ediciones de parqueos son poco
+# frecuentes, se recuenta todo al confirmar (ver core.parqueos).
+def reconciliar_ocupacion_al_escribir(sender, **kwargs):
+    transaction.on_commit(reconciliar_ocupacion)
+
+
+post_save.connect(reconciliar_ocupacion_al_escribir, sender=Parqueo, dispatch_uid='ocupacion_save')
+post_delete.connect(reconciliar_ocupacion_al_escribir, sender=Parqueo, dispatch_uid='ocupacion_delete')
+post_bulk_create.connect(reconciliar_ocupacion_al_escribir, sender=Parqueo, dispatch_uid='ocupacion_bulk')
+
+
+# Índice de visitas abiertas (ver core.presencia)
+def actualizar_presencia(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    visita_id = instance.pk
+    if instance.salida is not None:
+        transaction.on_commit(lambda: presencia.quitar(visita_id))
+    else:
+        transaction.on_commit(lambda: presencia.registrar_visita(visita_id))
+
+
+def quitar_presencia(sender, instance, **kwargs):
+    visita_id = instance.pk
+    transaction.on_commit(lambda: presencia.quitar(visita_id))
+
+
+def invalidar_presencia(sender, **kwargs):
+    transaction.on_commit(presencia.invalidar)
+
+
+def renombrar_visitante_presente(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    visitante_id, nombre = instance.pk, f"{instance.nombres} {instance.apellidos}"
+    transaction.on_commit(lambda: presencia.renombrar_visitante(visitante_id, nombre))
+
+
+post_save.connect(actualizar_presencia, sender=Visita, dispatch_uid='presencia_save')
+post_delete.connect(quitar_presencia, sender=Visita, dispatch_uid='presencia_delete')
+post_bulk_create.connect(invalidar_presencia, sender=Visita, dispatch_uid='presencia_bulk')
+post_save.connect(renombrar_visitante_presente, sender=Visitante, dispatch_uid='presencia_visitante')
+
+
+# Términos de búsqueda de visitantes y personas (ver core.busqueda)
+def indexar_busqueda(sender, instance, raw=False, **kwargs):
+    if not raw:
+        busqueda.indexar(instance)
+
+
+def desindexar_busqueda(sender, instance, **kwargs):
+    busqueda.desindexar(instance)
+
+
+def indexar_busqueda_lote(sender, instances, **kwargs):
+    busqueda.indexar_lote(sender, instances)
+
+
+for modelo in busqueda.MODELOS:
+    post_save.connect(indexar_busqueda, sender=modelo,
+                      dispatch_uid=f'busqueda_save_{modelo.__name__}')
+    post_delete.connect(desindexar_busqueda, sender=modelo,
+                        dispatch_uid=f'busqueda_delete_{modelo.__name__}')
+    post_bulk_create.connect(indexar_busqueda_lote, sender=modelo,
+                             dispatch_uid=f'busqueda_bulk_{modelo.__name__}')
+
+
+# Placa normalizada y variantes para la búsqueda por placa (ver core.vehiculos)
+def normalizar_placa_vehiculo(sender, instance, raw=False, **kwargs):
+    instance.placa_normalizada = vehiculos.normalizar_placa(instance.placa)
+
+
+def indexar_placa_vehiculo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        vehiculos.indexar_placa(instance)
+
+
+def indexar_placas_lote(sender, instances, **kwargs):
+    vehiculos.indexar_placas_lote(instances)
+
+
+pre_save.connect(normalizar_placa_vehiculo, sender=Vehiculo, dispatch_uid='placa_normalizar')
+post_save.connect(indexar_placa_vehiculo, sender=Vehiculo, dispatch_uid='placa_save')
+post_bulk_create.connect(indexar_placas_lote, sender=Vehiculo, dispatch_uid='placa_bulk')
+
+
+# Estadísticas mensuales de visitas, expensas y multas (ver core.estadisticas)
+def leer_estadistica_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        estadisticas.antes_de_guardar(instance, update_fields)
+
+
+def registrar_estadistica(sender, instance, raw=False, **kwargs):
+    if not raw:
+        estadisticas.registrar(instance)
+
+
+def eliminar_estadistica(sender, instance, **kwargs):
+    estadisticas.eliminar(instance)
+
+
+def registrar_estadisticas_lote(sender, instances, **kwargs):
+    estadisticas.registrar_lote(sender, instances)
+
+
+for modelo in estadisticas.CONCEPTOS:
+    pre_save.connect(leer_estadistica_anterior, sender=modelo,
+                     dispatch_uid=f'estadisticas_pre_save_{modelo.__name__}')
+    post_save.connect(registrar_estadistica, sender=modelo,
+                      dispatch_uid=f'estadisticas_save_{modelo.__name__}')
+    post_delete.connect(eliminar_estadistica, sender=modelo,
+                        dispatch_uid=f'estadisticas_delete_{modelo.__name__}')
+    post_bulk_create.connect(registrar_estadisticas_lote, sender=modelo,
+                             dispatch_uid=f'estadisticas_bulk_{modelo.__name__}')
+
+# Las visitas archivadas se borran en cascada con su visitante o vivienda
+for modelo in estadisticas.ARCHIVADOS:
+    post_delete.connect(eliminar_estadistica, sender=modelo,
+                        dispatch_uid=f'estadisticas_delete_{modelo.__name__}')
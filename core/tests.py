@@ -1,3 +1,1529 @@
-from django.test import TestCase
+import importlib.util
+import json
+import os
+import unittest
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.http import JsonResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .archivo_visitas import archivar
+from .cache import guardar_disponibilidad, invalidar_disponibilidad, obtener_disponibilidad
+from .conciliacion import conciliar_pagos
+from .estadisticas import recalcular
+from .estado_cuenta import _ajustar, _recalcular_saldos, recalcular_saldos
+from .facturacion import acumular_recargos, generar_expensas
+from .management.commands.benchmark_endpoints import CASOS, rutas_con_nombre, url_caso
+from .metricas import Histograma, registro
+from .models import (
+    AplicacionPago, AreaComun, AsignacionParqueo, CategoriaVivienda, Comunicado, EstadisticaMensual, Expensa, ExpensaParametro,
+    MovimientoCuenta, Multa, OcupacionZona, Pago, Parqueo, Persona, RecargoExpensa, Reserva, ResidenteVivienda, SaldoVivienda,
+    TipoInfraccion, TipoVehiculo, VariantePlaca, Vehiculo, Visita, VisitaArchivada, Visitante, Vivienda,
+)
+from .parqueos import ParqueoNoDisponible, asignar_parqueo, ocupacion_parqueos, reconciliar_ocupacion
+from .presencia import IndicePresencia, presencia
+from .reservas import ReservaSolapada, _calcular_libres, disponibilidad, dividir_en_slots, guardar_reserva
+from .signals import post_bulk_create
+from .vehiculos import buscar_por_placa
+from .views import FILAS_POR_ESCRITURA, respuesta_streaming
+
+
+def _hora(hora, minuto=0):
+    return timezone.make_aware(datetime(2025, 3, 10, hora, minuto))
+
+
+class ConfiguracionConexionesTests(SimpleTestCase):
+    """DATABASES según DB_POOL_MODE, leyendo una copia nueva de CONDOMINIO/settings.py."""
+
+    def _base(self, **entorno):
+        with mock.patch.dict(os.environ, entorno):
+            os.environ.pop('DB_ENGINE', None)
+            spec = importlib.util.spec_from_file_location('settings_prueba', settings.BASE_DIR / 'CONDOMINIO' / 'settings.py')
+            modulo = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(modulo)
+        return modulo.DATABASES['default']
+
+    def test_persistent(self):
+        base = self._base(DB_POOL_MODE='persistent', DB_CONN_MAX_AGE='120')
+        self.assertEqual((base['CONN_MAX_AGE'], base['CONN_HEALTH_CHECKS']), (120, True))
+        self.assertNotIn('pool', base['OPTIONS'])
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', base)
+
+    def test_pool_con_chequeo(self):
+        from psycopg_pool import ConnectionPool
+
+        base = self._base(DB_POOL_MODE='pool', DB_POOL_MAX_SIZE='5', DB_POOL_TIMEOUT='2.5')
+        self.assertEqual(base['CONN_MAX_AGE'], 0)
+        pool = base['OPTIONS']['pool']
+        self.assertEqual((pool['min_size'], pool['max_size'], pool['timeout']), (2, 5, 2.5))
+        # Django no aplica CONN_HEALTH_CHECKS con pool: el chequeo es del propio pool
+        self.assertIs(pool['check'], ConnectionPool.check_connection)
+
+    def test_pgbouncer(self):
+        base = self._base(DB_POOL_MODE='pgbouncer')
+        self.assertEqual(base['CONN_MAX_AGE'], 600)
+        self.assertIs(base['DISABLE_SERVER_SIDE_CURSORS'], True)
+        self.assertNotIn('pool', base['OPTIONS'])
+
+
+class ReservasSinSolapamientoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100', email='ana@x.com')
+        cls.area = AreaComun.objects.create(nombre='Salón')
+        cls.otra_area = AreaComun.objects.create(nombre='Piscina')
+        cls.existente = cls._reservar(cls.area, _hora(10), _hora(12))
+
+    @classmethod
+    def _reservar(cls, area, inicio, fin, estado='CONFIRMADA'):
+        return Reserva.objects.create(
+            codigo=f'R-{inicio:%H%M}', area=area, vivienda=cls.vivienda, persona=cls.persona,
+            hora_inicio=inicio, hora_fin=fin, estado=estado,
+        )
+
+    def _crear(self, inicio, fin, area=None):
+        return self.client.post('/api/reservas/crear/', data=json.dumps({
+            'codigo': 'R-NUEVA',
+            'area_id': (area or self.area).id,
+            'vivienda_id': self.vivienda.id,
+            'persona_id': self.persona.id,
+            'hora_inicio': inicio.isoformat(),
+            'hora_fin': fin.isoformat(),
+            'estado': 'PENDIENTE',
+        }), content_type='application/json')
+
+    def test_rechaza_solapamiento_parcial(self):
+        respuesta = self._crear(_hora(11), _hora(13))
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['conflicto'], self.existente.id)
+        respuesta = self._crear(_hora(9), _hora(10, 30))
+        self.assertEqual(respuesta.status_code, 409)
+
+    def test_acepta_intervalos_contiguos(self):
+        self.assertEqual(self._crear(_hora(12), _hora(14)).status_code, 200)
+        self.assertEqual(self._crear(_hora(8), _hora(10)).status_code, 200)
+        self.assertEqual(Reserva.objects.filter(area=self.area).count(), 3)
+
+    def test_rechaza_intervalo_que_contiene_o_queda_contenido(self):
+        self.assertEqual(self._crear(_hora(9), _hora(13)).status_code, 409)
+        self.assertEqual(self._crear(_hora(10, 30), _hora(11, 30)).status_code, 409)
+        self.assertEqual(self._crear(_hora(10), _hora(12)).status_code, 409)
+        self.assertEqual(Reserva.objects.filter(area=self.area).count(), 1)
+
+    def test_otra_area_y_reservas_canceladas_no_ocupan(self):
+        self.assertEqual(self._crear(_hora(10), _hora(12), area=self.otra_area).status_code, 200)
+        Reserva.objects.filter(pk=self.existente.pk).update(estado='CANCELADA')
+        self.assertEqual(self._crear(_hora(10), _hora(12)).status_code, 200)
+
+    def test_intervalo_invalido(self):
+        self.assertEqual(self._crear(_hora(12), _hora(12)).status_code, 400)
+
+    def test_guardar_reserva_lanza_reserva_solapada(self):
+        reserva = Reserva(codigo='R-X', area=self.area, vivienda=self.vivienda, persona=self.persona,
+                          hora_inicio=_hora(11), hora_fin=_hora(11, 30), estado='PENDIENTE')
+        with self.assertRaises(ReservaSolapada) as contexto:
+            guardar_reserva(reserva)
+        self.assertEqual(contexto.exception.conflicto.id, self.existente.id)
+        self.assertIsNone(reserva.pk)
+
+    def _modificar(self, reserva, **cambios):
+        datos = {campo: valor.isoformat() if hasattr(valor, 'isoformat') else valor
+                 for campo, valor in cambios.items()}
+        return self.client.put(f'/api/reservas/{reserva.id}/modificar/', data=json.dumps(datos),
+                               content_type='application/json')
+
+    def test_modificar_reserva_hacia_un_solapamiento(self):
+        otra = self._reservar(self.area, _hora(14), _hora(16))
+        respuesta = self._modificar(otra, hora_inicio=_hora(11), hora_fin=_hora(15))
+        self.assertEqual(respuesta.status_code, 409)
+        otra.refresh_from_db()
+        self.assertEqual((otra.hora_inicio, otra.hora_fin), (_hora(14), _hora(16)))
+
+    def test_modificar_reserva_sin_chocar_consigo_misma(self):
+        respuesta = self._modificar(self.existente, hora_inicio=_hora(11), hora_fin=_hora(13))
+        self.assertEqual(respuesta.status_code, 200)
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.hora_fin, _hora(13))
+
+    def test_modificar_reserva_a_contigua(self):
+        otra = self._reservar(self.area, _hora(14), _hora(16))
+        self.assertEqual(self._modificar(otra, hora_inicio=_hora(12)).status_code, 200)
+
+
+class BusquedaPorPrefijoTests(TestCase):
+    """?q= en visitantes y residentes: tildes, mayúsculas, varios términos y límites del rango."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.jose = Visitante.objects.create(nombres='José Ángel', apellidos='Núñez', num_doc='12.345.678')
+        cls.josefina = Visitante.objects.create(nombres='Josefina', apellidos='Nunez', num_doc='X-999')
+        cls.jota = Visitante.objects.create(nombres='Jota', apellidos='Pérez')
+        cls.joaquin = Visitante.objects.create(nombres='Joaquín', apellidos='PÉREZ', num_doc='777')
+
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.maria = Persona.objects.create(nombres='María José', apellidos='Ñandú', num_doc='1-23')
+        cls.mario = Persona.objects.create(nombres='Mario', apellidos='Nandu', num_doc='456')
+        for persona in (cls.maria, cls.mario):
+            ResidenteVivienda.objects.create(persona=persona, vivienda=vivienda, inicio=_hora(0).date())
+
+    def _visitantes(self, consulta, **extra):
+        respuesta = self.client.get('/api/visitantes/', {'q': consulta, **extra})
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila['id'] for fila in respuesta.json()]
+
+    def _personas(self, consulta):
+        respuesta = self.client.get('/api/residentes/', {'q': consulta})
+        self.assertEqual(respuesta.status_code, 200)
+        return [fila['persona_id'] for fila in respuesta.json()]
+
+    def test_ignora_tildes_y_mayusculas(self):
+        self.assertEqual(self._visitantes('jose angel'), [self.jose.id])
+        self.assertEqual(self._visitantes('JOSÉ ÁNGEL'), [self.jose.id])
+        self.assertEqual(self._visitantes('NÚÑEZ'), [self.jose.id, self.josefina.id])
+        self.assertEqual(self._visitantes('nunez'), [self.jose.id, self.josefina.id])
+        self.assertEqual(self._personas('maria'), [self.maria.id])
+        self.assertEqual(self._personas('ÑANDÚ'), [self.maria.id, self.mario.id])
+
+    def test_exige_todos_los_terminos(self):
+        self.assertEqual(self._visitantes('jose perez'), [])
+        self.assertEqual(self._visitantes('jo perez'), [self.jota.id, self.joaquin.id])
+        self.assertEqual(self._visitantes('pérez jota'), [self.jota.id])
+        self.assertEqual(self._personas('nandu jose'), [self.maria.id])
+        self.assertEqual(self._personas('mario jose'), [])
+
+    def test_limites_del_rango_de_prefijo(self):
+        # Coincidencia exacta primero y luego, en orden alfabético, las demás con el mismo prefijo
+        self.assertEqual(self._visitantes('jose'), [self.jose.id, self.josefina.id])
+        # "jos" cubre [jos, jot): deja fuera "jota", que es justo la cota superior
+        self.assertEqual(self._visitantes('jos'), [self.jose.id, self.josefina.id])
+        self.assertEqual(self._visitantes('jot'), [self.jota.id])
+        self.assertEqual(self._visitantes('josefinas'), [])
+        self.assertEqual(self._personas('mari'), [self.maria.id, self.mario.id])
+        self.assertEqual(self._personas('marib'), [])
+
+    def test_orden_alfabetico_y_no_por_largo(self):
+        corto = Visitante.objects.create(nombres='Josu', apellidos='Ibarra')
+        # "josefina" < "josu" aunque sea más larga
+        self.assertEqual(self._visitantes('jos'), [self.jose.id, self.josefina.id, corto.id])
+
+    def test_documento_por_partes_y_entero(self):
+        self.assertEqual(self._visitantes('12345678'), [self.jose.id])
+        self.assertEqual(self._visitantes('12.345'), [self.jose.id])
+        self.assertEqual(self._visitantes('678'), [self.jose.id])
+        self.assertEqual(self._personas('123'), [self.maria.id])
+
+    def test_limite_y_consulta_vacia(self):
+        self.assertEqual(len(self._visitantes('jo', limit=2)), 2)
+        self.assertEqual(self._visitantes('¿?'), [])
+        respuesta = self.client.get('/api/visitantes/', {'q': 'jo', 'limit': 'x'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'requiere FOR UPDATE SKIP LOCKED (PostgreSQL)')
+class AsignacionParqueoConcurrenteTests(TransactionTestCase):
+    """Muchos hilos reclaman parqueos a la vez: ninguno queda asignado dos veces."""
+
+    HILOS = 16
+
+    def setUp(self):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=1, banos=1)
+        vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        tipo = TipoVehiculo.objects.create(nombre='Auto')
+        self.vehiculos = [
+            Vehiculo.objects.create(persona=persona, vivienda=vivienda, tipo=tipo, placa=f'AB{i:04d}').pk
+            for i in range(60)
+        ]
+        self.parqueos = [
+            Parqueo.objects.create(codigo=f'P-{i:03d}', zona='A' if i % 2 else 'B', ocupado=False).pk
+            for i in range(20)
+        ]
+        reconciliar_ocupacion()
+
+    def tearDown(self):
+        # flush no vacía las tablas no administradas
+        for modelo in (AsignacionParqueo, Vehiculo, Parqueo, TipoVehiculo, Persona, Vivienda, CategoriaVivienda):
+            modelo.objects.all().delete()
+        OcupacionZona.objects.all().delete()
+
+    def _reclamar_en_paralelo(self, parqueo_id=None):
+        def reclamar(vehiculo_id):
+            try:
+                asignar_parqueo(vehiculo_id, parqueo_id)
+                return 'asignado'
+            except ParqueoNoDisponible:
+                return 'sin_parqueo'
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.HILOS) as ejecutor:
+            return Counter(ejecutor.map(reclamar, self.vehiculos))
+
+    def _verificar(self, resultados, esperados):
+        activas = AsignacionParqueo.objects.filter(activa=True)
+        por_parqueo = Counter(activas.values_list('parqueo_id', flat=True))
+        self.assertEqual(resultados['asignado'], esperados)
+        self.assertEqual(resultados['asignado'] + resultados['sin_parqueo'], len(self.vehiculos))
+        self.assertEqual(sum(por_parqueo.values()), esperados)
+        self.assertTrue(all(n == 1 for n in por_parqueo.values()), 'parqueo asignado dos veces')
+        self.assertEqual(Parqueo.objects.filter(pk__in=list(por_parqueo), ocupado=True).count(), esperados)
+        # Los contadores incrementales coinciden con el recuento desde parqueos
+        ocupacion = ocupacion_parqueos()
+        self.assertEqual(reconciliar_ocupacion(), [])
+        self.assertEqual(ocupacion, ocupacion_parqueos())
+        self.assertEqual(ocupacion['ocupados'], esperados)
+
+    def test_cualquier_parqueo_libre(self):
+        self._verificar(self._reclamar_en_paralelo(), len(self.parqueos))
+
+    def test_mismo_parqueo(self):
+        self._verificar(self._reclamar_en_paralelo(self.parqueos[0]), 1)
+
+    def test_recuento_durante_las_asignaciones(self):
+        def trabajar(i):
+            try:
+                if i % 4 == 3:
+                    reconciliar_ocupacion()
+                else:
+                    asignar_parqueo(self.vehiculos[i])
+            except ParqueoNoDisponible:
+                pass
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.HILOS) as ejecutor:
+            list(ejecutor.map(trabajar, range(len(self.vehiculos))))
+        for zona in ('A', 'B'):
+            with self.subTest(zona=zona):
+                self.assertEqual(OcupacionZona.objects.get(zona=zona).ocupados,
+                                 Parqueo.objects.filter(zona=zona, ocupado=True).count())
+
+
+class PresupuestoConsultasTests(TestCase):
+    """Los casos de benchmark_endpoints sobre una siembra pequeña: ninguno pasa su máximo de consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('sembrar_benchmark', viviendas=20, visitantes=30, visitas=200, pagos=40, meses=3,
+                     multas=10, reservas=20, comunicados=5, stdout=StringIO())
+
+    def test_casos_con_ruta(self):
+        self.assertEqual(set(CASOS) - set(rutas_con_nombre()), set())
+
+    def test_casos_dentro_del_presupuesto(self):
+        for nombre, (_, _, max_consultas, _) in CASOS.items():
+            with self.subTest(endpoint=nombre):
+                url = url_caso(nombre)
+                self.assertIsNotNone(url, 'la siembra no crea filas para el <pk> del caso')
+                with CaptureQueriesContext(connection) as capturadas:
+                    respuesta = self.client.get(url)
+                    if respuesta.streaming:
+                        b''.join(respuesta.streaming_content)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertLessEqual(len(capturadas), max_consultas,
+                                     '\n'.join(consulta['sql'] for consulta in capturadas))
+
+
+class CuentaCorrienteTests(TestCase):
+    """Movimientos y saldos por vivienda: señales, lotes, recálculo, carga inicial y endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.otra = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        cls.infraccion = TipoInfraccion.objects.create(codigo='RUIDO', monto_base=Decimal('30'))
+        recalcular_saldos()
+
+    def _expensa(self, monto, vivienda=None, periodo='2025-01'):
+        return Expensa.objects.create(codigo=f'E-{periodo}', vivienda=vivienda or self.vivienda, periodo=periodo,
+                                      monto=Decimal(monto), vencimiento=date(2025, 1, 10), estado='PENDIENTE')
+
+    def _pago(self, monto, estado='CONFIRMADO', vivienda=None):
+        return Pago.objects.create(vivienda=vivienda or self.vivienda, persona=self.persona, concepto='EXPENSA',
+                                   monto=Decimal(monto), fecha=_hora(9), metodo='QR', estado=estado)
+
+    def _saldo(self, vivienda=None):
+        fila = SaldoVivienda.objects.get(vivienda=vivienda or self.vivienda)
+        return fila.cargos, fila.abonos, fila.saldo
+
+    def _fotografia(self):
+        movimientos = set(MovimientoCuenta.objects.values_list('vivienda_id', 'origen', 'origen_id', 'fecha', 'importe'))
+        saldos = set(SaldoVivienda.objects.values_list('vivienda_id', 'cargos', 'abonos', 'saldo'))
+        return movimientos, saldos
+
+    def test_senales_ajustan_el_saldo(self):
+        expensa = self._expensa('100')
+        multa = Multa.objects.create(codigo='M-1', vivienda=self.vivienda, persona=self.persona,
+                                     tipo_infraccion=self.infraccion, fecha=_hora(8), monto=Decimal('30'))
+        pago = self._pago('50')
+        self._pago('999', estado='PENDIENTE')
+        self.assertEqual(self._saldo(), (130, 50, 80))
+
+        expensa.monto = Decimal('120')
+        expensa.save()
+        self.assertEqual(self._saldo(), (150, 50, 100))
+
+        pago.vivienda = self.otra
+        pago.save()
+        self.assertEqual(self._saldo(), (150, 0, 150))
+        self.assertEqual(self._saldo(self.otra), (0, 50, -50))
+
+        multa.delete()
+        self.assertEqual(self._saldo(), (120, 0, 120))
+        self.assertEqual(MovimientoCuenta.objects.count(), 2)
+
+    def test_ajustar_suma_cargos_y_abonos(self):
+        _ajustar(self.vivienda.id, Decimal('40'))
+        _ajustar(self.vivienda.id, Decimal('-15'))
+        self.assertEqual(self._saldo(), (40, 15, 25))
+        _ajustar(self.vivienda.id, Decimal('-15'), signo=-1)
+        _ajustar(self.vivienda.id, Decimal('40'), signo=-1)
+        self.assertEqual(self._saldo(), (0, 0, 0))
+
+    def test_vivienda_sin_fila_no_parte_de_cero(self):
+        self._expensa('100')
+        SaldoVivienda.objects.filter(vivienda=self.vivienda).delete()
+        self._pago('40')
+        self.assertEqual(self._saldo(), (100, 40, 60))
+
+    def test_registrar_lote(self):
+        self._expensa('100')
+        SaldoVivienda.objects.filter(vivienda=self.otra).delete()
+        creadas = Expensa.objects.bulk_create([
+            Expensa(codigo='E-L1', vivienda=self.vivienda, periodo='2025-02', monto=Decimal('70'), estado='PENDIENTE'),
+            Expensa(codigo='E-L2', vivienda=self.otra, periodo='2025-02', monto=Decimal('80'), estado='PENDIENTE'),
+        ])
+        post_bulk_create.send(sender=Expensa, instances=creadas)
+        # Sin vencimiento, el movimiento se fecha el primer día del periodo
+        self.assertEqual(MovimientoCuenta.objects.get(origen='EXPENSA', origen_id=creadas[1].pk).fecha,
+                         date(2025, 2, 1))
+        self.assertEqual(self._saldo(), (170, 0, 170))
+        self.assertEqual(self._saldo(self.otra), (80, 0, 80))
+        # Reenviar el lote no duplica movimientos
+        post_bulk_create.send(sender=Expensa, instances=creadas)
+        self.assertEqual(self._saldo(self.otra), (80, 0, 80))
+
+    def test_recalcular_y_carga_inicial_coinciden_con_lo_incremental(self):
+        self._expensa('100')
+        self._expensa('55', vivienda=self.otra)
+        self._pago('30')
+        incremental = self._fotografia()
+        self.assertEqual(recalcular_saldos(), {'movimientos': 3, 'viviendas': 2})
+        self.assertEqual(self._fotografia(), incremental)
+
+        migracion = importlib.import_module('core.migrations.0011_saldos_vivienda')
+        SaldoVivienda.objects.all().delete()
+        MovimientoCuenta.objects.all().delete()
+        migracion.cargar_existentes(apps, type('Editor', (), {'connection': connection}))
+        self.assertEqual(self._fotografia(), incremental)
+
+    def test_endpoint_estado_cuenta(self):
+        self._expensa('100')
+        self._pago('40')
+        url = f'/api/viviendas/{self.vivienda.id}/estado-cuenta/'
+        with self.assertNumQueries(2):
+            datos = self.client.get(url, {'limit': 1}).json()
+        self.assertEqual(Decimal(datos['saldo']), 60)
+        self.assertEqual(len(datos['movimientos']), 1)
+        siguiente = self.client.get(url, {'limit': 1, 'cursor': datos['next']}).json()
+        self.assertEqual({datos['movimientos'][0]['origen'], siguiente['movimientos'][0]['origen']},
+                         {'EXPENSA', 'PAGO'})
+
+        # Sin fila de saldo se arma desde los movimientos, no se devuelve cero
+        SaldoVivienda.objects.filter(vivienda=self.vivienda).delete()
+        datos = self.client.get(url).json()
+        self.assertEqual((Decimal(datos['cargos']), Decimal(datos['abonos'])), (100, 40))
+        self.assertTrue(SaldoVivienda.objects.filter(vivienda=self.vivienda).exists())
+        self.assertEqual(self.client.get('/api/viviendas/999999/estado-cuenta/').status_code, 404)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'requiere bloqueos de fila concurrentes (PostgreSQL)')
+class SaldosConcurrentesTests(TransactionTestCase):
+    """Pagos registrados mientras se recalculan los saldos: ningún abono se pierde."""
+
+    HILOS = 8
+
+    def setUp(self):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=1, banos=1)
+        self.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        self.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        recalcular_saldos()
+
+    def tearDown(self):
+        # flush no vacía las tablas no administradas
+        for modelo in (Pago, Persona, Vivienda, CategoriaVivienda):
+            modelo.objects.all().delete()
+
+    def test_recalculo_no_pierde_ajustes(self):
+        def trabajar(i):
+            try:
+                if i % 2:
+                    _recalcular_saldos([self.vivienda.id])
+                else:
+                    Pago.objects.create(vivienda=self.vivienda, persona=self.persona, concepto='EXPENSA',
+                                        monto=Decimal('1'), fecha=timezone.now(), metodo='QR', estado='CONFIRMADO')
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.HILOS) as ejecutor:
+            list(ejecutor.map(trabajar, range(200)))
+        self.assertEqual(SaldoVivienda.objects.get(vivienda=self.vivienda).abonos, 100)
+
+
+class ConciliacionPagosTests(TestCase):
+    """Aplicación de pagos a deudas: FIFO, referencia, parciales, saldo a favor e incremental contra completo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.otra = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        cls.infraccion = TipoInfraccion.objects.create(codigo='RUIDO', monto_base=Decimal('30'))
+
+    def _expensa(self, periodo, monto='100', vivienda=None):
+        return Expensa.objects.create(codigo=f'E-{periodo}', vivienda=vivienda or self.vivienda, periodo=periodo,
+                                      monto=Decimal(monto), estado='PENDIENTE')
+
+    def _multa(self, dia, monto='30'):
+        return Multa.objects.create(codigo=f'M-{dia}', vivienda=self.vivienda, persona=self.persona,
+                                    tipo_infraccion=self.infraccion, fecha=timezone.make_aware(datetime(2025, 1, dia)),
+                                    monto=Decimal(monto), estado='PENDIENTE')
+
+    def _pago(self, monto, fecha=date(2025, 3, 20), concepto='EXPENSA', referencia=None, vivienda=None):
+        return Pago.objects.create(vivienda=vivienda or self.vivienda, persona=self.persona, concepto=concepto,
+                                   referencia_cod=referencia, monto=Decimal(monto), metodo='QR', estado='CONFIRMADO',
+                                   fecha=timezone.make_aware(datetime(fecha.year, fecha.month, fecha.day, 12)))
+
+    def _aplicaciones(self, pago):
+        return list(AplicacionPago.objects.filter(pago=pago).order_by('id')
+                    .values_list('expensa_id', 'multa_id', 'monto', 'por_referencia'))
+
+    def _estado(self, deuda):
+        deuda.refresh_from_db()
+        return deuda.estado
+
+    def test_fifo_por_antiguedad(self):
+        marzo, enero, febrero = self._expensa('2025-03'), self._expensa('2025-01'), self._expensa('2025-02')
+        pago = self._pago('250')
+        resultado = conciliar_pagos()
+        self.assertEqual((resultado['pagos'], resultado['expensas_pagadas']), (1, 2))
+        self.assertEqual(self._aplicaciones(pago), [
+            (enero.id, None, 100, False), (febrero.id, None, 100, False), (marzo.id, None, 50, False),
+        ])
+        self.assertEqual([self._estado(e) for e in (enero, febrero, marzo)], ['PAGADA', 'PAGADA', 'PENDIENTE'])
+
+    def test_deuda_referida_primero(self):
+        enero, febrero = self._expensa('2025-01'), self._expensa('2025-02')
+        ajena = self._expensa('2025-01', vivienda=self.otra)
+        pago = self._pago('100', referencia=febrero.id)
+        # La referencia a una deuda de otra vivienda se ignora y se sigue el orden FIFO
+        otro = self._pago('100', referencia=ajena.id)
+        conciliar_pagos()
+        self.assertEqual(self._aplicaciones(pago), [(febrero.id, None, 100, True)])
+        self.assertEqual(self._aplicaciones(otro), [(enero.id, None, 100, False)])
+        self.assertEqual(self._estado(ajena), 'PENDIENTE')
+
+    def test_pagos_parciales(self):
+        expensa = self._expensa('2025-01')
+        self._pago('40')
+        conciliar_pagos()
+        self.assertEqual(self._estado(expensa), 'PENDIENTE')
+        segundo = self._pago('60')
+        self.assertEqual(conciliar_pagos()['pagos'], 1)
+        self.assertEqual(self._aplicaciones(segundo), [(expensa.id, None, 60, False)])
+        self.assertEqual(self._estado(expensa), 'PAGADA')
+
+    def test_multas_por_fecha(self):
+        segunda, primera = self._multa(20), self._multa(5)
+        pago = self._pago('45', concepto='MULTA')
+        self._expensa('2025-01')
+        conciliar_pagos()
+        self.assertEqual(self._aplicaciones(pago), [(None, primera.id, 30, False), (None, segunda.id, 15, False)])
+        self.assertFalse(AplicacionPago.objects.filter(expensa__isnull=False).exists())
+
+    def test_saldo_a_favor_cubre_la_deuda_cuando_vence(self):
+        enero = self._expensa('2025-01')
+        futura = self._expensa('2099-01')
+        pago = self._pago('150', fecha=date(2025, 1, 15))
+        conciliar_pagos()
+        self.assertEqual(self._aplicaciones(pago), [(enero.id, None, 100, False), (None, None, 50, False)])
+        self.assertEqual(self._estado(futura), 'PENDIENTE')
+
+        # Una deuda que ya venció aparece después: la siguiente incremental usa el saldo a favor
+        febrero = self._expensa('2025-02')
+        resultado = conciliar_pagos()
+        self.assertEqual((resultado['pagos'], resultado['aplicaciones']), (0, 1))
+        self.assertEqual(self._aplicaciones(pago), [(enero.id, None, 100, False), (febrero.id, None, 50, False)])
+        self.assertEqual(self._estado(febrero), 'PENDIENTE')
+
+        # Sin deudas exigibles el saldo a favor queda como está
+        self._pago('80', fecha=date(2025, 1, 15), vivienda=self.otra)
+        conciliar_pagos()
+        fila = AplicacionPago.objects.get(pago__vivienda=self.otra)
+        conciliar_pagos()
+        self.assertEqual(AplicacionPago.objects.get(pago__vivienda=self.otra), fila)
+
+    def test_pago_de_monto_cero(self):
+        self._expensa('2025-01')
+        self._pago('0')
+        self.assertEqual(conciliar_pagos()['pagos'], 0)
+        self.assertEqual(conciliar_pagos(incremental=False)['pagos'], 0)
+        self.assertFalse(AplicacionPago.objects.exists())
+
+    def test_incremental_coincide_con_completo(self):
+        self._expensa('2025-01')
+        self._pago('70', fecha=date(2025, 1, 20))
+        conciliar_pagos()
+        self._expensa('2025-02')
+        self._multa(10)
+        self._pago('90', fecha=date(2025, 2, 20))
+        self._pago('50', concepto='MULTA')
+        conciliar_pagos()
+        self._expensa('2025-03')
+        self._pago('200', fecha=date(2025, 1, 25))
+        conciliar_pagos()
+
+        def fotografia():
+            aplicaciones = Counter(AplicacionPago.objects.values_list('pago_id', 'expensa_id', 'multa_id', 'monto'))
+            estados = set(Expensa.objects.values_list('id', 'estado')) | set(Multa.objects.values_list('id', 'estado'))
+            return aplicaciones, estados
+
+        incremental = fotografia()
+        conciliar_pagos(incremental=False)
+        self.assertEqual(fotografia(), incremental)
+
+
+class GeneracionExpensasTests(TestCase):
+    """generar_expensas: montos por método, viviendas activas, idempotencia y unicidad por periodo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.grande = Vivienda.objects.create(categoria=categoria, codigo='V-001', metros2=Decimal('120.5'))
+        cls.chica = Vivienda.objects.create(categoria=categoria, codigo='V-002', metros2=Decimal('60'))
+        cls.inactiva = Vivienda.objects.create(categoria=categoria, codigo='V-003', activo=False)
+
+    def _montos(self, periodo):
+        return dict(Expensa.objects.filter(periodo=periodo).values_list('vivienda_id', 'monto'))
+
+    def test_por_casa_solo_viviendas_activas(self):
+        ExpensaParametro.objects.create(metodo='POR_CASA', tarifa_por_casa=Decimal('350'), dia_vencimiento=31)
+        self.assertEqual(generar_expensas('2025-02')['creadas'], 2)
+        self.assertEqual(self._montos('2025-02'), {self.grande.id: 350, self.chica.id: 350})
+        expensa = Expensa.objects.get(vivienda=self.grande, periodo='2025-02')
+        self.assertEqual((expensa.codigo, expensa.vencimiento, expensa.estado),
+                         ('EXP-2025-02-V-001', date(2025, 2, 28), 'PENDIENTE'))
+
+    def test_por_m2_y_movimientos(self):
+        ExpensaParametro.objects.create(metodo='POR_M2', tarifa_por_m2=Decimal('2.5'))
+        generar_expensas('2025-03')
+        self.assertEqual(self._montos('2025-03'), {self.grande.id: Decimal('301.25'), self.chica.id: 150})
+        # Las instancias enviadas a post_bulk_create llevan sus valores: cargos en la cuenta corriente
+        self.assertEqual(
+            dict(MovimientoCuenta.objects.filter(origen='EXPENSA').values_list('vivienda_id', 'importe')),
+            {self.grande.id: Decimal('301.25'), self.chica.id: 150},
+        )
+        self.assertEqual(SaldoVivienda.objects.get(vivienda=self.grande).saldo, Decimal('301.25'))
+
+    def test_volver_a_generar_el_periodo(self):
+        ExpensaParametro.objects.create(metodo='POR_CASA', tarifa_por_casa=Decimal('100'))
+        Expensa.objects.create(codigo='MANUAL', vivienda=self.chica, periodo='2025-04', monto=Decimal('80'))
+        self.assertEqual(generar_expensas('2025-04')['creadas'], 1)
+        self.assertEqual(generar_expensas('2025-04')['creadas'], 0)
+        self.assertEqual(self._montos('2025-04'), {self.grande.id: 100, self.chica.id: 80})
+        self.assertEqual(MovimientoCuenta.objects.filter(origen='EXPENSA').count(), 2)
+
+    def test_expensa_repetida_se_rechaza(self):
+        Expensa.objects.create(codigo='E-1', vivienda=self.chica, periodo='2025-05', monto=Decimal('80'))
+        fila = {'codigo': 'E-2', 'vivienda_id': self.chica.id, 'periodo': '2025-05', 'monto': '90'}
+        respuesta = self.client.post('/api/expensas/crear/', data=json.dumps(fila), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.post('/api/expensas/crear/', data=json.dumps([fila]), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Expensa.objects.filter(vivienda=self.chica, periodo='2025-05').count(), 1)
+
+    def test_parametros_invalidos(self):
+        with self.assertRaises(ValueError):
+            generar_expensas('2025-13')
+        with self.assertRaises(ValueError):
+            generar_expensas('2025-06')
+
+
+def _instante(dia, hora, minuto=0):
+    return timezone.make_aware(datetime(2025, 3, dia, hora, minuto))
+
+
+class DisponibilidadAreaTests(TestCase):
+    """Intervalos libres por día, turnos y el caché versionado por área."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        cls.area = AreaComun.objects.create(nombre='Salón')
+        # Una reserva cruza la medianoche, dos son contiguas y una cancelada no ocupa
+        for i, (inicio, fin, estado) in enumerate((
+            (_instante(9, 22), _instante(10, 2), 'CONFIRMADA'),
+            (_instante(10, 10), _instante(10, 12), 'CONFIRMADA'),
+            (_instante(10, 12), _instante(10, 13, 30), 'PENDIENTE'),
+            (_instante(10, 15), _instante(10, 16), 'CANCELADA'),
+        )):
+            Reserva.objects.create(codigo=f'R-{i}', area=cls.area, vivienda=cls.vivienda, persona=cls.persona,
+                                   hora_inicio=inicio, hora_fin=fin, estado=estado)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_calcular_libres(self):
+        self.assertEqual(_calcular_libres(self.area.id, date(2025, 3, 9), date(2025, 3, 11)), {
+            date(2025, 3, 9): [(_instante(9, 0), _instante(9, 22))],
+            date(2025, 3, 10): [(_instante(10, 2), _instante(10, 10)), (_instante(10, 13, 30), _instante(11, 0))],
+            date(2025, 3, 11): [(_instante(11, 0), _instante(12, 0))],
+        })
+        # Empezar el rango después de una reserva que cruza la medianoche igual la considera
+        self.assertEqual(_calcular_libres(self.area.id, date(2025, 3, 10), date(2025, 3, 10))[date(2025, 3, 10)][0],
+                         (_instante(10, 2), _instante(10, 10)))
+
+    def test_dividir_en_slots(self):
+        dia = date(2025, 3, 10)
+        libres = [(_instante(10, 2), _instante(10, 10)), (_instante(10, 13, 30), _instante(11, 0))]
+        por_hora = dividir_en_slots(dia, libres, 60)
+        self.assertEqual(len(por_hora), 8 + 10)
+        self.assertEqual(por_hora[0], (_instante(10, 2), _instante(10, 3)))
+        # Alineados desde el inicio del día: el libre de las 13:30 da turnos desde las 14:00
+        self.assertEqual(por_hora[8], (_instante(10, 14), _instante(10, 15)))
+        self.assertEqual(dividir_en_slots(dia, libres[:1], 90)[0], (_instante(10, 3), _instante(10, 4, 30)))
+        self.assertEqual(len(dividir_en_slots(dia, libres[:1], 90)), 4)
+        self.assertEqual(dividir_en_slots(dia, [(_instante(10, 2), _instante(10, 2, 30))], 60), [])
+
+    def _libres(self, dia):
+        return dict(disponibilidad(self.area.id, dia, dia))[dia]
+
+    def test_invalidacion_al_guardar_y_eliminar(self):
+        dia = date(2025, 3, 11)
+        self.assertEqual(self._libres(dia), [(_instante(11, 0), _instante(12, 0))])
+        with self.assertNumQueries(0):
+            self._libres(dia)
+
+        nueva = Reserva(codigo='R-N', area=self.area, vivienda=self.vivienda, persona=self.persona,
+                        hora_inicio=_instante(11, 8), hora_fin=_instante(11, 9), estado='PENDIENTE')
+        with self.captureOnCommitCallbacks(execute=True):
+            guardar_reserva(nueva)
+        self.assertEqual(self._libres(dia), [(_instante(11, 0), _instante(11, 8)), (_instante(11, 9), _instante(12, 0))])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            nueva.delete()
+        self.assertEqual(self._libres(dia), [(_instante(11, 0), _instante(12, 0))])
+
+    def test_calculo_anterior_a_una_reserva_no_queda_en_cache(self):
+        dia = date(2025, 3, 11)
+        _, claves = obtener_disponibilidad(self.area.id, [dia])
+        calculados = _calcular_libres(self.area.id, dia, dia)
+        # Una reserva confirma entre el cálculo y el guardado
+        invalidar_disponibilidad(self.area.id)
+        guardar_disponibilidad(claves, calculados)
+        self.assertEqual(obtener_disponibilidad(self.area.id, [dia])[0], {})
+
+
+def _estadisticas(concepto=None):
+    filas = EstadisticaMensual.objects.all()
+    if concepto is not None:
+        filas = filas.filter(concepto=concepto)
+    return sorted(filas.values_list('periodo', 'concepto', 'estado', 'cantidad', 'monto'))
+
+
+def _json_streaming(respuesta):
+    return json.loads(b''.join(respuesta.streaming_content))
+
+
+class ArchivoVisitasTests(TestCase):
+    """Después de archivar, reportes, listados y búsquedas de visitas abiertas no cambian."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.otra = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.frecuente = Visitante.objects.create(nombres='Luis', apellidos='Rojas', num_doc='1')
+        cls.antiguo = Visitante.objects.create(nombres='Elena', apellidos='Vargas', num_doc='2')
+
+        def visita(visitante, vivienda, entrada, minutos=60):
+            entrada = timezone.make_aware(entrada)
+            salida = entrada + timedelta(minutes=minutos) if minutos else None
+            return Visita.objects.create(visitante=visitante, vivienda_destino=vivienda, entrada=entrada, salida=salida)
+
+        cls.archivables = [
+            visita(cls.frecuente, cls.vivienda, datetime(2024, 1, 5, 10)),
+            visita(cls.frecuente, cls.otra, datetime(2024, 2, 10, 10)),
+            visita(cls.antiguo, cls.vivienda, datetime(2024, 1, 20, 10)),
+        ]
+        # Las visitas abiertas nunca se archivan, aunque sean antiguas
+        cls.abierta = visita(cls.frecuente, cls.vivienda, datetime(2024, 1, 25, 10), minutos=None)
+        cls.reciente = visita(cls.frecuente, cls.otra, datetime(2025, 3, 10, 10))
+
+    def _capturar(self):
+        reportes = [self.client.get('/api/reportes/visitas/', filtros).json()
+                    for filtros in ({}, {'fecha_inicio': '2024-01-01', 'fecha_fin': '2024-01-31'},
+                                    {'fecha_inicio': '2025-01-01'})]
+        visitantes = {fila['id']: (fila['ultima_visita'], fila['estado_visita'])
+                      for fila in self.client.get('/api/visitantes/').json()}
+        listado = [fila['id'] for fila in _json_streaming(self.client.get('/api/visitas/'))]
+        paginas, cursor = [], None
+        while True:
+            pagina = self.client.get('/api/visitas/', {'limit': 2, **({'cursor': cursor} if cursor else {})}).json()
+            paginas.extend(fila['id'] for fila in pagina['results'])
+            cursor = pagina['next']
+            if not cursor:
+                break
+        genericas = sorted(fila['id'] for fila in _json_streaming(self.client.get('/api/Visita/')))
+        return reportes, visitantes, listado, paginas, genericas
+
+    def test_archivar_no_cambia_lo_que_se_ve(self):
+        antes = self._capturar()
+        self.assertEqual(archivar(timezone.make_aware(datetime(2025, 1, 1))), 3)
+        self.assertEqual(sorted(VisitaArchivada.objects.values_list('id', flat=True)),
+                         [v.id for v in self.archivables])
+        self.assertEqual(set(Visita.objects.values_list('id', flat=True)), {self.abierta.id, self.reciente.id})
+        despues = self._capturar()
+        self.assertEqual(despues, antes)
+        reporte, _, listado, _, _ = despues
+        self.assertEqual(reporte[0]['resumen']['total_visitas'], 5)
+        self.assertEqual(len(listado), 5)
+        # El visitante con solo visitas archivadas conserva su última visita
+        self.assertEqual(despues[1][self.antiguo.id][0], self.archivables[2].entrada.isoformat())
+
+    def test_visitas_abiertas_despues_de_archivar(self):
+        archivar(timezone.make_aware(datetime(2025, 1, 1)))
+        self.assertEqual(list(Visita.objects.filter(salida__isnull=True).values_list('id', flat=True)),
+                         [self.abierta.id])
+        self.assertEqual(self.client.get('/api/reportes/visitas/').json()['resumen']['visitas_activas'], 1)
+
+        archivada = self.archivables[0].id
+        self.assertEqual(self.client.post(f'/api/visitas/{archivada}/registrar-salida/').status_code, 400)
+        self.assertEqual(self.client.post('/api/visitas/999999/registrar-salida/').status_code, 404)
+        self.assertEqual(self.client.post(f'/api/visitas/{self.abierta.id}/registrar-salida/').status_code, 200)
+        self.assertFalse(Visita.objects.filter(salida__isnull=True).exists())
+
+    def test_borrar_el_visitante_descuenta_sus_visitas_archivadas(self):
+        archivar(timezone.make_aware(datetime(2025, 1, 1)))
+        self.antiguo.delete()
+        self.assertFalse(VisitaArchivada.objects.filter(pk=self.archivables[2].id).exists())
+        incremental = _estadisticas('VISITAS')
+        self.assertIn(('2024-01', 'VISITAS', '', 2, Decimal('0')), incremental)
+        recalcular()
+        self.assertEqual(incremental, _estadisticas('VISITAS'))
+
+    def test_visita_archivada_es_de_solo_lectura(self):
+        archivar(timezone.make_aware(datetime(2025, 1, 1)))
+        archivada = self.archivables[0].id
+        respuesta = self.client.put(f'/api/Visita/{archivada}/modificar/', data=json.dumps({'medio': 'AUTO'}),
+                                    content_type='application/json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/Visita/{archivada}/eliminar/').status_code, 409)
+        self.assertTrue(VisitaArchivada.objects.filter(pk=archivada).exists())
+        self.assertEqual(self.client.delete(f'/api/Visita/{self.reciente.id}/eliminar/').status_code, 200)
+
+
+class RecargosMoraTests(TestCase):
+    """
+    acumular_recargos: días de mora y monto. En SQLite los días salen de
+    julianday y en PostgreSQL de restar fechas; los mismos casos (cambio de
+    mes, de año y 29 de febrero) corren contra el motor configurado.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        ExpensaParametro.objects.create(metodo='POR_CASA', tarifa_por_casa=Decimal('100'), multa_diaria=Decimal('1.50'))
+        cls.enero = cls._expensa('2025-01', date(2025, 1, 31))
+        cls.diciembre = cls._expensa('2024-12', date(2024, 12, 31))
+        cls.febrero = cls._expensa('2024-02', date(2024, 2, 28))
+        cls._expensa('2024-11', date(2024, 11, 30), estado='PAGADA')
+        cls._expensa('2025-03', date(2025, 3, 10))  # vence el mismo día: todavía no está en mora
+        cls._expensa('2025-04', None)
+
+    @classmethod
+    def _expensa(cls, periodo, vencimiento, estado='PENDIENTE'):
+        return Expensa.objects.create(codigo=f'E-{periodo}', vivienda=cls.vivienda, periodo=periodo,
+                                      monto=Decimal('100'), vencimiento=vencimiento, estado=estado)
+
+    def _recargos(self):
+        return {fila[0]: fila[1:] for fila in RecargoExpensa.objects.values_list('expensa_id', 'dias_mora', 'monto')}
+
+    def test_dias_de_mora_y_monto(self):
+        resultado = acumular_recargos(date(2025, 3, 10))
+        self.assertEqual((resultado['actualizadas'], resultado['eliminadas']), (3, 0))
+        self.assertEqual(self._recargos(), {
+            self.enero.id: (38, Decimal('57.00')),
+            self.diciembre.id: (69, Decimal('103.50')),
+            self.febrero.id: (376, Decimal('564.00')),  # 2024 es bisiesto
+        })
+        acumular_recargos(date(2024, 3, 1))
+        self.assertEqual(self._recargos()[self.febrero.id], (2, Decimal('3.00')))
+
+    def test_repetir_el_mismo_dia_no_cambia_nada(self):
+        acumular_recargos(date(2025, 3, 10), lote=2)
+        primero = self._recargos()
+        resultado = acumular_recargos(date(2025, 3, 10), lote=2)
+        self.assertEqual(self._recargos(), primero)
+        self.assertEqual(resultado['eliminadas'], 0)
+        self.assertGreater(resultado['lotes'], 1)
+        acumular_recargos(date(2025, 3, 11))
+        self.assertEqual(self._recargos()[self.enero.id], (39, Decimal('58.50')))
+
+    def test_quita_recargos_de_deudas_pagadas_o_movidas(self):
+        acumular_recargos(date(2025, 3, 10))
+        Expensa.objects.filter(pk=self.enero.pk).update(estado='PAGADA')
+        Expensa.objects.filter(pk=self.diciembre.pk).update(vencimiento=date(2025, 6, 30))
+        resultado = acumular_recargos(date(2025, 3, 10), lote=1)
+        self.assertEqual(resultado['eliminadas'], 2)
+        self.assertEqual(set(self._recargos()), {self.febrero.id})
+
+    def test_sin_multa_diaria(self):
+        ExpensaParametro.objects.create(metodo='POR_CASA', tarifa_por_casa=Decimal('100'))
+        self.assertEqual(acumular_recargos(date(2025, 3, 10))['lotes'], 0)
+        self.assertFalse(RecargoExpensa.objects.exists())
+
+
+class ComunicadosPaginadosTests(TestCase):
+    """
+    listar_comunicados: el orden de siempre (-fecha_publicacion con los sin
+    fecha al final, -id de desempate) es el mismo con y sin cursor.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        fechas = [_instante(1, 9), None, _instante(3, 9), _instante(1, 9), None, _instante(2, 9), _instante(3, 9)]
+        cls.ids = [Comunicado.objects.create(titulo=f'C{i}', fecha_publicacion=f).id for i, f in enumerate(fechas)]
+
+    def _recorrer(self, orden=None):
+        ids, cursor = [], None
+        while True:
+            parametros = {'limit': 2}
+            if orden:
+                parametros['orden'] = orden
+            if cursor:
+                parametros['cursor'] = cursor
+            pagina = self.client.get('/api/comunicados/', parametros).json()
+            ids += [c['id'] for c in pagina['results']]
+            cursor = pagina['next']
+            if not cursor:
+                return ids
+
+    def test_orden_por_defecto_con_y_sin_cursor(self):
+        c = self.ids
+        esperado = [c[6], c[2], c[5], c[3], c[0], c[4], c[1]]
+        self.assertEqual([x['id'] for x in self.client.get('/api/comunicados/').json()], esperado)
+        self.assertEqual(self._recorrer(), esperado)
+
+    def test_orden_ascendente_deja_sin_fecha_al_final(self):
+        c = self.ids
+        self.assertEqual(self._recorrer('fecha_publicacion'), [c[0], c[3], c[5], c[2], c[6], c[1], c[4]])
+
+
+class ReporteExpensasTests(TestCase):
+    """/api/reportes/expensas/: totales y desglose por vivienda agregados en SQL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        uno = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        dos = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        for vivienda, periodo, monto, estado, vence in (
+            (uno, '2025-01', '100', 'PAGADA', date(2025, 1, 10)),
+            (uno, '2025-02', '100', 'PENDIENTE', date(2025, 2, 10)),
+            (uno, '2025-03', '40', 'ANULADA', date(2025, 3, 10)),
+            (dos, '2025-01', '80', 'PENDIENTE', date(2025, 1, 10)),
+            (dos, '2025-02', '80', 'PENDIENTE', None),
+        ):
+            Expensa.objects.create(codigo=f'E-{vivienda.codigo}-{periodo}', vivienda=vivienda, periodo=periodo,
+                                   monto=Decimal(monto), estado=estado, vencimiento=vence)
+
+    def _reporte(self, **filtros):
+        respuesta = self.client.get('/api/reportes/expensas/', filtros)
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        resumen = {clave: Decimal(str(valor)) for clave, valor in datos['resumen'].items()}
+        por_vivienda = {
+            codigo: (Decimal(fila['total']), Decimal(fila['pagado']), Decimal(fila['pendiente']), fila['cantidad'])
+            for codigo, fila in datos['por_vivienda'].items()
+        }
+        return resumen, por_vivienda
+
+    def test_totales_y_por_vivienda(self):
+        with self.assertNumQueries(1):
+            resumen, por_vivienda = self._reporte()
+        # ANULADA suma al total pero no es pagada ni pendiente
+        self.assertEqual(resumen, {'total_monto': 400, 'monto_pagado': 100, 'monto_pendiente': 260,
+                                   'porcentaje_pago': 25})
+        self.assertEqual(por_vivienda, {'V-001': (240, 100, 100, 3), 'V-002': (160, 0, 160, 2)})
+
+    def test_filtros(self):
+        self.assertEqual(self._reporte(año='2025', mes='1')[1], {'V-001': (100, 100, 0, 1), 'V-002': (80, 0, 80, 1)})
+        self.assertEqual(self._reporte(estado='PENDIENTE')[0]['total_monto'], 260)
+        # Sin vencimiento no entra en un rango de vencimientos
+        _, por_vivienda = self._reporte(vencimiento_desde='2025-02-01', vencimiento_hasta='2025-02-28')
+        self.assertEqual(por_vivienda, {'V-001': (100, 0, 100, 1)})
+        for filtros in ({'vencimiento_desde': 'abc'}, {'vencimiento_hasta': '2025-02-30'}):
+            with self.subTest(filtros=filtros):
+                self.assertEqual(self.client.get('/api/reportes/expensas/', filtros).status_code, 400)
+
+
+class ReporteVisitasTests(TestCase):
+    """/api/reportes/visitas/: resumen, por vivienda y visitantes frecuentes en un número fijo de consultas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        uno = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        dos = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.visitantes = [Visitante.objects.create(nombres=f'N{i}', apellidos=f'A{i}', num_doc=str(i)) for i in range(3)]
+        a, b, c = cls.visitantes
+        for visitante, vivienda, dia, abierta in (
+            (c, uno, 1, False), (c, uno, 2, False), (c, dos, 3, True),
+            (b, dos, 4, False), (b, dos, 20, False),
+            (a, uno, 5, False), (a, uno, 21, True),
+        ):
+            entrada = timezone.make_aware(datetime(2025, 3, dia, 10))
+            Visita.objects.create(visitante=visitante, vivienda_destino=vivienda, entrada=entrada,
+                                  salida=None if abierta else entrada + timedelta(hours=1))
+
+    def _reporte(self, **filtros):
+        respuesta = self.client.get('/api/reportes/visitas/', filtros)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_resumen_y_frecuentes(self):
+        a, b, c = self.visitantes
+        with CaptureQueriesContext(connection) as capturadas:
+            datos = self._reporte(top=2)
+        self.assertLessEqual(len(capturadas), 4, '\n'.join(consulta['sql'] for consulta in capturadas))
+        self.assertEqual(datos['resumen'], {'total_visitas': 7, 'visitas_activas': 2, 'visitas_completadas': 5})
+        self.assertEqual(datos['por_vivienda'], {'V-001': 4, 'V-002': 3})
+        # Más visitas primero; a igual cantidad, el visitante de menor id
+        self.assertEqual([(fila['visitante_id'], fila['nombre'], fila['visitas']) for fila in datos['visitantes_frecuentes']],
+                         [(c.id, 'N2 A2', 3), (a.id, 'N0 A0', 2)])
+
+    def test_rango_de_fechas(self):
+        datos = self._reporte(fecha_inicio='2025-03-04', fecha_fin='2025-03-20')
+        self.assertEqual(datos['resumen'], {'total_visitas': 3, 'visitas_activas': 0, 'visitas_completadas': 3})
+        self.assertEqual([fila['visitas'] for fila in datos['visitantes_frecuentes']], [2, 1])
+        for filtros in ({'fecha_inicio': 'ayer'}, {'top': 'x'}):
+            with self.subTest(filtros=filtros):
+                self.assertEqual(self.client.get('/api/reportes/visitas/', filtros).status_code, 400)
+
+
+class DashboardTests(TestCase):
+    """La instantánea del dashboard se sirve del caché y se descarta al confirmar una escritura."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        Vivienda.objects.create(categoria=cls.categoria, codigo='V-001')
+
+    def setUp(self):
+        cache.clear()
+
+    def _viviendas(self):
+        return self.client.get('/api/dashboard/').json()['viviendas']['total']
+
+    def test_instantanea_en_cache(self):
+        self.assertEqual(self._viviendas(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self._viviendas(), 1)
+
+    def test_invalidacion_al_confirmar(self):
+        self.assertEqual(self._viviendas(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Vivienda.objects.create(categoria=self.categoria, codigo='V-002')
+            # Sin confirmar todavía: la instantánea anterior sigue en caché
+            self.assertEqual(self._viviendas(), 1)
+        self.assertEqual(self._viviendas(), 2)
+
+
+class MetricasTests(TestCase):
+    """Exportación de Prometheus por ruta y acceso a /api/metrics/ solo para administradores."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password='x')
+        cls.admin.perfil.rol = 'ADMIN'
+        cls.admin.perfil.save()
+        cls.residente = User.objects.create_user('residente', password='x')
+
+    def setUp(self):
+        cache.clear()
+        registro.reiniciar()
+
+    def _metricas(self, usuario=None):
+        cabeceras = {}
+        if usuario is not None:
+            cabeceras['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(usuario)}'
+        return self.client.get('/api/metrics/', **cabeceras)
+
+    def test_histograma(self):
+        histograma = Histograma((0.01, 0.1, 1))
+        for valor in (0.005, 0.01, 0.5, 3):
+            histograma.observar(valor)
+        self.assertEqual(list(histograma.lineas('x', 'view="v"')), [
+            'x_bucket{view="v",le="0.01"} 2',
+            'x_bucket{view="v",le="0.1"} 2',
+            'x_bucket{view="v",le="1"} 3',
+            'x_bucket{view="v",le="+Inf"} 4',
+            'x_sum{view="v"} 3.515',
+            'x_count{view="v"} 4',
+        ])
+
+    def test_exporta_por_ruta(self):
+        for _ in range(2):
+            self.client.get('/api/dashboard/')
+        self.client.get('/api/reportes/visitas/', {'top': 'x'})
+        respuesta = self._metricas(self.admin)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        valores = {}
+        for linea in respuesta.content.decode().splitlines():
+            if not linea.startswith('#'):
+                serie, valor = linea.rsplit(' ', 1)
+                valores[serie] = float(valor)
+
+        dashboard = 'view="dashboard",method="GET"'
+        self.assertEqual(valores[f'condominio_http_requests_total{{{dashboard},status="200"}}'], 2)
+        self.assertEqual(valores['condominio_http_requests_total{view="reporte_visitas",method="GET",status="400"}'], 1)
+        for nombre in ('condominio_http_request_duration_seconds', 'condominio_db_queries_per_request',
+                       'condominio_http_response_size_bytes'):
+            with self.subTest(histograma=nombre):
+                buckets = [valor for serie, valor in valores.items() if serie.startswith(f'{nombre}_bucket{{{dashboard},')]
+                self.assertEqual(buckets, sorted(buckets))
+                self.assertEqual(buckets[-1], 2)
+                self.assertEqual(valores[f'{nombre}_count{{{dashboard}}}'], 2)
+        # La primera lectura calcula la instantánea; la segunda sale del caché sin consultas
+        consultas = valores[f'condominio_db_queries_per_request_sum{{{dashboard}}}']
+        self.assertGreater(consultas, 0)
+        self.assertEqual(valores[f'condominio_db_queries_per_request_bucket{{{dashboard},le="0"}}'], 1)
+        self.assertGreater(valores[f'condominio_http_response_size_bytes_sum{{{dashboard}}}'], 0)
+
+    def test_solo_administradores(self):
+        self.assertEqual(self._metricas().status_code, 401)
+        self.assertEqual(self._metricas(self.residente).status_code, 403)
+        self.assertEqual(self._metricas(self.admin).status_code, 200)
+
+
+class ListadoGenericoPaginadoTests(TestCase):
+    """/api/<modelo>/?limit= pagina por la clave primaria del modelo, aunque no sea id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        for codigo in ('V-001', 'V-002', 'V-003'):
+            Vivienda.objects.create(categoria=categoria, codigo=codigo)
+        recalcular_saldos()
+        OcupacionZona.objects.all().delete()
+        for zona in ('', 'B', 'A'):
+            OcupacionZona.objects.create(zona=zona, total=1)
+
+    def _recorrer(self, modelo, **parametros):
+        claves, cursor = [], None
+        while True:
+            pagina = self.client.get(f'/api/{modelo}/', {'limit': 2, **parametros, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(pagina.status_code, 200)
+            pagina = pagina.json()
+            claves += [fila[next(iter(fila))] for fila in pagina['results']]
+            cursor = pagina['next']
+            if not cursor:
+                return claves
+
+    def test_clave_primaria_distinta_de_id(self):
+        self.assertEqual(self._recorrer('OcupacionZona'), ['', 'A', 'B'])
+        self.assertEqual(self._recorrer('OcupacionZona', orden='-zona'), ['B', 'A', ''])
+        viviendas = sorted(Vivienda.objects.values_list('id', flat=True))
+        self.assertEqual(self._recorrer('SaldoVivienda'), viviendas)
+        self.assertEqual(self._recorrer('RecargoExpensa'), [])
+        self.assertEqual(self.client.get('/api/OcupacionZona/', {'limit': 2, 'orden': 'id'}).status_code, 400)
+
+
+class CreacionEnLoteTests(TestCase):
+    """crear_en_lote vía POST /api/expensas/crear/ con un arreglo de filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+
+    def _fila(self, periodo, **extra):
+        return {'codigo': f'E-{periodo}', 'vivienda_id': self.vivienda.id, 'periodo': periodo, 'monto': '100', **extra}
+
+    def _crear(self, filas):
+        return self.client.post('/api/expensas/crear/', json.dumps(filas), content_type='application/json')
+
+    def test_crea_todas_y_acepta_ids_como_texto(self):
+        respuesta = self._crear([self._fila('2025-01'), self._fila('2025-02', vivienda_id=str(self.vivienda.id))])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['creados'], 2)
+        self.assertEqual(Expensa.objects.filter(vivienda=self.vivienda).count(), 2)
+
+    def test_una_fila_invalida_no_crea_ninguna(self):
+        respuesta = self._crear([
+            self._fila('2025-01'),
+            self._fila('2025-02', vivienda_id=999999),
+            self._fila('2025-03', monto='abc'),
+            'no es un objeto',
+            self._fila('2025-04', vivienda_id='x'),
+        ])
+        self.assertEqual(respuesta.status_code, 400)
+        errores = {e['indice']: e['errores'] for e in respuesta.json()['errores']}
+        self.assertEqual(set(errores), {1, 2, 3, 4})
+        self.assertIn('vivienda_id', errores[1])
+        self.assertIn('monto', errores[2])
+        self.assertIn('__all__', errores[3])
+        self.assertIn('vivienda_id', errores[4])
+        self.assertFalse(Expensa.objects.exists())
+
+    def test_limite_de_filas(self):
+        with mock.patch('core.views.MAX_FILAS_LOTE', 2):
+            respuesta = self._crear([self._fila(f'2025-0{m}') for m in (1, 2, 3)])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(Expensa.objects.exists())
+        self.assertEqual(self._crear([]).status_code, 400)
+
+
+class BusquedaPorPlacaTests(TestCase):
+    """buscar_por_placa: placa normalizada exacta o a distancia de edición 1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        cls.tipo = TipoVehiculo.objects.create(nombre='Auto')
+        cls.exacto = cls._vehiculo('BM-000042')
+        cls.sustitucion = cls._vehiculo('BM000043')
+        cls.insercion = cls._vehiculo('BM0000042')
+        cls.borrado = cls._vehiculo('BM00042')
+        cls.transposicion = cls._vehiculo('MB000042')
+        cls._vehiculo('BM000099')  # distancia 2
+        parqueo = Parqueo.objects.create(codigo='P-001', zona='A', ocupado=True)
+        AsignacionParqueo.objects.create(vehiculo=cls.exacto, parqueo=parqueo)
+
+    @classmethod
+    def _vehiculo(cls, placa):
+        return Vehiculo.objects.create(persona=cls.persona, vivienda=cls.vivienda, tipo=cls.tipo, placa=placa)
+
+    def test_normaliza_la_consulta(self):
+        clave, encontrados = buscar_por_placa('bm 000042')
+        self.assertEqual(clave, 'BM000042')
+        self.assertEqual(encontrados[0], (0, self.exacto))
+
+    def test_distancia_uno_con_exactas_primero(self):
+        _, encontrados = buscar_por_placa('bm-000042')
+        self.assertEqual(encontrados[0], (0, self.exacto))
+        self.assertEqual({(d, v.id) for d, v in encontrados[1:]}, {
+            (1, self.sustitucion.id), (1, self.insercion.id), (1, self.borrado.id), (1, self.transposicion.id),
+        })
+
+    def test_cambiar_la_placa_reconstruye_variantes(self):
+        self.borrado.placa = 'ZZ-1234'
+        self.borrado.save()
+        self.assertEqual(Vehiculo.objects.get(pk=self.borrado.pk).placa_normalizada, 'ZZ1234')
+        self.assertFalse(VariantePlaca.objects.filter(vehiculo_id=self.borrado.pk, variante='BM00042').exists())
+        self.assertNotIn(self.borrado.id, [v.id for _, v in buscar_por_placa('BM000042')[1]])
+        self.assertEqual(buscar_por_placa('ZZ1243')[1], [(1, self.borrado)])
+
+    def test_una_consulta_con_asignacion_activa(self):
+        with self.assertNumQueries(1):
+            _, encontrados = buscar_por_placa('BM000042')
+            vehiculo = encontrados[0][1]
+            datos = (vehiculo.persona.nombres, vehiculo.vivienda.codigo, vehiculo.tipo.nombre, vehiculo.parqueo_codigo)
+        self.assertEqual(datos, ('Ana', 'V-001', 'Auto', 'P-001'))
+
+
+class IngresoVisitaTests(TestCase):
+    """POST /api/visitas/ingreso/ contra el motor configurado (SQL directo en PostgreSQL)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.visitante = Visitante.objects.create(nombres='Luis', apellidos='Rojas', num_doc='700')
+
+    def setUp(self):
+        self.addCleanup(presencia.invalidar)
+
+    def _ingreso(self, **datos):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/visitas/ingreso/', json.dumps({'codigo_vivienda': 'V-001', **datos}),
+                                    content_type='application/json')
+
+    def _visitas_del_mes(self):
+        fila = EstadisticaMensual.objects.filter(periodo=timezone.now().strftime('%Y-%m'), concepto='VISITAS').first()
+        return fila.cantidad if fila else 0
+
+    def test_visitante_existente(self):
+        antes = self._visitas_del_mes()
+        respuesta = self._ingreso(num_doc='700', placa='ab-123')
+        self.assertEqual(respuesta.status_code, 201)
+        datos = respuesta.json()
+        self.assertEqual((datos['visitante_id'], datos['visitante_creado']), (self.visitante.id, False))
+        self.assertEqual(Visita.objects.get(pk=datos['id']).vivienda_destino_id, self.vivienda.id)
+        self.assertEqual(Visitante.objects.get(pk=self.visitante.id).placa, 'AB123')
+        self.assertEqual(self._visitas_del_mes(), antes + 1)
+
+    def test_visitante_nuevo_con_nombres(self):
+        respuesta = self._ingreso(num_doc='800', nombres='Eva', apellidos='Soto')
+        self.assertEqual(respuesta.status_code, 201)
+        datos = respuesta.json()
+        self.assertTrue(datos['visitante_creado'])
+        self.assertEqual(datos['visitante_nombre'], 'Eva Soto')
+        self.assertEqual(Visitante.objects.get(pk=datos['visitante_id']).num_doc, '800')
+
+    def test_vivienda_inexistente_no_crea_visitante(self):
+        respuesta = self._ingreso(codigo_vivienda='V-999', num_doc='800', nombres='Eva')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertFalse(Visitante.objects.filter(num_doc='800').exists())
+        self.assertFalse(Visita.objects.exists())
+
+    def test_visitante_inexistente_sin_nombres(self):
+        respuesta = self._ingreso(num_doc='800')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertFalse(Visitante.objects.filter(num_doc='800').exists())
+        self.assertFalse(Visita.objects.exists())
+        self.assertEqual(self._ingreso().status_code, 400)
+
+
+class IndicePresenciaTests(TestCase):
+    """IndicePresencia: entradas y salidas del proceso y recarga desde la base."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.casa1 = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.casa2 = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.visitante = Visitante.objects.create(nombres='Luis', apellidos='Rojas', num_doc='700')
+        cls.abierta = Visita.objects.create(visitante=cls.visitante, vivienda_destino=cls.casa1, entrada=_instante(10, 9))
+        Visita.objects.create(visitante=cls.visitante, vivienda_destino=cls.casa1, entrada=_instante(9, 9), salida=_instante(9, 10))
+
+    def setUp(self):
+        self.indice = IndicePresencia()
+        self.indice.reconstruir()
+
+    def _fila(self, visita_id, vivienda, entrada):
+        return {'id': visita_id, 'visitante_id': self.visitante.id, 'visitante_nombre': 'Luis Rojas',
+                'vivienda_destino_id': vivienda.id, 'codigo_vivienda': vivienda.codigo, 'entrada': entrada, 'medio': ''}
+
+    def _ids(self, vivienda=None):
+        return [fila['id'] for fila in self.indice.presentes(vivienda.id if vivienda else None)]
+
+    def test_carga_solo_las_abiertas(self):
+        self.assertEqual(self._ids(), [self.abierta.id])
+
+    def test_registrar_y_salida(self):
+        nueva = Visita.objects.create(visitante=self.visitante, vivienda_destino=self.casa2, entrada=_instante(10, 11))
+        self.indice.registrar(self._fila(nueva.id, self.casa2, nueva.entrada))
+        self.assertEqual(self._ids(), [nueva.id, self.abierta.id])
+        self.assertEqual(self._ids(self.casa2), [nueva.id])
+
+        Visita.objects.filter(pk=nueva.pk).update(salida=_instante(10, 12))
+        self.indice.registrar_visita(nueva.id)
+        self.assertEqual(self._ids(), [self.abierta.id])
+        self.assertEqual(self._ids(self.casa2), [])
+        self.indice.quitar(self.abierta.id)
+        self.assertEqual(self._ids(self.casa1), [])
+
+    def test_recarga_al_vencer_el_ttl(self):
+        otro_worker = Visita.objects.create(visitante=self.visitante, vivienda_destino=self.casa2, entrada=_instante(10, 11))
+        self.assertEqual(self._ids(), [self.abierta.id])  # todavía vigente: no ve la escritura ajena
+        self.indice.ttl = 0
+        self.assertEqual(self._ids(), [otro_worker.id, self.abierta.id])
+
+
+class RespuestaStreamingTests(TestCase):
+    """respuesta_streaming escribe los mismos bytes que JsonResponse con la lista completa."""
+
+    def test_mismos_bytes_que_json_response(self):
+        for cantidad in (0, 1, FILAS_POR_ESCRITURA + 1):
+            with self.subTest(cantidad=cantidad):
+                Visitante.objects.all().delete()
+                Visitante.objects.bulk_create(Visitante(nombres=f'V{i}', num_doc=str(i)) for i in range(cantidad))
+                serializar = lambda v: {'id': v.id, 'nombres': v.nombres, 'foto_url': v.foto_url}
+                visitantes = Visitante.objects.order_by('id')
+                streaming = b''.join(respuesta_streaming(visitantes, serializar).streaming_content)
+                self.assertEqual(streaming, JsonResponse([serializar(v) for v in visitantes], safe=False).content)
+
+
+class EstadisticasMensualesTests(TestCase):
+    """Lo incremental de estadisticas_mensuales coincide con recalcular() tras cada cambio; lectura por endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = CategoriaVivienda.objects.create(nombre='A', habitaciones=2, banos=1)
+        cls.vivienda = Vivienda.objects.create(categoria=categoria, codigo='V-001')
+        cls.otra = Vivienda.objects.create(categoria=categoria, codigo='V-002')
+        cls.persona = Persona.objects.create(nombres='Ana', apellidos='Pérez', num_doc='100')
+        cls.visitante = Visitante.objects.create(nombres='Luis', apellidos='Rojas', num_doc='1')
+        cls.infraccion = TipoInfraccion.objects.create(codigo='RUIDO', monto_base=Decimal('30'))
+
+    def _expensa(self, periodo, monto='100', estado='PENDIENTE', vivienda=None):
+        return Expensa.objects.create(codigo=f'E-{periodo}', vivienda=vivienda or self.vivienda, periodo=periodo,
+                                      monto=Decimal(monto), estado=estado)
+
+    def _multa(self, mes, dia=15, monto='30', estado='PENDIENTE'):
+        return Multa.objects.create(codigo=f'M-{mes}-{dia}', vivienda=self.vivienda, persona=self.persona,
+                                    tipo_infraccion=self.infraccion, monto=Decimal(monto), estado=estado,
+                                    fecha=timezone.make_aware(datetime(2025, mes, dia, 12)))
+
+    def _visita(self, mes, dia=10):
+        entrada = timezone.make_aware(datetime(2025, mes, dia, 10))
+        return Visita.objects.create(visitante=self.visitante, vivienda_destino=self.vivienda,
+                                     entrada=entrada, salida=entrada + timedelta(hours=1))
+
+    def _coincide_con_recalculo(self):
+        incremental = _estadisticas()
+        recalcular()
+        self.assertEqual(incremental, _estadisticas())
+        return incremental
+
+    def test_expensa_crear_modificar_y_eliminar(self):
+        expensa = self._expensa('2025-01')
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-01', 'EXPENSAS', 'PENDIENTE', 1, Decimal('100'))])
+
+        expensa.estado = 'PAGADA'
+        expensa.save()
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-01', 'EXPENSAS', 'PAGADA', 1, Decimal('100'))])
+
+        expensa.monto = Decimal('120')
+        expensa.save(update_fields=['monto'])
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-01', 'EXPENSAS', 'PAGADA', 1, Decimal('120'))])
+
+        expensa.periodo = '2025-02'
+        expensa.save()
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-02', 'EXPENSAS', 'PAGADA', 1, Decimal('120'))])
+
+        # update_fields sin campos que aporten no cambia nada
+        expensa.codigo = 'E-X'
+        expensa.save(update_fields=['codigo'])
+        self._coincide_con_recalculo()
+
+        expensa.delete()
+        self.assertEqual(self._coincide_con_recalculo(), [])
+
+    def test_multa_crear_modificar_y_eliminar(self):
+        multa = self._multa(1)
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-01', 'MULTAS', 'PENDIENTE', 1, Decimal('30'))])
+
+        multa.estado = 'PAGADA'
+        multa.monto = Decimal('45')
+        multa.save()
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-01', 'MULTAS', 'PAGADA', 1, Decimal('45'))])
+
+        multa.fecha = timezone.make_aware(datetime(2025, 3, 2, 12))
+        multa.save()
+        self.assertEqual(self._coincide_con_recalculo(), [('2025-03', 'MULTAS', 'PAGADA', 1, Decimal('45'))])
+
+        # Sin fecha la multa no entra en ningún mes
+        multa.fecha = None
+        multa.save()
+        self.assertEqual(self._coincide_con_recalculo(), [])
+
+        multa.fecha = timezone.make_aware(datetime(2025, 3, 2, 12))
+        multa.save()
+        multa.delete()
+        self.assertEqual(self._coincide_con_recalculo(), [])
+
+    def test_una_fila_de_varias_en_el_mes(self):
+        primera, _ = self._expensa('2025-01'), self._expensa('2025-01', monto='60', vivienda=self.otra)
+        self._multa(1, dia=3)
+        self._multa(1, dia=20, monto='10')
+        self._visita(1)
+        primera.delete()
+        self.assertEqual(self._coincide_con_recalculo(), [
+            ('2025-01', 'EXPENSAS', 'PENDIENTE', 1, Decimal('60')),
+            ('2025-01', 'MULTAS', 'PENDIENTE', 2, Decimal('40')),
+            ('2025-01', 'VISITAS', '', 1, Decimal('0')),
+        ])
+
+    def test_creacion_en_lote(self):
+        respuesta = self.client.post('/api/expensas/crear/', json.dumps([
+            {'codigo': 'E-1', 'vivienda_id': self.vivienda.id, 'periodo': '2025-01', 'monto': '100', 'estado': 'PENDIENTE'},
+            {'codigo': 'E-2', 'vivienda_id': self.otra.id, 'periodo': '2025-01', 'monto': '50', 'estado': 'PAGADA'},
+        ]), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        multas = Multa.objects.bulk_create([
+            Multa(codigo=f'M-L{dia}', vivienda=self.vivienda, persona=self.persona, tipo_infraccion=self.infraccion,
+                  fecha=timezone.make_aware(datetime(2025, 2, dia, 12)), monto=Decimal('15'), estado='PENDIENTE')
+            for dia in (1, 28)
+        ])
+        post_bulk_create.send(sender=Multa, instances=multas)
+        self.assertEqual(self._coincide_con_recalculo(), [
+            ('2025-01', 'EXPENSAS', 'PAGADA', 1, Decimal('50')),
+            ('2025-01', 'EXPENSAS', 'PENDIENTE', 1, Decimal('100')),
+            ('2025-02', 'MULTAS', 'PENDIENTE', 2, Decimal('30')),
+        ])
+
+    def test_conciliar_pagos_pasa_los_montos_a_pagada(self):
+        self._expensa('2025-01')
+        self._expensa('2025-02')
+        self._multa(1)
+        Pago.objects.create(vivienda=self.vivienda, persona=self.persona, concepto='EXPENSA', monto=Decimal('150'),
+                            metodo='QR', estado='CONFIRMADO', fecha=timezone.make_aware(datetime(2025, 3, 20, 12)))
+        Pago.objects.create(vivienda=self.vivienda, persona=self.persona, concepto='MULTA', monto=Decimal('30'),
+                            metodo='QR', estado='CONFIRMADO', fecha=timezone.make_aware(datetime(2025, 3, 20, 12)))
+        conciliar_pagos()
+        # Enero queda saldada; febrero, con un pago parcial, sigue pendiente
+        self.assertEqual(self._coincide_con_recalculo(), [
+            ('2025-01', 'EXPENSAS', 'PAGADA', 1, Decimal('100')),
+            ('2025-01', 'MULTAS', 'PAGADA', 1, Decimal('30')),
+            ('2025-02', 'EXPENSAS', 'PENDIENTE', 1, Decimal('100')),
+        ])
+
+    def test_endpoints_de_lectura(self):
+        for mes, dia in ((2, 1), (2, 27), (3, 5), (3, 6), (3, 31)):
+            self._visita(mes, dia)
+        self._expensa('2025-03', estado='PAGADA')
+        self._expensa('2025-03', monto='50', vivienda=self.otra)
+        self._multa(3, monto='20')
+        self._coincide_con_recalculo()
+
+        datos = self.client.get('/api/reportes/estadisticas-mensuales/', {'año': 2025, 'mes': 3}).json()
+        self.assertEqual(datos['estadisticas']['visitas'],
+                         {'actual': 3, 'anterior': 2, 'variacion': 1, 'porcentaje_variacion': 50.0})
+        expensas = datos['estadisticas']['expensas']
+        self.assertEqual((expensas['total'], expensas['monto_total'], expensas['pagadas'], expensas['pendientes']),
+                         (2, 150.0, 1, 1))
+        self.assertEqual(datos['estadisticas']['multas']['por_estado'], {'PENDIENTE': {'cantidad': 1, 'monto': 20.0}})
+        self.assertEqual(self.client.get('/api/reportes/estadisticas-mensuales/', {'mes': 13}).status_code, 400)
+
+        respuesta = self.client.get('/api/reportes/estadisticas-tendencia/', {'desde': '2025-01', 'hasta': '2025-03'})
+        serie = respuesta.json()['serie']
+        self.assertEqual([(fila['periodo'], fila['visitas']) for fila in serie],
+                         [('2025-01', 0), ('2025-02', 2), ('2025-03', 3)])
+        self.assertEqual([fila['expensas']['monto_total'] for fila in serie], [0.0, 0.0, 150.0])
+        self.assertEqual([fila['multas']['total'] for fila in serie], [0, 0, 1])
+        # Sin desde: los 12 meses hasta el pedido
+        serie = self.client.get('/api/reportes/estadisticas-tendencia/', {'hasta': '2025-03'}).json()['serie']
+        self.assertEqual((len(serie), serie[0]['periodo'], serie[-1]['visitas']), (12, '2024-04', 3))
+        for filtros in ({'desde': '2025-04', 'hasta': '2025-03'}, {'hasta': '2025-13'}):
+            with self.subTest(filtros=filtros):
+                self.assertEqual(self.client.get('/api/reportes/estadisticas-tendencia/', filtros).status_code, 400)
@@ -0,0 +1,124 @@
+"""
+Búsqueda de vehículos por placa para la portería.
+
+vehiculos.placa_normalizada guarda la placa sin espacios, guiones ni signos y
+en mayúsculas (índice vehiculos_placa_normalizada_idx). Para tolerar un error
+de tipeo, variantes_placa guarda cada placa normalizada y las que resultan
+de borrarle un carácter: dos placas a distancia de edición 1 (sustitución,
+inserción, borrado o transposición de dos caracteres vecinos) comparten al
+menos una variante, así que los candidatos salen de una búsqueda por índice
+con las variantes de la consulta y luego se verifica la distancia.
+
+Las señales de core.signals completan placa_normalizada y las variantes al
+guardar vehículos (también en lote); reindexar_placas() las reconstruye.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+
+from .models import AsignacionParqueo, VariantePlaca, Vehiculo
+
+MAX_DISTANCIA = 1
+TAMANO_LOTE = 5000
+
+
+def normalizar_placa(placa):
+    """Placa sin espacios, guiones ni signos y en mayúsculas; None si queda vacía."""
+    if placa is None:
+        return None
+    return re.sub(r'[\W_]+', '', str(placa)).upper() or None
+
+
+def variantes(clave):
+    """La clave y todas las que resultan de borrarle un carácter."""
+    if not clave:
+        return set()
+    return {clave} | {clave[:i] + clave[i + 1:] for i in range(len(clave))}
+
+
+def distancia(a, b):
+    """Distancia de edición con transposición de caracteres vecinos (Damerau restringida)."""
+    if abs(len(a) - len(b)) > MAX_DISTANCIA:
+        return MAX_DISTANCIA + 1
+    anterior2 = None
+    anterior = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                actual[j] = min(actual[j], anterior2[j - 2] + 1)
+        anterior2, anterior = anterior, actual
+    return anterior[len(b)]
+
+
+def _filas_variantes(vehiculos):
+    for vehiculo in vehiculos:
+        for variante in variantes(vehiculo.placa_normalizada):
+            yield VariantePlaca(vehiculo_id=vehiculo.pk, variante=variante)
+
+
+def indexar_placa(vehiculo):
+    """Reemplaza las variantes del vehículo (placa_normalizada ya completada)."""
+    with transaction.atomic():
+        VariantePlaca.objects.filter(vehiculo_id=vehiculo.pk).delete()
+        VariantePlaca.objects.bulk_create(_filas_variantes([vehiculo]))
+
+
+def indexar_placas_lote(vehiculos):
+    """placa_normalizada y variantes de vehículos recién creados en lote."""
+    for vehiculo in vehiculos:
+        vehiculo.placa_normalizada = normalizar_placa(vehiculo.placa)
+    with transaction.atomic():
+        Vehiculo.objects.bulk_update(vehiculos, ['placa_normalizada'], batch_size=TAMANO_LOTE)
+        VariantePlaca.objects.bulk_create(_filas_variantes(vehiculos), batch_size=TAMANO_LOTE)
+
+
+def reindexar_placas():
+    """Recalcula placa_normalizada y las variantes de todos los vehículos; devuelve cuántos."""
+    total = 0
+    with transaction.atomic():
+        VariantePlaca.objects.all().delete()
+        lote = []
+        for vehiculo in Vehiculo.objects.only('id', 'placa').order_by('id').iterator(chunk_size=TAMANO_LOTE):
+            lote.append(vehiculo)
+            if len(lote) == TAMANO_LOTE:
+                indexar_placas_lote(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            indexar_placas_lote(lote)
+    return total + len(lote)
+
+
+def buscar_por_placa(placa, limite=10):
+    """
+    Vehículos con la placa exacta (normalizada) o a distancia 1, en una
+    consulta que trae propietario, vivienda, tipo y parqueo activo. Devuelve
+    (clave, [(distancia, vehículo), ...]) con las coincidencias exactas primero.
+    """
+    clave = normalizar_placa(placa)
+    if clave is None:
+        raise ValueError("Placa inválida")
+    activa = AsignacionParqueo.objects.filter(vehiculo=OuterRef('pk'), activa=True)
+    candidatos = (
+        Vehiculo.objects
+        .filter(Q(placa_normalizada=clave) | Q(id__in=VariantePlaca.objects
+                                               .filter(variante__in=variantes(clave))
+                                               .values('vehiculo_id')))
+        .select_related('persona', 'vivienda', 'tipo')
+        .annotate(
+            asignacion_id=Subquery(activa.values('id')[:1]),
+            parqueo_id=Subquery(activa.values('parqueo_id')[:1]),
+            parqueo_codigo=Subquery(activa.values('parqueo__codigo')[:1]),
+        )
+    )
+    encontrados = []
+    for vehiculo in candidatos:
+        d = distancia(clave, vehiculo.placa_normalizada or normalizar_placa(vehiculo.placa) or '')
+        if d <= MAX_DISTANCIA:
+            encontrados.append((d, vehiculo))
+    encontrados.sort(key=lambda par: (par[0], par[1].placa_normalizada or '', par[1].id))
+    return clave, encontrados[:limite]
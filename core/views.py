@@ -1,26 +1,311 @@
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db import connection, transaction
+from django.core.exceptions import ValidationError
+import base64
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+import functools
 import json
 from .models import *
+from .archivo_visitas import visitas_entre
+from .busqueda import buscar
+from .cache import invalidar_disponibilidad, obtener_dashboard
+from .conciliacion import conciliar_pagos
+from .conexiones import estadisticas_pool
+from .estadisticas import mes_anterior, periodo_de, periodos_entre, resumen_meses
+from .estado_cuenta import asegurar_saldo
+from .facturacion import generar_expensas
+from .metricas import registro
+from .parqueos import (
+    ParqueoNoDisponible, asignar_parqueo, liberar_parqueo, ocupacion_parqueos, reactivar_parqueo,
+    reasignar_parqueo,
+)
+from .presencia import presencia
+from .reservas import ReservaSolapada, disponibilidad, dividir_en_slots, guardar_reserva
+from .signals import post_bulk_create
+from .vehiculos import buscar_por_placa, normalizar_placa
+from .visitas import registrar_ingreso
+from rest_framework.decorators import api_view, permission_classes
+from usuarios.permissions import IsAdminOrSuperAdmin
 
 # ------------------------------
 # FUNCIONES GENERALES PARA CRUD
 # ------------------------------
 
+@functools.lru_cache(maxsize=None)
+def plan_serializacion(model):
+    """
+    Pares (clave de salida, columna) de un modelo, calculados una vez desde _meta.
+    Para las ForeignKeys la columna es el attname (`vivienda_id`), así que leerla
+    no dispara una consulta al objeto relacionado.
+    """
+    return tuple((field.name, field.attname) for field in model._meta.concrete_fields)
+
 def model_to_dict(instance):
     """
-    Convierte un objeto de modelo a diccionario, manejando ForeignKeys.
+    Convierte un objeto de modelo a diccionario; las ForeignKeys se devuelven como id.
+    """
+    return {nombre: getattr(instance, columna) for nombre, columna in plan_serializacion(type(instance))}
+
+def valores_a_dict(model):
+    """Devuelve un serializador para filas de .values(*columnas) del modelo."""
+    plan = plan_serializacion(model)
+    return lambda fila: {nombre: fila[columna] for nombre, columna in plan}
+
+# ------------------------------
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ------------------------------
+
+LIMITE_PAGINA_DEFECTO = 50
+LIMITE_PAGINA_MAXIMO = 500
+LIMITE_BUSQUEDA_DEFECTO = 20
+LIMITE_BUSQUEDA_MAXIMO = 100
+
+def es_paginado(request):
+    """Indica si el cliente pidió paginación (?limit= o ?cursor=)."""
+    return 'limit' in request.GET or 'cursor' in request.GET
+
+def codificar_cursor(orden, valores):
+    """Codifica el orden y los valores de la última fila en un cursor opaco."""
+    valores = [v.isoformat() if hasattr(v, 'isoformat') else v for v in valores]
+    payload = json.dumps({'o': orden, 'v': valores}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decodificar_cursor(cursor, orden):
+    """Decodifica un cursor opaco; lanza ValueError si no corresponde al orden pedido."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode())
+        valores = payload['v']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor inválido")
+    if payload.get('o') != orden:
+        raise ValueError("El cursor no corresponde al orden solicitado")
+    return valores
+
+def paginar_keyset(request, queryset, ordenes, orden_defecto):
+    """
+    Pagina un queryset por (clave de orden, clave primaria) usando los parámetros
+    ?limit=, ?cursor= y ?orden=. Cada página es una sola consulta que
+    arranca desde la última fila vista, sin OFFSET. Si la clave admite NULL,
+    esas filas van al final en ambos sentidos.
+
+    Devuelve (filas, siguiente_cursor). Lanza ValueError ante parámetros inválidos.
+    """
+    orden = request.GET.get('orden', orden_defecto)
+    if orden not in ordenes:
+        raise ValueError(f"Orden no permitido: {orden}. Opciones: {', '.join(ordenes)}")
+    try:
+        limite = int(request.GET.get('limit', LIMITE_PAGINA_DEFECTO))
+    except ValueError:
+        raise ValueError("Parámetro limit inválido")
+    limite = max(1, min(limite, LIMITE_PAGINA_MAXIMO))
+
+    descendente = orden.startswith('-')
+    campo = orden.lstrip('-')
+    pk = queryset.model._meta.pk.attname
+    claves = [campo] if campo == pk else [campo, pk]
+    signo = '-' if descendente else ''
+    # Un campo que admite NULL deja esas filas al final en ambos sentidos
+    nulos = campo != pk and queryset.model._meta.get_field(campo).null
+    if nulos:
+        expresion = F(campo).desc(nulls_last=True) if descendente else F(campo).asc(nulls_last=True)
+        queryset = queryset.order_by(expresion, signo + pk)
+    else:
+        queryset = queryset.order_by(*[signo + clave for clave in claves])
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        valores = decodificar_cursor(cursor, orden)
+        if len(valores) != len(claves):
+            raise ValueError("Cursor inválido")
+        op = 'lt' if descendente else 'gt'
+        if campo == pk:
+            queryset = queryset.filter(**{f'{pk}__{op}': valores[0]})
+        elif nulos and valores[0] is None:
+            # Ya en la cola de NULL: solo quedan las de clave siguiente
+            queryset = queryset.filter(**{f'{campo}__isnull': True, f'{pk}__{op}': valores[1]})
+        elif nulos:
+            queryset = queryset.filter(
+                Q(**{f'{campo}__{op}': valores[0]}) | Q(**{campo: valores[0], f'{pk}__{op}': valores[1]})
+                | Q(**{f'{campo}__isnull': True})
+            )
+        else:
+            # (campo, pk) > (v, pk_v), con la cota sobre el campo para usar el índice
+            queryset = queryset.filter(
+                Q(**{f'{campo}__{op}e': valores[0]}),
+                Q(**{f'{campo}__{op}': valores[0]}) | Q(**{campo: valores[0], f'{pk}__{op}': valores[1]})
+            )
+
+    filas = list(queryset[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        siguiente = codificar_cursor(orden, [
+            ultima[clave] if isinstance(ultima, dict) else getattr(ultima, clave)
+            for clave in claves
+        ])
+    return filas, siguiente
+
+def listar_paginado(request, queryset, serializar, ordenes=('id', '-id'), orden_defecto='id', streaming=False):
+    """
+    Serializa un listado. Sin ?limit=/?cursor= devuelve la lista completa
+    (compatibilidad); con ellos devuelve {"results": [...], "next": cursor}.
+    Con streaming=True la lista completa se envía por partes (ver respuesta_streaming).
     """
-    data = {}
-    for field in instance._meta.fields:
-        value = getattr(instance, field.name)
-        # si es FK, devuelve el id
-        if field.is_relation and value is not None:
-            value = value.id
-        data[field.name] = value
-    return data
+    if not es_paginado(request):
+        if streaming:
+            return respuesta_streaming(queryset, serializar)
+        return JsonResponse([serializar(obj) for obj in queryset], safe=False)
+    try:
+        filas, siguiente = paginar_keyset(request, queryset, ordenes, orden_defecto)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({
+        'results': [serializar(obj) for obj in filas],
+        'next': siguiente
+    })
+
+def buscar_en_orden(request, modelo, queryset, clave='pk'):
+    """
+    Filas de queryset cuyo `clave` coincide con ?q= en core.busqueda, en orden
+    de relevancia y con ?limit= (por defecto LIMITE_BUSQUEDA_DEFECTO). Dos
+    consultas: los ids por el índice de términos y las filas por id.
+    Lanza ValueError ante parámetros inválidos.
+    """
+    try:
+        limite = int(request.GET.get('limit', LIMITE_BUSQUEDA_DEFECTO))
+    except ValueError:
+        raise ValueError("Parámetro limit inválido")
+    limite = max(1, min(limite, LIMITE_BUSQUEDA_MAXIMO))
+    ids = buscar(modelo, request.GET['q'], limite)
+    if not ids:
+        return []
+    rango = {objeto_id: i for i, objeto_id in enumerate(ids)}
+    filas = queryset.filter(**{f'{clave}__in': ids})
+    return sorted(filas, key=lambda fila: (rango[getattr(fila, clave)], fila.pk))
+
+# ------------------------------
+# CREACIÓN EN LOTE
+# ------------------------------
+
+MAX_FILAS_LOTE = 5000
+
+def crear_en_lote(model, filas):
+    """
+    Valida todas las filas antes de insertar y las crea con bulk_create en una
+    sola transacción. Si alguna fila es inválida no se inserta ninguna y se
+    devuelven los errores por índice. Responde 200, igual que la creación
+    de una sola fila.
+
+    Las ForeignKeys se validan con una consulta por modelo relacionado (no por fila).
+    """
+    if not filas:
+        return JsonResponse({"error": "El arreglo está vacío"}, status=400)
+    if len(filas) > MAX_FILAS_LOTE:
+        return JsonResponse({"error": f"Máximo {MAX_FILAS_LOTE} filas por petición"}, status=400)
+
+    fks = [f for f in model._meta.concrete_fields if f.is_relation]
+    objetos = []
+    errores = {}
+    for indice, fila in enumerate(filas):
+        if not isinstance(fila, dict):
+            errores[indice] = {'__all__': ['Se esperaba un objeto']}
+            objetos.append(None)
+            continue
+        try:
+            obj = model(**fila)
+            obj.clean_fields(exclude=[f.name for f in fks])
+        except ValidationError as e:
+            errores[indice] = e.message_dict
+            obj = None
+        except (TypeError, ValueError) as e:
+            errores[indice] = {'__all__': [str(e)]}
+            obj = None
+        objetos.append(obj)
+
+    # Existencia de las FKs: una consulta por campo relacionado. clean_fields no
+    # las convierte, así que "5" se pasa aquí al tipo de la clave referida.
+    for field in fks:
+        valores = {}
+        for indice, obj in enumerate(objetos):
+            if obj is None:
+                continue
+            valor = getattr(obj, field.attname)
+            if valor is None:
+                if not field.null:
+                    errores.setdefault(indice, {})[field.attname] = ['Este campo es obligatorio.']
+                continue
+            try:
+                valores[indice] = field.target_field.to_python(valor)
+            except ValidationError as e:
+                errores.setdefault(indice, {})[field.attname] = e.messages
+                continue
+            setattr(obj, field.attname, valores[indice])
+        existentes = set(field.related_model.objects.filter(
+            **{f'{field.target_field.attname}__in': set(valores.values())}
+        ).values_list(field.target_field.attname, flat=True))
+        for indice, valor in valores.items():
+            if valor not in existentes:
+                errores.setdefault(indice, {})[field.attname] = [f'No existe {field.related_model.__name__} con id {valor}.']
+
+    if errores:
+        return JsonResponse({
+            "error": f"{len(errores)} filas inválidas, no se creó ninguna",
+            "errores": [{'indice': i, 'errores': errores[i]} for i in sorted(errores)]
+        }, status=400)
+
+    try:
+        with transaction.atomic():
+            creados = model.objects.bulk_create(objetos, batch_size=1000)
+            post_bulk_create.send(sender=model, instances=creados)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    return JsonResponse({
+        'creados': len(creados),
+        'ids': [obj.pk for obj in creados]
+    })
+
+# ------------------------------
+# RESPUESTAS JSON EN STREAMING
+# ------------------------------
+
+TAMANO_CHUNK_STREAMING = 2000
+FILAS_POR_ESCRITURA = 500
+
+def respuesta_streaming(queryset, serializar, chunk_size=TAMANO_CHUNK_STREAMING):
+    """
+    Devuelve el queryset como un arreglo JSON escrito de forma incremental.
+
+    Las filas se leen con .iterator(chunk_size=...), que en PostgreSQL usa un
+    cursor del lado del servidor, y se envían en bloques de FILAS_POR_ESCRITURA.
+    La memoria por petición no depende del tamaño del resultado. Los bytes son
+    los mismos que daría JsonResponse con la lista completa.
+    """
+    encoder = DjangoJSONEncoder()
+
+    def generar():
+        yield '['
+        separador = ''
+        bloque = []
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            bloque.append(encoder.encode(serializar(obj)))
+            if len(bloque) >= FILAS_POR_ESCRITURA:
+                yield separador + ', '.join(bloque)
+                separador = ', '
+                bloque = []
+        if bloque:
+            yield separador + ', '.join(bloque)
+        yield ']'
+
+    return StreamingHttpResponse(generar(), content_type='application/json')
 
 # ------------------------------
 # ENDPOINTS ESPECÍFICOS
@@ -34,21 +319,28 @@ def listar_residentes(request):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     residentes = ResidenteVivienda.objects.select_related('persona', 'vivienda').all()
-    data = []
-    for res in residentes:
-        data.append({
-            'id': res.id,
-            'persona_id': res.persona.id,
-            'nombres': res.persona.nombres,
-            'apellidos': res.persona.apellidos,
-            'email': res.persona.email,
-            'telefono': res.persona.telefono,
-            'vivienda_id': res.vivienda.id,
-            'codigo_vivienda': res.vivienda.codigo,
-            'es_propietario': res.es_propietario,
-            'estado': res.estado
-        })
-    return JsonResponse(data, safe=False)
+    if 'q' in request.GET:
+        try:
+            filas = buscar_en_orden(request, Persona, residentes, clave='persona_id')
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse([serializar_residente(res) for res in filas], safe=False)
+    return listar_paginado(request, residentes, serializar_residente,
+                           ordenes=('id', '-id', 'inicio', '-inicio'), orden_defecto='id')
+
+def serializar_residente(res):
+    return {
+        'id': res.id,
+        'persona_id': res.persona.id,
+        'nombres': res.persona.nombres,
+        'apellidos': res.persona.apellidos,
+        'email': res.persona.email,
+        'telefono': res.persona.telefono,
+        'vivienda_id': res.vivienda.id,
+        'codigo_vivienda': res.vivienda.codigo,
+        'es_propietario': res.es_propietario,
+        'estado': res.estado
+    }
 
 @csrf_exempt
 def crear_residente(request):
@@ -212,6 +504,33 @@ def detalle_vivienda(request, pk):
     vivienda = get_object_or_404(Vivienda, pk=pk)
     return JsonResponse(model_to_dict(vivienda))
 
+@csrf_exempt
+def estado_cuenta_vivienda(request, pk):
+    """Saldo actual de una vivienda y sus movimientos (?limit=, ?cursor=, ?orden=fecha|-fecha)"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    campos = ('cargos', 'abonos', 'saldo', 'actualizado_en')
+    saldo = SaldoVivienda.objects.filter(vivienda_id=pk).values(*campos).first()
+    if saldo is None:
+        # Saldo todavía no calculado: se arma desde los movimientos, no se supone cero
+        get_object_or_404(Vivienda, pk=pk)
+        asegurar_saldo(pk)
+        saldo = SaldoVivienda.objects.filter(vivienda_id=pk).values(*campos).first()
+    movimientos = MovimientoCuenta.objects.filter(vivienda_id=pk).values(
+        'id', 'origen', 'origen_id', 'fecha', 'importe'
+    )
+    try:
+        filas, siguiente = paginar_keyset(request, movimientos, ('-fecha', 'fecha'), '-fecha')
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse({
+        'vivienda': pk,
+        **saldo,
+        'movimientos': filas,
+        'next': siguiente
+    })
+
 @csrf_exempt
 def modificar_vivienda(request, pk):
     """Modificar una vivienda"""
@@ -294,26 +613,34 @@ def eliminar_parqueo(request, pk):
 # VISITANTES
 @csrf_exempt
 def listar_visitantes(request):
-    """Listar todos los visitantes con información de visitas"""
+    """Listar visitantes con su última visita; ?q= busca por nombres, apellidos o documento"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
-    visitantes = Visitante.objects.all().order_by('-id')
-    data = []
-    for visitante in visitantes:
-        # Obtener la última visita
-        ultima_visita = Visita.objects.filter(visitante=visitante).order_by('-entrada').first()
-        
-        data.append({
-            'id': visitante.id,
-            'nombres': visitante.nombres,
-            'apellidos': visitante.apellidos,
-            'num_doc': visitante.num_doc,
-            'foto_url': visitante.foto_url,
-            'ultima_visita': ultima_visita.entrada.isoformat() if ultima_visita else None,
-            'estado_visita': 'En el condominio' if ultima_visita and not ultima_visita.salida else 'Fuera'
-        })
-    return JsonResponse(data, safe=False)
+    ultima_visita = VisitaHistorica.objects.filter(visitante=OuterRef('pk')).order_by('-entrada', '-id')
+    visitantes = Visitante.objects.annotate(
+        ultima_entrada=Subquery(ultima_visita.values('entrada')[:1]),
+        ultima_salida=Subquery(ultima_visita.values('salida')[:1]),
+    )
+    if 'q' in request.GET:
+        try:
+            filas = buscar_en_orden(request, Visitante, visitantes)
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        return JsonResponse([serializar_visitante(v) for v in filas], safe=False)
+    return listar_paginado(request, visitantes, serializar_visitante,
+                           ordenes=('-id', 'id'), orden_defecto='-id')
+
+def serializar_visitante(visitante):
+    return {
+        'id': visitante.id,
+        'nombres': visitante.nombres,
+        'apellidos': visitante.apellidos,
+        'num_doc': visitante.num_doc,
+        'foto_url': visitante.foto_url,
+        'ultima_visita': visitante.ultima_entrada.isoformat() if visitante.ultima_entrada else None,
+        'estado_visita': 'En el condominio' if visitante.ultima_entrada and not visitante.ultima_salida else 'Fuera'
+    }
 
 @csrf_exempt
 def crear_visitante(request):
@@ -333,7 +660,8 @@ def crear_visitante(request):
             nombres=data['nombres'],
             apellidos=data.get('apellidos', ''),
             num_doc=data.get('num_doc', ''),
-            foto_url=data.get('foto_url', '')
+            foto_url=data.get('foto_url', ''),
+            placa=normalizar_placa(data.get('placa'))
         )
         
         return JsonResponse({
@@ -342,6 +670,7 @@ def crear_visitante(request):
             'apellidos': visitante.apellidos,
             'num_doc': visitante.num_doc,
             'foto_url': visitante.foto_url,
+            'placa': visitante.placa,
             'ultima_visita': None,
             'estado_visita': 'Fuera'
         }, status=201)
@@ -435,20 +764,65 @@ def registrar_entrada(request):
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+@csrf_exempt
+def ingreso_visita(request):
+    """Ingreso en portería: resuelve (o crea) el visitante por documento o placa y registra la visita"""
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+
+        if 'codigo_vivienda' not in data:
+            return JsonResponse({"error": "Campo requerido: codigo_vivienda"}, status=400)
+
+        ingreso = registrar_ingreso(
+            data['codigo_vivienda'],
+            num_doc=data.get('num_doc'),
+            placa=data.get('placa'),
+            nombres=data.get('nombres'),
+            apellidos=data.get('apellidos'),
+            medio=data.get('medio'),
+        )
+
+        return JsonResponse({
+            'id': ingreso['id'],
+            'visitante_id': ingreso['visitante_id'],
+            'visitante_nombre': f"{ingreso['nombres']} {ingreso['apellidos']}",
+            'visitante_creado': ingreso['visitante_creado'],
+            'vivienda_destino_id': ingreso['vivienda_destino_id'],
+            'codigo_vivienda': ingreso['codigo_vivienda'],
+            'entrada': ingreso['entrada'].isoformat(),
+            'salida': None,
+            'medio': ingreso['medio']
+        }, status=201)
+
+    except (Vivienda.DoesNotExist, Visitante.DoesNotExist) as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
 @csrf_exempt
 def registrar_salida(request, pk):
     """Registrar salida de un visitante"""
     if request.method != "POST":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
+    visita = Visita.objects.filter(id=pk).first()
+    if visita is None:
+        # Las visitas archivadas siempre están cerradas (ver core.archivo_visitas)
+        get_object_or_404(VisitaArchivada, id=pk)
+        return JsonResponse({"error": "El visitante ya registró su salida"}, status=400)
+    if visita.salida:
+        return JsonResponse({"error": "El visitante ya registró su salida"}, status=400)
+
     try:
-        visita = get_object_or_404(Visita, id=pk)
-        
-        if visita.salida:
-            return JsonResponse({"error": "El visitante ya registró su salida"}, status=400)
-        
         visita.salida = timezone.now()
-        visita.save()
+        visita.save(update_fields=['salida'])
         
         return JsonResponse({
             'id': visita.id,
@@ -466,25 +840,49 @@ def registrar_salida(request, pk):
 
 @csrf_exempt
 def listar_visitas(request):
-    """Listar todas las visitas con información detallada"""
+    """Listar todas las visitas con información detallada, también las archivadas"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
-    visitas = Visita.objects.select_related('visitante', 'vivienda_destino').all().order_by('-entrada')
-    data = []
+    visitas = VisitaHistorica.objects.select_related('visitante', 'vivienda_destino').all().order_by('-entrada')
+    return listar_paginado(request, visitas, serializar_visita,
+                           ordenes=('-entrada', 'entrada', 'id', '-id'), orden_defecto='-entrada',
+                           streaming=True)
+
+@csrf_exempt
+def visitas_presentes(request):
+    """
+    Visitas en curso (sin salida), opcionalmente de una vivienda, desde el índice de presencia.
+
+    El índice es de cada proceso: una entrada o salida registrada en otro
+    worker de gunicorn puede tardar hasta PRESENCIA_TTL (60 s) en verse aquí.
+    """
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    vivienda_id = request.GET.get('vivienda_id')
+    try:
+        vivienda_id = int(vivienda_id) if vivienda_id else None
+    except ValueError:
+        return JsonResponse({"error": "Parámetro vivienda_id inválido"}, status=400)
+
+    visitas = presencia.presentes(vivienda_id)
     for visita in visitas:
-        data.append({
-            'id': visita.id,
-            'visitante_id': visita.visitante.id,
-            'visitante_nombre': f"{visita.visitante.nombres} {visita.visitante.apellidos}",
-            'vivienda_destino_id': visita.vivienda_destino.id,
-            'codigo_vivienda': visita.vivienda_destino.codigo,
-            'entrada': visita.entrada.isoformat(),
-            'salida': visita.salida.isoformat() if visita.salida else None,
-            'medio': visita.medio,
-            'estado': 'En el condominio' if not visita.salida else 'Salido'
-        })
-    return JsonResponse(data, safe=False)
+        visita['entrada'] = visita['entrada'].isoformat()
+    return JsonResponse({'total': len(visitas), 'visitas': visitas})
+
+def serializar_visita(visita):
+    return {
+        'id': visita.id,
+        'visitante_id': visita.visitante.id,
+        'visitante_nombre': f"{visita.visitante.nombres} {visita.visitante.apellidos}",
+        'vivienda_destino_id': visita.vivienda_destino.id,
+        'codigo_vivienda': visita.vivienda_destino.codigo,
+        'entrada': visita.entrada.isoformat(),
+        'salida': visita.salida.isoformat() if visita.salida else None,
+        'medio': visita.medio,
+        'estado': 'En el condominio' if not visita.salida else 'Salido'
+    }
 
 # RESERVAS
 @csrf_exempt
@@ -520,8 +918,10 @@ def crear_reserva(request):
     
     data = json.loads(request.body)
     try:
-        reserva = Reserva.objects.create(**data)
+        reserva = guardar_reserva(Reserva(**data))
         return JsonResponse(model_to_dict(reserva))
+    except ReservaSolapada as e:
+        return JsonResponse({"error": str(e), "conflicto": e.conflicto.id}, status=409)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
@@ -541,10 +941,18 @@ def modificar_reserva(request, pk):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     reserva = get_object_or_404(Reserva, pk=pk)
+    area_anterior = reserva.area_id
     data = json.loads(request.body)
     for key, value in data.items():
         setattr(reserva, key, value)
-    reserva.save()
+    try:
+        guardar_reserva(reserva)
+    except ReservaSolapada as e:
+        return JsonResponse({"error": str(e), "conflicto": e.conflicto.id}, status=409)
+    except (ValueError, ValidationError) as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    if str(reserva.area_id) != str(area_anterior):
+        invalidar_disponibilidad(area_anterior)
     return JsonResponse(model_to_dict(reserva))
 
 @csrf_exempt
@@ -590,6 +998,42 @@ def detalle_area(request, pk):
     area = get_object_or_404(AreaComun, pk=pk)
     return JsonResponse(model_to_dict(area))
 
+MAX_DIAS_DISPONIBILIDAD = 62
+
+@csrf_exempt
+def disponibilidad_area(request, pk):
+    """Intervalos y turnos libres de un área (?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&slot=minutos)"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    area = get_object_or_404(AreaComun, pk=pk)
+    try:
+        desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else timezone.localdate()
+        hasta = date.fromisoformat(request.GET['hasta']) if request.GET.get('hasta') else desde
+        slot = int(request.GET.get('slot', 60))
+    except ValueError:
+        return JsonResponse({"error": "Parámetros inválidos: desde/hasta YYYY-MM-DD, slot en minutos"}, status=400)
+    if hasta < desde or (hasta - desde).days >= MAX_DIAS_DISPONIBILIDAD:
+        return JsonResponse({"error": f"El rango debe ser de 1 a {MAX_DIAS_DISPONIBILIDAD} días"}, status=400)
+    if not 5 <= slot <= 24 * 60:
+        return JsonResponse({"error": "slot debe estar entre 5 y 1440 minutos"}, status=400)
+
+    dias = []
+    for dia, libres in disponibilidad(area.id, desde, hasta):
+        dias.append({
+            'fecha': dia,
+            'libres': [{'inicio': inicio, 'fin': fin} for inicio, fin in libres],
+            'slots': [{'inicio': inicio, 'fin': fin} for inicio, fin in dividir_en_slots(dia, libres, slot)],
+        })
+    return JsonResponse({
+        'area': area.id,
+        'nombre': area.nombre,
+        'desde': desde,
+        'hasta': hasta,
+        'slot': slot,
+        'dias': dias
+    })
+
 @csrf_exempt
 def modificar_area(request, pk):
     """Modificar un área común"""
@@ -621,33 +1065,56 @@ def listar_expensas(request):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     expensas = Expensa.objects.select_related('vivienda').all()
-    data = []
-    for e in expensas:
-        data.append({
-            'id': e.id,
-            'codigo': e.codigo,
-            'vivienda_id': e.vivienda.id,
-            'codigo_vivienda': e.vivienda.codigo,
-            'periodo': e.periodo,
-            'monto': float(e.monto),
-            'vencimiento': e.vencimiento,
-            'estado': e.estado
-        })
-    return JsonResponse(data, safe=False)
+    return listar_paginado(request, expensas, serializar_expensa,
+                           ordenes=('id', '-id', 'periodo', '-periodo'), orden_defecto='id',
+                           streaming=True)
+
+def serializar_expensa(e):
+    return {
+        'id': e.id,
+        'codigo': e.codigo,
+        'vivienda_id': e.vivienda.id,
+        'codigo_vivienda': e.vivienda.codigo,
+        'periodo': e.periodo,
+        'monto': float(e.monto),
+        'vencimiento': e.vencimiento,
+        'estado': e.estado
+    }
 
 @csrf_exempt
 def crear_expensa(request):
-    """Crear una nueva expensa"""
+    """Crear una nueva expensa (o varias si se envía un arreglo)"""
     if request.method != "POST":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     data = json.loads(request.body)
+    if isinstance(data, list):
+        return crear_en_lote(Expensa, data)
     try:
-        expensa = Expensa.objects.create(**data)
+        # Una expensa repetida (vivienda, periodo) viola el índice único de la migración 0021
+        with transaction.atomic():
+            expensa = Expensa.objects.create(**data)
         return JsonResponse(model_to_dict(expensa))
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
+@csrf_exempt
+def generar_expensas_periodo(request):
+    """Generar las expensas de un periodo según ExpensaParametro (idempotente)"""
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    try:
+        data = json.loads(request.body or '{}')
+        periodo = data.get('periodo') or timezone.now().strftime('%Y-%m')
+        return JsonResponse(generar_expensas(periodo), status=201)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
 @csrf_exempt
 def detalle_expensa(request, pk):
     """Obtener detalles de una expensa"""
@@ -688,35 +1155,64 @@ def listar_pagos(request):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     pagos = Pago.objects.select_related('vivienda', 'persona').all()
-    data = []
-    for p in pagos:
-        data.append({
-            'id': p.id,
-            'vivienda_id': p.vivienda.id,
-            'codigo_vivienda': p.vivienda.codigo,
-            'persona_id': p.persona.id,
-            'persona_nombre': f"{p.persona.nombres} {p.persona.apellidos}",
-            'concepto': p.concepto,
-            'monto': float(p.monto),
-            'fecha': p.fecha,
-            'metodo': p.metodo,
-            'estado': p.estado
-        })
-    return JsonResponse(data, safe=False)
+    return listar_paginado(request, pagos, serializar_pago,
+                           ordenes=('id', '-id'), orden_defecto='id', streaming=True)
+
+def serializar_pago(p):
+    return {
+        'id': p.id,
+        'vivienda_id': p.vivienda.id,
+        'codigo_vivienda': p.vivienda.codigo,
+        'persona_id': p.persona.id,
+        'persona_nombre': f"{p.persona.nombres} {p.persona.apellidos}",
+        'concepto': p.concepto,
+        'monto': float(p.monto),
+        'fecha': p.fecha,
+        'metodo': p.metodo,
+        'estado': p.estado
+    }
 
 @csrf_exempt
 def crear_pago(request):
-    """Crear un nuevo pago"""
+    """Crear un nuevo pago (o varios si se envía un arreglo)"""
     if request.method != "POST":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     data = json.loads(request.body)
+    if isinstance(data, list):
+        return crear_en_lote(Pago, data)
     try:
         pago = Pago.objects.create(**data)
         return JsonResponse(model_to_dict(pago))
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=400)
 
+@csrf_exempt
+def conciliar(request):
+    """Conciliar pagos con expensas y multas (incremental; {"completo": true} rehace todo)"""
+    if request.method != "POST":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    try:
+        data = json.loads(request.body or '{}')
+        return JsonResponse(conciliar_pagos(incremental=not data.get('completo')))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+@csrf_exempt
+def aplicaciones_pago(request, pk):
+    """Expensas y multas a las que se aplicó un pago"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    pago = get_object_or_404(Pago, pk=pk)
+    aplicaciones = list(pago.aplicaciones.order_by('id').values(
+        'id', 'expensa_id', 'multa_id', 'monto', 'por_referencia', 'creado_en'
+    ))
+    return JsonResponse({'pago': pago.id, 'monto': pago.monto, 'aplicaciones': aplicaciones})
+
 @csrf_exempt
 def detalle_pago(request, pk):
     """Obtener detalles de un pago"""
@@ -826,21 +1322,25 @@ def listar_comunicados(request):
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
-    comunicados = Comunicado.objects.all().order_by('-fecha_publicacion')
-    data = []
-    for com in comunicados:
-        # Contar lecturas
-        total_lecturas = LecturaComunicado.objects.filter(comunicado=com).count()
-        
-        data.append({
-            'id': com.id,
-            'titulo': com.titulo,
-            'cuerpo': com.cuerpo,
-            'fecha_publicacion': com.fecha_publicacion.isoformat() if com.fecha_publicacion else None,
-            'publico': com.publico,
-            'total_lecturas': total_lecturas
-        })
-    return JsonResponse(data, safe=False)
+    # Las lecturas se cuentan en la misma consulta (LEFT JOIN + GROUP BY). Con
+    # y sin paginación el orden es el de siempre, los más recientes primero,
+    # con los comunicados sin fecha al final y el id como desempate.
+    comunicados = Comunicado.objects.annotate(
+        total_lecturas=Count('lecturacomunicado')
+    ).order_by(F('fecha_publicacion').desc(nulls_last=True), '-id')
+    return listar_paginado(request, comunicados, serializar_comunicado,
+                           ordenes=('-fecha_publicacion', 'fecha_publicacion', '-id', 'id'),
+                           orden_defecto='-fecha_publicacion')
+
+def serializar_comunicado(com):
+    return {
+        'id': com.id,
+        'titulo': com.titulo,
+        'cuerpo': com.cuerpo,
+        'fecha_publicacion': com.fecha_publicacion.isoformat() if com.fecha_publicacion else None,
+        'publico': com.publico,
+        'total_lecturas': com.total_lecturas
+    }
 
 @csrf_exempt
 def crear_comunicado(request):
@@ -883,10 +1383,16 @@ def detalle_comunicado(request, pk):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
-        comunicado = get_object_or_404(Comunicado, pk=pk)
+        comunicado = get_object_or_404(
+            Comunicado.objects.annotate(total_lecturas=Count('lecturacomunicado')), pk=pk
+        )
         
-        # Obtener lecturas
-        lecturas = LecturaComunicado.objects.filter(comunicado=comunicado).select_related('persona')
+        # Obtener una página de lecturas (?limit=, ?cursor=, ?orden=)
+        lecturas = LecturaComunicado.objects.filter(comunicado_id=comunicado.id).select_related('persona')
+        try:
+            lecturas, siguiente = paginar_keyset(request, lecturas, ('-id', 'id'), '-id')
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
         lecturas_data = []
         for lectura in lecturas:
             lecturas_data.append({
@@ -901,8 +1407,9 @@ def detalle_comunicado(request, pk):
             'cuerpo': comunicado.cuerpo,
             'fecha_publicacion': comunicado.fecha_publicacion.isoformat() if comunicado.fecha_publicacion else None,
             'publico': comunicado.publico,
-            'total_lecturas': len(lecturas_data),
-            'lecturas': lecturas_data
+            'total_lecturas': comunicado.total_lecturas,
+            'lecturas': lecturas_data,
+            'lecturas_next': siguiente
         })
         
     except Exception as e:
@@ -972,26 +1479,42 @@ def marcar_comunicado_leido(request, pk):
         return JsonResponse({"error": str(e)}, status=500)
 
 # DASHBOARD
-@csrf_exempt
-def dashboard(request):
-    """Obtener datos del dashboard"""
-    if request.method != "GET":
-        return JsonResponse({"error": "Método no permitido"}, status=405)
-    
-    # Estadísticas básicas
-    total_residentes = ResidenteVivienda.objects.filter(estado=True).count()
-    total_viviendas = Vivienda.objects.filter(activo=True).count()
-    total_parqueos = Parqueo.objects.count()
-    parqueos_ocupados = Parqueo.objects.filter(ocupado=True).count()
-    total_expensas = Expensa.objects.count()
-    expensas_pendientes = Expensa.objects.filter(estado='PENDIENTE').count()
-    total_multas = Multa.objects.count()
-    multas_pendientes = Multa.objects.filter(estado='PENDIENTE').count()
-    total_vehiculos = Vehiculo.objects.count()
-    total_tipos_vehiculo = TipoVehiculo.objects.count()
-    total_mascotas = Mascota.objects.count()
-    
-    return JsonResponse({
+SQL_DASHBOARD = """
+    SELECT
+        (SELECT COUNT(*) FROM residente_vivienda WHERE estado = %s),
+        (SELECT COUNT(*) FROM viviendas WHERE activo = %s),
+        p.total, p.ocupados,
+        e.total, e.pendientes,
+        m.total, m.pendientes,
+        (SELECT COUNT(*) FROM vehiculos),
+        (SELECT COUNT(*) FROM tipos_vehiculo),
+        (SELECT COUNT(*) FROM mascotas)
+    FROM
+        (SELECT COALESCE(SUM(total), 0) AS total,
+                COALESCE(SUM(ocupados), 0) AS ocupados
+         FROM ocupacion_parqueos) p
+    CROSS JOIN
+        (SELECT COUNT(*) AS total,
+                COALESCE(SUM(CASE WHEN estado = 'PENDIENTE' THEN 1 ELSE 0 END), 0) AS pendientes
+         FROM expensas) e
+    CROSS JOIN
+        (SELECT COUNT(*) AS total,
+                COALESCE(SUM(CASE WHEN estado = 'PENDIENTE' THEN 1 ELSE 0 END), 0) AS pendientes
+         FROM multas) m
+"""
+
+def calcular_dashboard():
+    """Calcula todos los contadores del dashboard en una sola consulta."""
+    with connection.cursor() as cursor:
+        cursor.execute(SQL_DASHBOARD, [True, True])
+        (total_residentes, total_viviendas,
+         total_parqueos, parqueos_ocupados,
+         total_expensas, expensas_pendientes,
+         total_multas, multas_pendientes,
+         total_vehiculos, total_tipos_vehiculo,
+         total_mascotas) = [int(v) for v in cursor.fetchone()]
+    
+    return {
         'residentes': {
             'total': total_residentes
         },
@@ -1018,7 +1541,15 @@ def dashboard(request):
         'mascotas': {
             'total': total_mascotas
         }
-    })
+    }
+
+@csrf_exempt
+def dashboard(request):
+    """Obtener datos del dashboard (instantánea en caché, ver core.cache)"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    return JsonResponse(obtener_dashboard(calcular_dashboard))
 
 # ------------------------------
 # GESTIÓN DE VEHÍCULOS
@@ -1031,21 +1562,45 @@ def listar_vehiculos(request):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     vehiculos = Vehiculo.objects.select_related('persona', 'vivienda', 'tipo').all()
-    data = []
-    for veh in vehiculos:
-        data.append({
-            'id': veh.id,
-            'persona_id': veh.persona.id,
-            'persona_nombre': f"{veh.persona.nombres} {veh.persona.apellidos}",
-            'vivienda_id': veh.vivienda.id,
-            'codigo_vivienda': veh.vivienda.codigo,
-            'tipo_id': veh.tipo.id,
-            'tipo_nombre': veh.tipo.nombre,
-            'placa': veh.placa,
-            'modelo': veh.modelo,
-            'color': veh.color
-        })
-    return JsonResponse(data, safe=False)
+    return listar_paginado(request, vehiculos, serializar_vehiculo,
+                           ordenes=('id', '-id', 'placa', '-placa'), orden_defecto='id')
+
+@csrf_exempt
+def buscar_vehiculos(request):
+    """Buscar vehículos por placa (normalizada; tolera un error de tipeo) con propietario, vivienda y parqueo activo"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+
+    try:
+        clave, encontrados = buscar_por_placa(request.GET.get('placa'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    resultados = []
+    for d, veh in encontrados:
+        fila = serializar_vehiculo(veh)
+        fila['distancia'] = d
+        fila['parqueo'] = {
+            'asignacion_id': veh.asignacion_id,
+            'parqueo_id': veh.parqueo_id,
+            'codigo': veh.parqueo_codigo,
+        } if veh.asignacion_id else None
+        resultados.append(fila)
+    return JsonResponse({'placa': clave, 'resultados': resultados})
+
+def serializar_vehiculo(veh):
+    return {
+        'id': veh.id,
+        'persona_id': veh.persona.id,
+        'persona_nombre': f"{veh.persona.nombres} {veh.persona.apellidos}",
+        'vivienda_id': veh.vivienda.id,
+        'codigo_vivienda': veh.vivienda.codigo,
+        'tipo_id': veh.tipo.id,
+        'tipo_nombre': veh.tipo.nombre,
+        'placa': veh.placa,
+        'modelo': veh.modelo,
+        'color': veh.color
+    }
 
 @csrf_exempt
 def crear_vehiculo(request):
@@ -1465,83 +2020,52 @@ def listar_asignaciones_parqueo(request):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     asignaciones = AsignacionParqueo.objects.select_related('vehiculo', 'parqueo', 'vehiculo__persona', 'vehiculo__vivienda').all().order_by('-fecha_asignacion')
-    data = []
-    for asignacion in asignaciones:
-        data.append({
-            'id': asignacion.id,
-            'vehiculo_id': asignacion.vehiculo.id,
-            'vehiculo_placa': asignacion.vehiculo.placa,
-            'vehiculo_modelo': asignacion.vehiculo.modelo,
-            'vehiculo_color': asignacion.vehiculo.color,
-            'propietario_nombre': f"{asignacion.vehiculo.persona.nombres} {asignacion.vehiculo.persona.apellidos}",
-            'vivienda_codigo': asignacion.vehiculo.vivienda.codigo,
-            'parqueo_id': asignacion.parqueo.id,
-            'parqueo_numero': asignacion.parqueo.numero,
-            'parqueo_piso': asignacion.parqueo.piso,
-            'fecha_asignacion': asignacion.fecha_asignacion.isoformat() if asignacion.fecha_asignacion else None,
-            'activa': asignacion.activa
-        })
-    return JsonResponse(data, safe=False)
+    return listar_paginado(request, asignaciones, serializar_asignacion_parqueo,
+                           ordenes=('-fecha_asignacion', 'fecha_asignacion', 'id', '-id'),
+                           orden_defecto='-fecha_asignacion')
+
+def serializar_asignacion_parqueo(asignacion):
+    return {
+        'id': asignacion.id,
+        'vehiculo_id': asignacion.vehiculo.id,
+        'vehiculo_placa': asignacion.vehiculo.placa,
+        'vehiculo_modelo': asignacion.vehiculo.modelo,
+        'vehiculo_color': asignacion.vehiculo.color,
+        'propietario_nombre': f"{asignacion.vehiculo.persona.nombres} {asignacion.vehiculo.persona.apellidos}",
+        'vivienda_codigo': asignacion.vehiculo.vivienda.codigo,
+        'parqueo_id': asignacion.parqueo.id,
+        'parqueo_codigo': asignacion.parqueo.codigo,
+        'fecha_asignacion': asignacion.fecha_asignacion.isoformat() if asignacion.fecha_asignacion else None,
+        'activa': asignacion.activa
+    }
+
+def asignacion_detallada(pk):
+    return get_object_or_404(
+        AsignacionParqueo.objects.select_related('vehiculo', 'parqueo', 'vehiculo__persona', 'vehiculo__vivienda'),
+        id=pk
+    )
 
 @csrf_exempt
 def crear_asignacion_parqueo(request):
-    """Crear una nueva asignación de parqueo"""
+    """Asignar un parqueo a un vehículo: el indicado en parqueo_id o, sin él, el primero libre"""
     if request.method != "POST":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
         data = json.loads(request.body)
         
-        # Validar campos requeridos
-        required_fields = ['vehiculo_id', 'parqueo_id']
-        for field in required_fields:
-            if field not in data:
-                return JsonResponse({"error": f"Campo requerido: {field}"}, status=400)
-        
-        # Verificar que el vehículo existe
-        vehiculo = get_object_or_404(Vehiculo, id=data['vehiculo_id'])
-        
-        # Verificar que el parqueo existe
-        parqueo = get_object_or_404(Parqueo, id=data['parqueo_id'])
-        
-        # Verificar que el parqueo no esté ocupado
-        if parqueo.ocupado:
-            return JsonResponse({"error": "El parqueo ya está ocupado"}, status=400)
+        if 'vehiculo_id' not in data:
+            return JsonResponse({"error": "Campo requerido: vehiculo_id"}, status=400)
         
-        # Verificar que el vehículo no tenga ya un parqueo asignado
-        asignacion_existente = AsignacionParqueo.objects.filter(vehiculo=vehiculo, activa=True).first()
-        if asignacion_existente:
-            return JsonResponse({"error": "El vehículo ya tiene un parqueo asignado"}, status=400)
-        
-        # Crear la asignación
-        asignacion = AsignacionParqueo.objects.create(
-            vehiculo=vehiculo,
-            parqueo=parqueo,
-            fecha_asignacion=timezone.now(),
-            activa=True
-        )
-        
-        # Marcar el parqueo como ocupado
-        parqueo.ocupado = True
-        parqueo.save()
-        
-        return JsonResponse({
-            'id': asignacion.id,
-            'vehiculo_id': asignacion.vehiculo.id,
-            'vehiculo_placa': asignacion.vehiculo.placa,
-            'vehiculo_modelo': asignacion.vehiculo.modelo,
-            'vehiculo_color': asignacion.vehiculo.color,
-            'propietario_nombre': f"{asignacion.vehiculo.persona.nombres} {asignacion.vehiculo.persona.apellidos}",
-            'vivienda_codigo': asignacion.vehiculo.vivienda.codigo,
-            'parqueo_id': asignacion.parqueo.id,
-            'parqueo_numero': asignacion.parqueo.numero,
-            'parqueo_piso': asignacion.parqueo.piso,
-            'fecha_asignacion': asignacion.fecha_asignacion.isoformat(),
-            'activa': asignacion.activa
-        }, status=201)
+        asignacion = asignar_parqueo(data['vehiculo_id'], data.get('parqueo_id'))
+        return JsonResponse(serializar_asignacion_parqueo(asignacion_detallada(asignacion.id)), status=201)
         
     except json.JSONDecodeError:
         return JsonResponse({"error": "JSON inválido"}, status=400)
+    except (Vehiculo.DoesNotExist, Parqueo.DoesNotExist) as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    except ParqueoNoDisponible as e:
+        return JsonResponse({"error": str(e)}, status=409)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -1551,83 +2075,36 @@ def detalle_asignacion_parqueo(request, pk):
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
-    try:
-        asignacion = get_object_or_404(AsignacionParqueo.objects.select_related('vehiculo', 'parqueo', 'vehiculo__persona', 'vehiculo__vivienda'), id=pk)
-        
-        return JsonResponse({
-            'id': asignacion.id,
-            'vehiculo_id': asignacion.vehiculo.id,
-            'vehiculo_placa': asignacion.vehiculo.placa,
-            'vehiculo_modelo': asignacion.vehiculo.modelo,
-            'vehiculo_color': asignacion.vehiculo.color,
-            'propietario_nombre': f"{asignacion.vehiculo.persona.nombres} {asignacion.vehiculo.persona.apellidos}",
-            'vivienda_codigo': asignacion.vehiculo.vivienda.codigo,
-            'parqueo_id': asignacion.parqueo.id,
-            'parqueo_numero': asignacion.parqueo.numero,
-            'parqueo_piso': asignacion.parqueo.piso,
-            'fecha_asignacion': asignacion.fecha_asignacion.isoformat() if asignacion.fecha_asignacion else None,
-            'activa': asignacion.activa
-        })
-        
-    except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
+    return JsonResponse(serializar_asignacion_parqueo(asignacion_detallada(pk)))
 
 @csrf_exempt
 def modificar_asignacion_parqueo(request, pk):
-    """Modificar una asignación existente"""
+    """Modificar una asignación existente (cambiar de parqueo, activar o desactivar)"""
     if request.method not in ["PUT", "PATCH"]:
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
-        asignacion = get_object_or_404(AsignacionParqueo, id=pk)
+        get_object_or_404(AsignacionParqueo, id=pk)
         data = json.loads(request.body)
         
-        # Si se cambia el parqueo
-        if 'parqueo_id' in data:
-            nuevo_parqueo = get_object_or_404(Parqueo, id=data['parqueo_id'])
-            
-            # Liberar el parqueo actual
-            parqueo_actual = asignacion.parqueo
-            parqueo_actual.ocupado = False
-            parqueo_actual.save()
-            
-            # Verificar que el nuevo parqueo esté disponible
-            if nuevo_parqueo.ocupado:
-                return JsonResponse({"error": "El nuevo parqueo ya está ocupado"}, status=400)
-            
-            # Asignar el nuevo parqueo
-            asignacion.parqueo = nuevo_parqueo
-            nuevo_parqueo.ocupado = True
-            nuevo_parqueo.save()
-        
-        # Actualizar estado activo
-        if 'activa' in data:
-            asignacion.activa = data['activa']
-            
-            # Si se desactiva, liberar el parqueo
-            if not data['activa']:
-                asignacion.parqueo.ocupado = False
-                asignacion.parqueo.save()
+        if 'activa' in data and not data['activa']:
+            liberar_parqueo(pk)
+        else:
+            if data.get('activa'):
+                reactivar_parqueo(pk)
+            if 'parqueo_id' in data:
+                reasignar_parqueo(pk, data['parqueo_id'])
         
-        asignacion.save()
-        
-        return JsonResponse({
-            'id': asignacion.id,
-            'vehiculo_id': asignacion.vehiculo.id,
-            'vehiculo_placa': asignacion.vehiculo.placa,
-            'vehiculo_modelo': asignacion.vehiculo.modelo,
-            'vehiculo_color': asignacion.vehiculo.color,
-            'propietario_nombre': f"{asignacion.vehiculo.persona.nombres} {asignacion.vehiculo.persona.apellidos}",
-            'vivienda_codigo': asignacion.vehiculo.vivienda.codigo,
-            'parqueo_id': asignacion.parqueo.id,
-            'parqueo_numero': asignacion.parqueo.numero,
-            'parqueo_piso': asignacion.parqueo.piso,
-            'fecha_asignacion': asignacion.fecha_asignacion.isoformat() if asignacion.fecha_asignacion else None,
-            'activa': asignacion.activa
-        })
+        return JsonResponse(serializar_asignacion_parqueo(asignacion_detallada(pk)))
         
     except json.JSONDecodeError:
         return JsonResponse({"error": "JSON inválido"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Parqueo.DoesNotExist as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    except ParqueoNoDisponible as e:
+        return JsonResponse({"error": str(e)}, status=409)
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
@@ -1638,16 +2115,8 @@ def eliminar_asignacion_parqueo(request, pk):
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
-        asignacion = get_object_or_404(AsignacionParqueo, id=pk)
-        
-        # Liberar el parqueo
-        parqueo = asignacion.parqueo
-        parqueo.ocupado = False
-        parqueo.save()
-        
-        # Eliminar la asignación
-        asignacion.delete()
-        
+        get_object_or_404(AsignacionParqueo, id=pk)
+        liberar_parqueo(pk, eliminar=True)
         return JsonResponse({"message": "Asignación eliminada correctamente"})
         
     except Exception as e:
@@ -1659,16 +2128,8 @@ def parqueos_disponibles(request):
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
-    parqueos = Parqueo.objects.filter(ocupado=False).order_by('piso', 'numero')
-    data = []
-    for parqueo in parqueos:
-        data.append({
-            'id': parqueo.id,
-            'numero': parqueo.numero,
-            'piso': parqueo.piso,
-            'tipo': parqueo.tipo
-        })
-    return JsonResponse(data, safe=False)
+    parqueos = Parqueo.objects.filter(ocupado=False).order_by('id').values('id', 'codigo')
+    return JsonResponse(list(parqueos), safe=False)
 
 # ------------------------------
 # REPORTES Y ANÁLISIS
@@ -1684,8 +2145,9 @@ def reporte_resumen_general(request):
         # Estadísticas generales
         total_residentes = Persona.objects.count()
         total_viviendas = Vivienda.objects.count()
-        total_parqueos = Parqueo.objects.count()
-        parqueos_ocupados = Parqueo.objects.filter(ocupado=True).count()
+        ocupacion = ocupacion_parqueos()
+        total_parqueos = ocupacion['total']
+        parqueos_ocupados = ocupacion['ocupados']
         total_vehiculos = Vehiculo.objects.count()
         total_mascotas = Mascota.objects.count()
         total_visitantes = Visitante.objects.count()
@@ -1703,7 +2165,7 @@ def reporte_resumen_general(request):
         # Visitas del mes actual
         from datetime import datetime, timedelta
         inicio_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        visitas_mes = Visita.objects.filter(entrada__gte=inicio_mes).count()
+        visitas_mes = visitas_entre(timezone.make_aware(inicio_mes)).count()
         
         return JsonResponse({
             'resumen_general': {
@@ -1739,7 +2201,7 @@ def reporte_resumen_general(request):
 
 @csrf_exempt
 def reporte_expensas(request):
-    """Reporte detallado de expensas"""
+    """Reporte detallado de expensas, agregado en SQL por vivienda y estado"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
@@ -1748,40 +2210,61 @@ def reporte_expensas(request):
         mes = request.GET.get('mes')
         año = request.GET.get('año')
         estado = request.GET.get('estado')
+        vencimiento_desde = request.GET.get('vencimiento_desde')
+        vencimiento_hasta = request.GET.get('vencimiento_hasta')
         
-        # Filtrar expensas
+        # Filtrar expensas (periodo tiene formato 'YYYY-MM')
         expensas = Expensa.objects.all()
         
         if mes and año:
             try:
-                expensas = expensas.filter(fecha_vencimiento__year=int(año), fecha_vencimiento__month=int(mes))
+                expensas = expensas.filter(periodo=f"{int(año):04d}-{int(mes):02d}")
             except (ValueError, TypeError):
                 pass  # Si los valores no son válidos, no aplicar filtro
         elif año:
             try:
-                expensas = expensas.filter(fecha_vencimiento__year=int(año))
+                expensas = expensas.filter(periodo__startswith=f"{int(año):04d}-")
             except (ValueError, TypeError):
                 pass  # Si el año no es válido, no aplicar filtro
+        
+        try:
+            if vencimiento_desde:
+                expensas = expensas.filter(vencimiento__gte=date.fromisoformat(vencimiento_desde))
+            if vencimiento_hasta:
+                expensas = expensas.filter(vencimiento__lte=date.fromisoformat(vencimiento_hasta))
+        except ValueError:
+            return JsonResponse({"error": "Formato de fecha inválido, use YYYY-MM-DD"}, status=400)
             
         if estado:
             expensas = expensas.filter(estado=estado)
         
-        # Estadísticas
-        total_monto = sum(exp.monto for exp in expensas)
-        monto_pagado = sum(exp.monto for exp in expensas.filter(estado='PAGADA'))
-        monto_pendiente = sum(exp.monto for exp in expensas.filter(estado='PENDIENTE'))
+        # Una sola consulta agrupada: una fila por (vivienda, estado)
+        grupos = (
+            expensas
+            .values('vivienda__codigo', 'estado')
+            .annotate(monto=Sum('monto'), cantidad=Count('id'))
+            .order_by('vivienda__codigo')
+        )
         
-        # Por vivienda
+        total_monto = Decimal('0')
+        monto_pagado = Decimal('0')
+        monto_pendiente = Decimal('0')
         expensas_por_vivienda = {}
-        for exp in expensas:
-            codigo = exp.vivienda.codigo
+        for grupo in grupos:
+            codigo = grupo['vivienda__codigo']
+            monto = grupo['monto'] or Decimal('0')
             if codigo not in expensas_por_vivienda:
-                expensas_por_vivienda[codigo] = {'total': 0, 'pagado': 0, 'pendiente': 0}
-            expensas_por_vivienda[codigo]['total'] += exp.monto
-            if exp.estado == 'PAGADA':
-                expensas_por_vivienda[codigo]['pagado'] += exp.monto
-            else:
-                expensas_por_vivienda[codigo]['pendiente'] += exp.monto
+                expensas_por_vivienda[codigo] = {'total': Decimal('0'), 'pagado': Decimal('0'), 'pendiente': Decimal('0'), 'cantidad': 0}
+            expensas_por_vivienda[codigo]['total'] += monto
+            expensas_por_vivienda[codigo]['cantidad'] += grupo['cantidad']
+            # Pendiente es solo el estado PENDIENTE, igual en el resumen y por vivienda
+            if grupo['estado'] == 'PAGADA':
+                expensas_por_vivienda[codigo]['pagado'] += monto
+                monto_pagado += monto
+            elif grupo['estado'] == 'PENDIENTE':
+                expensas_por_vivienda[codigo]['pendiente'] += monto
+                monto_pendiente += monto
+            total_monto += monto
         
         return JsonResponse({
             'resumen': {
@@ -1794,7 +2277,9 @@ def reporte_expensas(request):
             'filtros_aplicados': {
                 'mes': mes,
                 'año': año,
-                'estado': estado
+                'estado': estado,
+                'vencimiento_desde': vencimiento_desde,
+                'vencimiento_hasta': vencimiento_hasta
             }
         })
         
@@ -1803,7 +2288,7 @@ def reporte_expensas(request):
 
 @csrf_exempt
 def reporte_visitas(request):
-    """Reporte de visitas y visitantes"""
+    """Reporte de visitas y visitantes, agregado en SQL (número constante de consultas)"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
@@ -1811,47 +2296,67 @@ def reporte_visitas(request):
         # Obtener parámetros de filtro
         fecha_inicio = request.GET.get('fecha_inicio')
         fecha_fin = request.GET.get('fecha_fin')
-        
-        # Filtrar visitas
-        visitas = Visita.objects.all()
-        
-        if fecha_inicio:
-            visitas = visitas.filter(entrada__date__gte=fecha_inicio)
-        if fecha_fin:
-            visitas = visitas.filter(entrada__date__lte=fecha_fin)
-        
-        # Estadísticas
-        total_visitas = visitas.count()
-        visitas_activas = visitas.filter(salida__isnull=True).count()
-        visitas_completadas = visitas.filter(salida__isnull=False).count()
+        try:
+            top = max(1, min(int(request.GET.get('top', 10)), 100))
+        except ValueError:
+            return JsonResponse({"error": "Parámetro top inválido"}, status=400)
+        
+        # Filtrar visitas por rango sobre la columna entrada (usa el índice, no entrada::date);
+        # visitas_entre suma el archivo solo si el rango llega a visitas archivadas
+        desde = hasta = None
+        try:
+            if fecha_inicio:
+                desde = timezone.make_aware(datetime.combine(date.fromisoformat(fecha_inicio), time.min))
+            if fecha_fin:
+                hasta = timezone.make_aware(
+                    datetime.combine(date.fromisoformat(fecha_fin) + timedelta(days=1), time.min)
+                )
+        except ValueError:
+            return JsonResponse({"error": "Formato de fecha inválido, use YYYY-MM-DD"}, status=400)
+        visitas = visitas_entre(desde, hasta)
+        
+        # Estadísticas: total y activas en la misma consulta, desde la base (el índice de
+        # presencia es por proceso y puede no ver lo registrado en otro worker)
+        resumen = visitas.aggregate(
+            total=Count('id'),
+            activas=Count('id', filter=Q(salida__isnull=True)),
+        )
         
         # Por vivienda
-        visitas_por_vivienda = {}
-        for visita in visitas:
-            codigo = visita.vivienda_destino.codigo
-            if codigo not in visitas_por_vivienda:
-                visitas_por_vivienda[codigo] = 0
-            visitas_por_vivienda[codigo] += 1
-        
-        # Visitantes más frecuentes
-        visitantes_frecuentes = {}
-        for visita in visitas:
-            nombre = f"{visita.visitante.nombres} {visita.visitante.apellidos}"
-            if nombre not in visitantes_frecuentes:
-                visitantes_frecuentes[nombre] = 0
-            visitantes_frecuentes[nombre] += 1
+        visitas_por_vivienda = {
+            fila['vivienda_destino__codigo']: fila['visitas']
+            for fila in visitas.values('vivienda_destino__codigo')
+                               .annotate(visitas=Count('id'))
+                               .order_by('vivienda_destino__codigo')
+        }
+        
+        # Visitantes más frecuentes (top N por visitante_id)
+        frecuentes = (
+            visitas.values('visitante_id', 'visitante__nombres', 'visitante__apellidos')
+                   .annotate(visitas=Count('id'))
+                   .order_by('-visitas', 'visitante_id')[:top]
+        )
+        visitantes_frecuentes = [
+            {
+                'visitante_id': fila['visitante_id'],
+                'nombre': f"{fila['visitante__nombres']} {fila['visitante__apellidos']}",
+                'visitas': fila['visitas']
+            }
+            for fila in frecuentes
+        ]
         
         return JsonResponse({
             'resumen': {
-                'total_visitas': total_visitas,
-                'visitas_activas': visitas_activas,
-                'visitas_completadas': visitas_completadas
+                'total_visitas': resumen['total'],
+                'visitas_activas': resumen['activas'],
+                'visitas_completadas': resumen['total'] - resumen['activas']
             },
             'por_vivienda': visitas_por_vivienda,
-            'visitantes_frecuentes': dict(sorted(visitantes_frecuentes.items(), key=lambda x: x[1], reverse=True)[:10]),
+            'visitantes_frecuentes': visitantes_frecuentes,
             'filtros_aplicados': {
                 'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin
+                'fecha_fin': fecha_fin,
+                'top': top
             }
         })
         
@@ -1902,42 +2407,29 @@ def reporte_vehiculos(request):
 
 @csrf_exempt
 def reporte_ocupacion_parqueos(request):
-    """Reporte de ocupación de parqueos"""
+    """Reporte de ocupación de parqueos por zona (contadores mantenidos, ver core.parqueos)"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
-        # Estadísticas de parqueos
-        total_parqueos = Parqueo.objects.count()
-        parqueos_ocupados = Parqueo.objects.filter(ocupado=True).count()
-        parqueos_disponibles = total_parqueos - parqueos_ocupados
-        
-        # Por piso
-        ocupacion_por_piso = {}
-        for parqueo in Parqueo.objects.all():
-            piso = parqueo.piso
-            if piso not in ocupacion_por_piso:
-                ocupacion_por_piso[piso] = {'total': 0, 'ocupados': 0, 'disponibles': 0}
-            ocupacion_por_piso[piso]['total'] += 1
-            if parqueo.ocupado:
-                ocupacion_por_piso[piso]['ocupados'] += 1
-            else:
-                ocupacion_por_piso[piso]['disponibles'] += 1
+        ocupacion = ocupacion_parqueos()
         
-        # Calcular porcentajes por piso
-        for piso in ocupacion_por_piso:
-            total = ocupacion_por_piso[piso]['total']
-            ocupados = ocupacion_por_piso[piso]['ocupados']
-            ocupacion_por_piso[piso]['porcentaje_ocupacion'] = round((ocupados / total * 100) if total > 0 else 0, 2)
+        def porcentaje(ocupados, total):
+            return round((ocupados / total * 100) if total > 0 else 0, 2)
+        
+        por_zona = {
+            zona: {**datos, 'porcentaje_ocupacion': porcentaje(datos['ocupados'], datos['total'])}
+            for zona, datos in ocupacion['zonas'].items()
+        }
         
         return JsonResponse({
             'resumen': {
-                'total_parqueos': total_parqueos,
-                'ocupados': parqueos_ocupados,
-                'disponibles': parqueos_disponibles,
-                'porcentaje_ocupacion': round((parqueos_ocupados / total_parqueos * 100) if total_parqueos > 0 else 0, 2)
+                'total_parqueos': ocupacion['total'],
+                'ocupados': ocupacion['ocupados'],
+                'disponibles': ocupacion['disponibles'],
+                'porcentaje_ocupacion': porcentaje(ocupacion['ocupados'], ocupacion['total'])
             },
-            'por_piso': ocupacion_por_piso
+            'por_zona': por_zona
         })
         
     except Exception as e:
@@ -1945,51 +2437,31 @@ def reporte_ocupacion_parqueos(request):
 
 @csrf_exempt
 def estadisticas_mensuales(request):
-    """Estadísticas mensuales del condominio"""
+    """Estadísticas mensuales del condominio, leídas de estadisticas_mensuales (una consulta)"""
     if request.method != "GET":
         return JsonResponse({"error": "Método no permitido"}, status=405)
     
     try:
-        from datetime import datetime, timedelta
-        from django.db.models import Count, Sum
-        
         # Obtener año y mes (por defecto mes actual)
-        año = int(request.GET.get('año', datetime.now().year))
-        mes = int(request.GET.get('mes', datetime.now().month))
-        
-        # Rango de fechas del mes
-        inicio_mes = datetime(año, mes, 1)
-        if mes == 12:
-            fin_mes = datetime(año + 1, 1, 1) - timedelta(days=1)
-        else:
-            fin_mes = datetime(año, mes + 1, 1) - timedelta(days=1)
-        
-        # Estadísticas del mes
-        visitas_mes = Visita.objects.filter(entrada__date__range=[inicio_mes.date(), fin_mes.date()]).count()
-        expensas_mes = Expensa.objects.filter(fecha_vencimiento__date__range=[inicio_mes.date(), fin_mes.date()])
-        multas_mes = Multa.objects.filter(fecha_emision__date__range=[inicio_mes.date(), fin_mes.date()])
-        
-        # Comparación con mes anterior
-        if mes == 1:
-            mes_anterior = 12
-            año_anterior = año - 1
-        else:
-            mes_anterior = mes - 1
-            año_anterior = año
-        
-        inicio_mes_anterior = datetime(año_anterior, mes_anterior, 1)
-        if mes_anterior == 12:
-            fin_mes_anterior = datetime(año_anterior + 1, 1, 1) - timedelta(days=1)
-        else:
-            fin_mes_anterior = datetime(año_anterior, mes_anterior + 1, 1) - timedelta(days=1)
-        
-        visitas_mes_anterior = Visita.objects.filter(entrada__date__range=[inicio_mes_anterior.date(), fin_mes_anterior.date()]).count()
+        hoy = timezone.localdate()
+        try:
+            año = int(request.GET.get('año', hoy.year))
+            mes = int(request.GET.get('mes', hoy.month))
+            periodo = periodo_de(año, mes)
+        except ValueError:
+            return JsonResponse({"error": "Año o mes inválido"}, status=400)
+        anterior = mes_anterior(periodo)
+        
+        datos = resumen_meses([periodo, anterior])
+        actual, previo = datos[periodo], datos[anterior]
+        visitas_mes = actual.get('VISITAS', {}).get('cantidad', 0)
+        visitas_mes_anterior = previo.get('VISITAS', {}).get('cantidad', 0)
         
         return JsonResponse({
             'periodo': {
                 'año': año,
                 'mes': mes,
-                'nombre_mes': inicio_mes.strftime('%B')
+                'nombre_mes': date(año, mes, 1).strftime('%B')
             },
             'estadisticas': {
                 'visitas': {
@@ -1998,24 +2470,74 @@ def estadisticas_mensuales(request):
                     'variacion': visitas_mes - visitas_mes_anterior,
                     'porcentaje_variacion': round(((visitas_mes - visitas_mes_anterior) / visitas_mes_anterior * 100) if visitas_mes_anterior > 0 else 0, 2)
                 },
-                'expensas': {
-                    'total': expensas_mes.count(),
-                    'monto_total': sum(exp.monto for exp in expensas_mes),
-                    'pagadas': expensas_mes.filter(estado='PAGADA').count(),
-                    'pendientes': expensas_mes.filter(estado='PENDIENTE').count()
-                },
-                'multas': {
-                    'total': multas_mes.count(),
-                    'monto_total': sum(mul.monto for mul in multas_mes),
-                    'pagadas': multas_mes.filter(estado='PAGADA').count(),
-                    'pendientes': multas_mes.filter(estado='PENDIENTE').count()
-                }
+                'expensas': _totales_concepto(actual.get('EXPENSAS')),
+                'multas': _totales_concepto(actual.get('MULTAS')),
             }
         })
         
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+
+def _totales_concepto(datos):
+    """Totales de expensas o multas de un mes, con el desglose por estado."""
+    por_estado = (datos or {}).get('por_estado', {})
+    return {
+        'total': datos['cantidad'] if datos else 0,
+        'monto_total': float(datos['monto']) if datos else 0.0,
+        'pagadas': por_estado.get('PAGADA', {}).get('cantidad', 0),
+        'pendientes': por_estado.get('PENDIENTE', {}).get('cantidad', 0),
+        'por_estado': {
+            estado or 'SIN_ESTADO': {'cantidad': fila['cantidad'], 'monto': float(fila['monto'])}
+            for estado, fila in sorted(por_estado.items())
+        },
+    }
+
+
+MAX_MESES_TENDENCIA = 120
+
+
+@csrf_exempt
+def tendencia_mensual(request):
+    """Serie mensual de visitas, expensas y multas entre dos meses (una consulta)"""
+    if request.method != "GET":
+        return JsonResponse({"error": "Método no permitido"}, status=405)
+    
+    try:
+        hasta = request.GET.get('hasta') or timezone.localdate().strftime('%Y-%m')
+        try:
+            anio, mes = map(int, hasta.split('-'))
+            hasta = periodo_de(anio, mes)
+            desde = request.GET.get('desde')
+            if desde:
+                anio, mes = map(int, desde.split('-'))
+                desde = periodo_de(anio, mes)
+            else:
+                desde = periodo_de(anio, 1) if mes == 12 else periodo_de(anio - 1, mes + 1)  # últimos 12 meses
+        except ValueError:
+            return JsonResponse({"error": "Formato de mes inválido, use YYYY-MM"}, status=400)
+        periodos = periodos_entre(desde, hasta)
+        if not periodos:
+            return JsonResponse({"error": "desde debe ser anterior o igual a hasta"}, status=400)
+        if len(periodos) > MAX_MESES_TENDENCIA:
+            return JsonResponse({"error": f"El rango no puede superar {MAX_MESES_TENDENCIA} meses"}, status=400)
+        
+        datos = resumen_meses(periodos)
+        serie = []
+        for periodo in periodos:
+            conceptos = datos[periodo]
+            serie.append({
+                'periodo': periodo,
+                'visitas': conceptos.get('VISITAS', {}).get('cantidad', 0),
+                'expensas': _totales_concepto(conceptos.get('EXPENSAS')),
+                'multas': _totales_concepto(conceptos.get('MULTAS')),
+            })
+        
+        return JsonResponse({'desde': desde, 'hasta': hasta, 'serie': serie})
+        
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
 # ------------------------------
 # SISTEMA DE NOTIFICACIONES
 # ------------------------------
@@ -2045,24 +2567,25 @@ def listar_notificaciones(request):
         if fecha_desde:
             notificaciones = notificaciones.filter(fecha_creacion__date__gte=fecha_desde)
         
-        data = []
-        for notif in notificaciones:
-            data.append({
-                'id': notif.id,
-                'titulo': notif.titulo,
-                'mensaje': notif.mensaje,
-                'tipo': notif.tipo,
-                'prioridad': notif.prioridad,
-                'leida': notif.leida,
-                'fecha_creacion': notif.fecha_creacion.isoformat(),
-                'fecha_lectura': notif.fecha_lectura.isoformat() if notif.fecha_lectura else None
-            })
-        
-        return JsonResponse(data, safe=False)
+        return listar_paginado(request, notificaciones, serializar_notificacion,
+                               ordenes=('-fecha_creacion', 'fecha_creacion', 'id', '-id'),
+                               orden_defecto='-fecha_creacion')
         
     except Exception as e:
         return JsonResponse({"error": str(e)}, status=500)
 
+def serializar_notificacion(notif):
+    return {
+        'id': notif.id,
+        'titulo': notif.titulo,
+        'mensaje': notif.mensaje,
+        'tipo': notif.tipo,
+        'prioridad': notif.prioridad,
+        'leida': notif.leida,
+        'fecha_creacion': notif.fecha_creacion.isoformat(),
+        'fecha_lectura': notif.fecha_lectura.isoformat() if notif.fecha_lectura else None
+    }
+
 @csrf_exempt
 def crear_notificacion(request):
     """Crear una nueva notificación"""
@@ -2168,7 +2691,7 @@ def alertas_automaticas(request):
                 'cantidad': multas_pendientes
             })
         
-        # Verificar visitas activas
+        # Verificar visitas activas (índice parcial visitas_abiertas_idx)
         visitas_activas = Visita.objects.filter(salida__isnull=True).count()
         if visitas_activas > 0:
             alertas.append({
@@ -2180,8 +2703,9 @@ def alertas_automaticas(request):
             })
         
         # Verificar ocupación de parqueos
-        total_parqueos = Parqueo.objects.count()
-        parqueos_ocupados = Parqueo.objects.filter(ocupado=True).count()
+        ocupacion = ocupacion_parqueos()
+        total_parqueos = ocupacion['total']
+        parqueos_ocupados = ocupacion['ocupados']
         porcentaje_ocupacion = (parqueos_ocupados / total_parqueos * 100) if total_parqueos > 0 else 0
         
         if porcentaje_ocupacion > 90:
@@ -2246,7 +2770,7 @@ def generar_notificaciones_automaticas():
                 defaults={'leida': False}
             )
         
-        # Visitas activas
+        # Visitas activas (índice parcial visitas_abiertas_idx)
         visitas_activas = Visita.objects.filter(salida__isnull=True).count()
         if visitas_activas > 0:
             Notificacion.objects.get_or_create(
@@ -2264,15 +2788,27 @@ def generar_notificaciones_automaticas():
 # FUNCIONES GENÉRICAS
 # ------------------------------
 
+# Modelos con archivo: los listados genéricos leen la vista que incluye lo archivado
+LECTURA_HISTORICA = {Visita: VisitaHistorica}
+VISITA_ARCHIVADA = "La visita está archivada y es de solo lectura"
+
+def visita_archivada(model, pk):
+    return model is Visita and VisitaArchivada.objects.filter(pk=pk).exists()
+
 @csrf_exempt
 def listar(request, model_name):
     """
     Listar todos los objetos de un modelo.
     """
     model = globals()[model_name]
-    objects = model.objects.all()
-    data = [model_to_dict(obj) for obj in objects]
-    return JsonResponse(data, safe=False)
+    model = LECTURA_HISTORICA.get(model, model)
+    # .values() lee solo las columnas (FKs como *_id): una consulta por listado
+    columnas = [columna for _, columna in plan_serializacion(model)]
+    objects = model.objects.values(*columnas)
+    # Paginado por la clave primaria real (zona, vivienda_id... no siempre id)
+    pk = model._meta.pk.attname
+    return listar_paginado(request, objects, valores_a_dict(model), ordenes=(pk, f'-{pk}'), orden_defecto=pk,
+                           streaming=True)
 
 @csrf_exempt
 def crear(request, model_name):
@@ -2296,6 +2832,8 @@ def modificar(request, model_name, pk):
         return JsonResponse({"error": "Método no permitido"}, status=405)
 
     model = globals()[model_name]
+    if visita_archivada(model, pk):
+        return JsonResponse({"error": VISITA_ARCHIVADA}, status=409)
     obj = get_object_or_404(model, pk=pk)
     data = json.loads(request.body)
     for key, value in data.items():
@@ -2312,6 +2850,23 @@ def eliminar(request, model_name, pk):
         return JsonResponse({"error": "Método no permitido"}, status=405)
 
     model = globals()[model_name]
+    if visita_archivada(model, pk):
+        return JsonResponse({"error": VISITA_ARCHIVADA}, status=409)
     obj = get_object_or_404(model, pk=pk)
     obj.delete()
     return JsonResponse({"status": "ok"})
+
+# ------------------------------
+# MÉTRICAS
+# ------------------------------
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrSuperAdmin])
+def metricas(request):
+    """Métricas por endpoint en formato de texto de Prometheus (solo administradores)"""
+    extra = [
+        (f'condominio_db_pool_{clave}', valor, f'Pool de conexiones: {clave}.')
+        for clave, valor in estadisticas_pool().items()
+        if isinstance(valor, (int, float))
+    ]
+    return HttpResponse(registro.exportar(extra), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,165 @@
+"""
+Ingreso de visitas en la portería.
+
+registrar_ingreso() resuelve el visitante por documento o placa (lo crea si
+no existe y se enviaron sus nombres), busca la vivienda por código y crea la
+visita en una sola transacción. En PostgreSQL todo va en una sentencia con
+CTEs (INSERT ... RETURNING unido al visitante y la vivienda); cuando puede
+crear al visitante la precede un bloqueo consultivo por documento o placa
+para no duplicarlo si dos garitas lo registran a la vez. En las demás bases
+se usan consultas del ORM dentro de transaction.atomic().
+
+Las escrituras en SQL directo no emiten señales de Visita ni de Visitante:
+el visitante creado se indexa para la búsqueda en la misma transacción y la
+visita se suma a las estadísticas mensuales y al índice de presencia al
+confirmarse.
+"""
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import busqueda, estadisticas
+from .models import Visita, Visitante, Vivienda
+from .presencia import presencia
+from .vehiculos import normalizar_placa
+
+
+SQL_INGRESO = """
+    WITH vivienda AS (
+        SELECT id, codigo FROM {viviendas} WHERE codigo = %(codigo)s
+    ), existente AS (
+        SELECT id, nombres, apellidos FROM {visitantes}
+        WHERE {campo} = %(clave)s
+        ORDER BY id
+        LIMIT 1
+    ), nuevo AS (
+        INSERT INTO {visitantes} (nombres, apellidos, num_doc, placa)
+        SELECT %(nombres)s, %(apellidos)s, %(num_doc)s, %(placa)s
+        WHERE %(crear)s AND NOT EXISTS (SELECT 1 FROM existente) AND EXISTS (SELECT 1 FROM vivienda)
+        RETURNING id, nombres, apellidos
+    ), placa_actualizada AS (
+        UPDATE {visitantes} SET placa = %(placa)s
+        WHERE id = (SELECT id FROM existente) AND EXISTS (SELECT 1 FROM vivienda)
+          AND %(placa)s IS NOT NULL AND placa IS DISTINCT FROM %(placa)s
+    ), visitante AS (
+        SELECT id, nombres, apellidos FROM existente
+        UNION ALL
+        SELECT id, nombres, apellidos FROM nuevo
+    ), visita AS (
+        INSERT INTO {visitas} (visitante_id, vivienda_destino_id, entrada, medio)
+        SELECT visitante.id, vivienda.id, %(entrada)s, %(medio)s
+        FROM visitante, vivienda
+        RETURNING id
+    )
+    SELECT visita.id, visitante.id, visitante.nombres, visitante.apellidos,
+           vivienda.id, vivienda.codigo, EXISTS (SELECT 1 FROM nuevo)
+    FROM (SELECT 1) AS uno
+    LEFT JOIN vivienda ON TRUE
+    LEFT JOIN visitante ON TRUE
+    LEFT JOIN visita ON TRUE
+"""
+
+
+def _ingreso_sql(codigo, campo, clave, datos):
+    sql = SQL_INGRESO.format(
+        viviendas=Vivienda._meta.db_table,
+        visitantes=Visitante._meta.db_table,
+        visitas=Visita._meta.db_table,
+        campo=campo,
+    )
+    parametros = {'codigo': codigo, 'clave': clave, **datos}
+    with transaction.atomic(), connection.cursor() as cursor:
+        if datos['crear']:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [f'visitante:{campo}:{clave}'])
+        cursor.execute(sql, parametros)
+        visita_id, visitante_id, nombres, apellidos, vivienda_id, _, creado = cursor.fetchone()
+        if creado:
+            busqueda.indexar(Visitante(id=visitante_id, nombres=nombres, apellidos=apellidos,
+                                       num_doc=datos['num_doc']))
+        if visita_id is not None:
+            # Dentro del bloque: el ajuste se escribe en esta misma transacción
+            estadisticas.registrar_lote(Visita, [Visita(id=visita_id, entrada=datos['entrada'])])
+    if vivienda_id is None:
+        raise Vivienda.DoesNotExist(f"No existe la vivienda {codigo}")
+    if visitante_id is None:
+        raise Visitante.DoesNotExist("Visitante no registrado; envíe sus nombres para crearlo")
+    return {
+        'id': visita_id,
+        'visitante_id': visitante_id,
+        'nombres': nombres,
+        'apellidos': apellidos,
+        'vivienda_destino_id': vivienda_id,
+        'codigo_vivienda': codigo,
+        'visitante_creado': creado,
+    }
+
+
+def _ingreso_orm(codigo, campo, clave, datos):
+    with transaction.atomic():
+        vivienda_id = Vivienda.objects.filter(codigo=codigo).values_list('id', flat=True).first()
+        if vivienda_id is None:
+            raise Vivienda.DoesNotExist(f"No existe la vivienda {codigo}")
+        visitante = (Visitante.objects.filter(**{campo: clave}).order_by('id')
+                     .values('id', 'nombres', 'apellidos', 'placa').first())
+        creado = visitante is None
+        if creado:
+            if not datos['crear']:
+                raise Visitante.DoesNotExist("Visitante no registrado; envíe sus nombres para crearlo")
+            nuevo = Visitante.objects.create(
+                nombres=datos['nombres'], apellidos=datos['apellidos'],
+                num_doc=datos['num_doc'], placa=datos['placa'],
+            )
+            visitante = {'id': nuevo.id, 'nombres': nuevo.nombres, 'apellidos': nuevo.apellidos}
+        elif datos['placa'] is not None and visitante['placa'] != datos['placa']:
+            Visitante.objects.filter(pk=visitante['id']).update(placa=datos['placa'])
+        visita = Visita.objects.create(
+            visitante_id=visitante['id'], vivienda_destino_id=vivienda_id,
+            entrada=datos['entrada'], medio=datos['medio'],
+        )
+    return {
+        'id': visita.id,
+        'visitante_id': visitante['id'],
+        'nombres': visitante['nombres'],
+        'apellidos': visitante['apellidos'],
+        'vivienda_destino_id': vivienda_id,
+        'codigo_vivienda': codigo,
+        'visitante_creado': creado,
+    }
+
+
+def registrar_ingreso(codigo_vivienda, num_doc=None, placa=None, nombres=None, apellidos=None, medio=None):
+    """
+    Registra la entrada de un visitante identificado por num_doc (o, si falta,
+    por placa) a la vivienda con ese código. Crea al visitante si no existe y
+    se dan nombres. Lanza ValueError, Vivienda.DoesNotExist o
+    Visitante.DoesNotExist.
+    """
+    num_doc = (num_doc or '').strip() or None
+    placa = normalizar_placa(placa)
+    if num_doc is None and placa is None:
+        raise ValueError("Envíe num_doc o placa del visitante")
+    campo, clave = ('num_doc', num_doc) if num_doc is not None else ('placa', placa)
+    datos = {
+        'crear': bool(nombres),
+        'nombres': nombres,
+        'apellidos': apellidos or '',
+        'num_doc': num_doc,
+        'placa': placa,
+        'entrada': timezone.now(),
+        'medio': medio or '',
+    }
+    if connection.vendor == 'postgresql':
+        ingreso = _ingreso_sql(codigo_vivienda, campo, clave, datos)
+    else:
+        ingreso = _ingreso_orm(codigo_vivienda, campo, clave, datos)
+    ingreso.update(entrada=datos['entrada'], medio=datos['medio'])
+    fila = {
+        'id': ingreso['id'],
+        'visitante_id': ingreso['visitante_id'],
+        'visitante_nombre': f"{ingreso['nombres']} {ingreso['apellidos']}",
+        'vivienda_destino_id': ingreso['vivienda_destino_id'],
+        'codigo_vivienda': ingreso['codigo_vivienda'],
+        'entrada': ingreso['entrada'],
+        'medio': ingreso['medio'],
+    }
+    transaction.on_commit(lambda: presencia.registrar(fila))
+    return ingreso